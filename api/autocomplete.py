@@ -0,0 +1,135 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Count
+
+from contracts.models import Contract, DataVersion, clean_search
+
+
+class AutocompleteIndex():
+    '''
+    An in-memory index of the distinct normalized labor categories of
+    contracts and the number of contracts with each one, which answers
+    autocomplete queries the same way that
+    `Contract.objects.multi_phrase_search()` would, without querying
+    the database.
+
+    Categories are numbered in the order they should be suggested in
+    (most contracts first), and sets of categories are represented as
+    integer bitmasks, so the best matches are the lowest set bits.
+
+    To find the categories that contain a word anywhere in them, we keep
+    a sorted array of every suffix of every distinct word of every
+    category: the suffixes that start with the word are a contiguous
+    range of that array.
+    '''
+
+    MAX_CACHED_SUBSTRINGS = 10000
+
+    def __init__(self, categories: List[Tuple[str, int]],
+                 version: Optional[tuple]=None) -> None:
+        self.version = version
+        self.categories = categories
+        self.all_categories = (1 << len(categories)) - 1
+        self.exact: Dict[str, int] = {}
+
+        word_masks: Dict[str, int] = {}
+        for i, (name, _) in enumerate(categories):
+            self.exact[name] = 1 << i
+            for word in name.split(' '):
+                word_masks[word] = word_masks.get(word, 0) | (1 << i)
+
+        self.word_masks = list(word_masks.values())
+        self.suffixes = sorted(
+            (word[start:], word_id)
+            for word_id, word in enumerate(word_masks)
+            for start in range(len(word))
+        )
+        self.suffix_keys = [suffix for suffix, _ in self.suffixes]
+        self.substring_masks: Dict[str, int] = {}
+
+    @classmethod
+    def from_db(cls, version: Optional[tuple]=None) -> 'AutocompleteIndex':
+        categories = Contract.objects.all()\
+            .values_list('_normalized_labor_category')\
+            .annotate(count=Count('_normalized_labor_category'))\
+            .order_by('-count', '_normalized_labor_category')
+        return cls(list(categories), version)
+
+    def get_substring_mask(self, substring: str) -> int:
+        '''
+        Return the categories with a word that contains the substring.
+        '''
+
+        if substring not in self.substring_masks:
+            word_ids = set()
+            i = bisect_left(self.suffix_keys, substring)
+            while i < len(self.suffixes) and \
+                    self.suffix_keys[i].startswith(substring):
+                word_ids.add(self.suffixes[i][1])
+                i += 1
+            mask = 0
+            for word_id in word_ids:
+                mask |= self.word_masks[word_id]
+            if len(self.substring_masks) >= self.MAX_CACHED_SUBSTRINGS:
+                self.substring_masks.clear()
+            self.substring_masks[substring] = mask
+        return self.substring_masks[substring]
+
+    def get_phrase_mask(self, phrase: str) -> int:
+        if phrase.startswith("'") or phrase.startswith('"'):
+            # Quoted phrases are matched as a whole, so they may
+            # contain spaces; this is rare enough to just check them all.
+            mask = 0
+            for i, (name, _) in enumerate(self.categories):
+                if phrase in name:
+                    mask |= 1 << i
+            return mask
+        mask = self.all_categories
+        for word in phrase.split(' '):
+            if word:
+                mask &= self.get_substring_mask(word)
+        return mask
+
+    def search(self, query: str, query_type: str='match_all',
+               limit: int=20) -> List[dict]:
+        '''
+        Return up to `limit` of the categories matching the query, with
+        the ones with the most contracts first.
+        '''
+
+        mask = 0
+        for phrase in clean_search(query):
+            if query_type == 'match_exact':
+                mask |= self.exact.get(phrase, 0)
+            else:
+                mask |= self.get_phrase_mask(phrase)
+
+        results: List[dict] = []
+        while mask and len(results) < limit:
+            lowest_bit = mask & -mask
+            name, count = self.categories[lowest_bit.bit_length() - 1]
+            results.append({'labor_category': name, 'count': count})
+            mask ^= lowest_bit
+        return results
+
+
+_index: Optional[AutocompleteIndex] = None
+
+_index_lock = threading.Lock()
+
+
+def get_autocomplete_index() -> AutocompleteIndex:
+    '''
+    Return this process' autocomplete index, rebuilding it first if
+    contracts have changed since it was built.
+    '''
+
+    global _index
+
+    version = DataVersion.get_current()
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = AutocompleteIndex.from_db(version)
+        return _index
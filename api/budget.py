@@ -0,0 +1,108 @@
+'''
+Limits on how much work a single API request can make the database do,
+so that one client's expensive searches can't slow down everyone else's.
+'''
+
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connections, router, transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from contracts.models import Contract, clean_search
+
+
+# The SQLSTATE of statements that Postgres canceled, e.g. because they
+# ran for longer than the statement timeout.
+QUERY_CANCELED = '57014'
+
+
+class QueryTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    default_detail = 'This search took too long. Please try again later.'
+
+    default_code = 'query_timeout'
+
+
+def check_search_budget(query: str) -> None:
+    '''
+    Raise a ValidationError if the given search query has more phrases,
+    or more words across its phrases, than a search can have.
+    '''
+
+    phrases = clean_search(query)
+    if len(phrases) > settings.API_MAX_SEARCH_PHRASES:
+        raise serializers.ValidationError(
+            f'Searches can have at most {settings.API_MAX_SEARCH_PHRASES} '
+            f'phrases'
+        )
+    num_words = sum(len(phrase.split()) for phrase in phrases)
+    if num_words > settings.API_MAX_SEARCH_WORDS:
+        raise serializers.ValidationError(
+            f'Searches can have at most {settings.API_MAX_SEARCH_WORDS} '
+            f'words'
+        )
+
+
+def get_query_cost(queryset) -> float:
+    '''
+    Return the total cost that Postgres estimates evaluating the given
+    queryset would have, in the arbitrary units EXPLAIN reports.
+    '''
+
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Total Cost']
+
+
+def check_query_cost(queryset) -> None:
+    '''
+    Raise a ValidationError if finding every row of the given queryset
+    is estimated to cost more than a search can.
+    '''
+
+    if settings.API_MAX_QUERY_COST is None:
+        return
+    if get_query_cost(queryset.order_by()) > settings.API_MAX_QUERY_COST:
+        raise serializers.ValidationError(
+            'This search would take too long. Please narrow it down.'
+        )
+
+
+def limit_statement_time(method):
+    '''
+    Decorator for a method of an API view that runs it in a transaction
+    on the database it reads contracts from, whose SQL statements are
+    canceled if they run for longer than settings.API_STATEMENT_TIMEOUT
+    milliseconds, responding with a 503 if they are.
+
+    Note that statements run after the method returns, e.g. by a
+    streaming response, aren't limited.
+    '''
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        timeout = settings.API_STATEMENT_TIMEOUT
+        if not timeout:
+            return method(self, request, *args, **kwargs)
+
+        using = router.db_for_read(Contract)
+        try:
+            with transaction.atomic(using=using):
+                with connections[using].cursor() as cursor:
+                    cursor.execute(
+                        f'SET LOCAL statement_timeout = {int(timeout)}')
+                return method(self, request, *args, **kwargs)
+        except OperationalError as e:
+            if getattr(e.__cause__, 'pgcode', None) == QUERY_CANCELED:
+                raise QueryTimeout()
+            raise
+
+    return wrapper
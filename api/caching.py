@@ -0,0 +1,124 @@
+import calendar
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from contracts.models import DataVersion
+
+
+def get_canonical_query(query_params) -> str:
+    '''
+    Return the given query parameters as a query string with its keys
+    and values in sorted order, so that requests for the same thing
+    share it regardless of the order they list their parameters in.
+    '''
+
+    return '&'.join(
+        f'{key}={value}'
+        for key in sorted(query_params.keys())
+        for value in sorted(query_params.getlist(key))
+    )
+
+
+def get_data_version(request):
+    '''
+    Return the current DataVersion of the default database, looking it
+    up at most once per request.
+    '''
+
+    if not hasattr(request, '_data_version'):
+        request._data_version = DataVersion.get_current(using=DEFAULT_DB_ALIAS)
+    return request._data_version
+
+
+def get_request_digest(request, version, *extra) -> str:
+    # Responses can contain absolute links back to the API, so they
+    # depend on the scheme and host they were requested through.
+    url = request.build_absolute_uri(request.path)
+    query = get_canonical_query(request.query_params)
+    parts = [str(version), f'{url}?{query}'] + [str(e) for e in extra]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def get_cache_key(request, view_name: str, version) -> str:
+    return f'api:{view_name}:{get_request_digest(request, version)}'
+
+
+def cache_response(get):
+    '''
+    Decorator for the `get` method of an API view that caches the data
+    of its successful responses, keyed on the request's query
+    parameters and the current DataVersion.
+
+    Because the key changes whenever CALC's data does, cached responses
+    never need to expire.
+    '''
+
+    @wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        if not settings.API_CACHE_ENABLED:
+            return get(self, request, *args, **kwargs)
+
+        key = get_cache_key(request, self.__class__.__name__,
+                            get_data_version(request))
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = get(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, None)
+        return response
+
+    return wrapper
+
+
+def conditional_response(get):
+    '''
+    Decorator for the `get` method of an API view that adds ETag and
+    Last-Modified headers to its successful responses, based on the
+    current DataVersion and the request's query parameters.
+
+    Requests whose If-None-Match or If-Modified-Since headers show that
+    the client already has the current response get a 304 response,
+    without calling the view. Last-Modified is left out (and
+    If-Modified-Since ignored) during the second the data last changed.
+    '''
+
+    @wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        version = get_data_version(request)
+        _, updated_at = version
+        etag = quote_etag(get_request_digest(
+            request, version, request.META.get('HTTP_ACCEPT', '')))
+        last_modified = None
+        if updated_at is not None:
+            last_modified = calendar.timegm(updated_at.utctimetuple())
+            # HTTP dates are in whole seconds, so until the second that
+            # the data last changed in is over, it could change again
+            # without changing Last-Modified, and clients that had
+            # fetched it in between would wrongly get a 304. Until
+            # then, only the ETag is used.
+            if time.time() < last_modified + 1:
+                last_modified = None
+
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = get(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    return wrapper
@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory, override_settings
+
+
+class Command(BaseCommand):
+    help = '''
+    Compare the latency of API requests when each one opens a new
+    database connection with their latency when connections are reused
+    across requests, as they are when DATABASE_CONN_MAX_AGE is greater
+    than zero.
+
+    Requests go through the same WSGI handler that gunicorn calls, with
+    the API cache disabled, so that every one of them queries the
+    database.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='/api/rates/?q=engineer',
+            help='path (and query string) to request (default is '
+                 '/api/rates/?q=engineer)'
+        )
+
+        parser.add_argument(
+            '-n', '--requests',
+            default=50,
+            type=int,
+            help='number of requests to time for each setting (default '
+                 'is 50)'
+        )
+
+    def time_requests(self, handler, environ, num_requests):
+        def start_response(status, headers):
+            if not status.startswith('200'):
+                raise CommandError(f'The request failed: {status}')
+
+        latencies = []
+        # The first request isn't timed, so that every timed request can
+        # reuse a connection if connections are reused.
+        for i in range(num_requests + 1):
+            start = time.perf_counter()
+            response = handler(dict(environ), start_response)
+            b''.join(response)
+            # This fires the request_finished signal, which is when Django
+            # closes connections that shouldn't be reused.
+            response.close()
+            if i > 0:
+                latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    def handle(self, *args, **options):
+        path = options['path']
+        num_requests = options['requests']
+        environ = RequestFactory().get(path, secure=True).environ
+        handler = WSGIHandler()
+        max_age = settings.DATABASE_CONN_MAX_AGE or 600
+        original_max_ages = {
+            conn.alias: conn.settings_dict['CONN_MAX_AGE']
+            for conn in connections.all()
+        }
+
+        try:
+            for name, conn_max_age in [('Without connection reuse', 0),
+                                       ('With connection reuse', max_age)]:
+                for conn in connections.all():
+                    conn.close()
+                    conn.settings_dict['CONN_MAX_AGE'] = conn_max_age
+                with override_settings(API_CACHE_ENABLED=False,
+                                       ALLOWED_HOSTS=['testserver']):
+                    latencies = self.time_requests(
+                        handler, environ, num_requests)
+                self.stdout.write(
+                    f'{name}: median {statistics.median(latencies):.2f} ms, '
+                    f'mean {statistics.mean(latencies):.2f} ms'
+                )
+        finally:
+            for conn in connections.all():
+                conn.close()
+                conn.settings_dict['CONN_MAX_AGE'] = \
+                    original_max_ages[conn.alias]
@@ -0,0 +1,135 @@
+import json
+from contextlib import ExitStack
+from typing import List, Tuple
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api.views import GetRates
+
+
+# Query strings of representative /api/rates/ requests.
+DEFAULT_QUERIES = [
+    '',
+    'sort=-current_price',
+    'contract-year=1',
+    'contract-year=2&sort=-second_year_price',
+    'sort=min_years_experience',
+    'sort=schedule',
+    'sort=education_level',
+    'q=engineer',
+    'q=engineer&min_education=BA&sort=-current_price',
+    'fields=id,current_price',
+    'fields=id,labor_category,current_price&schedule=pes',
+]
+
+
+def describe_query(sql: str) -> str:
+    '''
+    Return a description of what the given SQL statement of a request
+    to /api/rates/ fetches.
+    '''
+
+    if sql.startswith('WITH filtered AS'):
+        return 'page, count and stats'
+    if 'contracts_raterollup' in sql:
+        return 'count and stats from rollups'
+    if ' LIMIT ' in sql:
+        return 'page'
+    return 'count and stats'
+
+
+def get_scans(plan) -> List[str]:
+    '''
+    Return descriptions of the scans of the given plan node from
+    EXPLAIN's JSON output, and of the scans of all its subnodes.
+    '''
+
+    scans = []
+    if plan['Node Type'].endswith('Scan'):
+        scan = plan['Node Type']
+        if 'Index Name' in plan:
+            scan += f' using {plan["Index Name"]}'
+        elif 'Relation Name' in plan:
+            scan += f' on {plan["Relation Name"]}'
+        scans.append(scan)
+    for subplan in plan.get('Plans', []):
+        scans.extend(get_scans(subplan))
+    return scans
+
+
+class Command(BaseCommand):
+    help = '''
+    Make representative requests to /api/rates/, and run the SQL
+    statements that they sent to the database for contracts (or their
+    rollups) again under EXPLAIN ANALYZE, reporting how long each took,
+    how it scanned its tables, and whether it got index-only scans.
+
+    Note that index-only scans need the table to have been vacuumed
+    recently, and that the queries are run against the actual database.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'queries',
+            nargs='*',
+            metavar='query',
+            help='query string of a request to /api/rates/ (default is '
+                 'a set of representative requests)'
+        )
+
+    def get_statements(self, query: str) -> List[Tuple[str, str]]:
+        '''
+        Make a request to /api/rates/ with the given query string, and
+        return the database alias and SQL of each statement it sent
+        that read contracts or their rollups.
+        '''
+
+        request = APIRequestFactory().get('/api/rates/?' + query)
+        with ExitStack() as stack:
+            captured = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            }
+            # A cached response wouldn't need to query the database.
+            stack.enter_context(override_settings(API_CACHE_ENABLED=False))
+            response = GetRates.as_view()(request)
+        if response.status_code != 200:
+            raise CommandError(f'Invalid query "{query}": {response.data}')
+        return [
+            (alias, statement['sql'])
+            for alias, context in captured.items()
+            for statement in context.captured_queries
+            if not statement['sql'].startswith('SET ') and (
+                'contracts_contract' in statement['sql'] or
+                'contracts_raterollup' in statement['sql'])
+        ]
+
+    def explain(self, using: str, sql: str):
+        with connections[using].cursor() as cursor:
+            cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql)
+            result = cursor.fetchone()[0]
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result[0]
+
+    def report(self, using: str, sql: str):
+        explained = self.explain(using, sql)
+        scans = get_scans(explained['Plan'])
+        index_only = any(scan.startswith('Index Only Scan') for scan in scans)
+        self.stdout.write(
+            f'  {describe_query(sql)}: {explained["Execution Time"]:.2f} ms, '
+            f'index-only: {"yes" if index_only else "no"}, '
+            f'{"; ".join(scans)}'
+        )
+
+    def handle(self, *args, **options):
+        for query in options['queries'] or DEFAULT_QUERIES:
+            statements = self.get_statements(query)
+            self.stdout.write(f'{query or "(no query)"}')
+            for using, sql in statements:
+                self.report(using, sql)
@@ -0,0 +1,86 @@
+import timeit
+from decimal import Decimal
+from itertools import cycle, islice
+from typing import List, Optional
+
+from django.core.management import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from contracts.models import EDUCATION_CHOICES, Contract
+from api.serializers import ContractSerializer, ContractValuesSerializer
+
+
+def make_contracts(num_rows):
+    codes: List[Optional[str]] = [code for code, _ in EDUCATION_CHOICES]
+    education_levels = cycle(codes + [None])
+    return [
+        Contract(
+            id=i,
+            idv_piid=f'GS-10F-{i:04d}X',
+            vendor_name=f'Vendor {i % 50}',
+            labor_category=f'Senior Engineer {i % 7}',
+            education_level=education_level,
+            min_years_experience=i % 15,
+            hourly_rate_year1=Decimal(f'{50 + i % 100}.25'),
+            current_price=Decimal(f'{51 + i % 100}.50'),
+            next_year_price=Decimal(f'{52 + i % 100}.75'),
+            second_year_price=None,
+            schedule='PES',
+            sin='871-1',
+            contractor_site='Both',
+            business_size='S',
+        )
+        for i, education_level in enumerate(islice(education_levels, num_rows))
+    ]
+
+
+class Command(BaseCommand):
+    help = '''
+    Compare how many rows per second ContractSerializer and
+    ContractValuesSerializer can serialize, the way /api/rates/
+    serializes a page of results. No database access is needed.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-r', '--rows',
+            default=200,
+            type=int,
+            help='number of rows in each page (default is 200)'
+        )
+
+        parser.add_argument(
+            '-n', '--repeat',
+            default=200,
+            type=int,
+            help='number of times to serialize the page (default is 200)'
+        )
+
+    def handle(self, *args, **options):
+        num_rows = options['rows']
+        repeat = options['repeat']
+        contracts = make_contracts(num_rows)
+        values_serializer = ContractValuesSerializer()
+        rows = [
+            tuple(getattr(contract, name)
+                  for name in values_serializer.get_columns())
+            for contract in contracts
+        ]
+
+        def serialize_instances():
+            return ContractSerializer(contracts, many=True).data
+
+        def serialize_values():
+            return values_serializer.to_representation(rows)
+
+        renderer = JSONRenderer()
+        if renderer.render(serialize_instances()) != \
+                renderer.render(serialize_values()):
+            raise CommandError('The serializers rendered different JSON!')
+
+        for name, serialize in [('ContractSerializer', serialize_instances),
+                                ('ContractValuesSerializer', serialize_values)]:
+            seconds = min(timeit.repeat(serialize, number=repeat, repeat=3))
+            self.stdout.write(
+                f'{name}: {num_rows * repeat / seconds:,.0f} rows/second'
+            )
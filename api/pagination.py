@@ -1,7 +1,17 @@
+import json
+import operator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
 from collections import OrderedDict
+from functools import reduce
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
 
 
 class ContractPagination(pagination.PageNumberPagination):
@@ -13,18 +23,42 @@ class ContractPagination(pagination.PageNumberPagination):
         self.context = context
         self.page_size = settings.PAGINATION
 
+    def get_page_offset(self, request):
+        '''
+        Return the offset of the first result on the requested page, or
+        None if it can't be known before counting the results.
+        '''
+
+        try:
+            page_number = int(request.query_params.get(
+                self.page_query_param, 1))
+        except ValueError:
+            return None
+        if page_number < 1:
+            return None
+        return (page_number - 1) * self.page_size
+
     def get_paginated_response(self, data):
         return Response(OrderedDict([
             ('count', self.page.paginator.count),
             ('next', self.get_next_link()),
             ('previous', self.get_previous_link()),
+        ] + self.get_stats() + [
+            ('results', data)
+        ]))
+
+    def get_stats(self):
+        stats = [
             ('average', self.get_average()),
             ('minimum', self.get_minimum()),
             ('maximum', self.get_maximum()),
             ('wage_histogram', self.get_wage_histogram()),
             ('first_standard_deviation', self.get_first_standard_deviation()),
-            ('results', data)
-        ]))
+        ]
+        # Percentiles are only included when they were asked for.
+        if 'percentiles' in self.context:
+            stats.append(('percentiles', self.context['percentiles']))
+        return stats
 
     def get_average(self):
         return self.context.get('average', 0)
@@ -40,3 +74,165 @@ class ContractPagination(pagination.PageNumberPagination):
 
     def get_first_standard_deviation(self):
         return self.context.get('first_standard_deviation', 0)
+
+
+def get_sort_expression(field):
+    '''
+    Return an expression that sorts the same way as the given field does
+    in ContractsQuerySet.order_by(), which sorts education levels by
+    their stored rank rather than alphabetically.
+    '''
+
+    if field == 'education_level':
+        return F('education_rank')
+    return F(field)
+
+
+def get_keyset_filter(keys, values):
+    '''
+    Return a Q object matching the rows that come after the row with the
+    given values, when rows are sorted by the given (name, descending)
+    keys. The last key must be unique and non-null.
+
+    Postgres sorts NULLs as if they were larger than any other value, so
+    they come last in ascending order and first in descending order.
+    '''
+
+    disjuncts = []
+    equal_so_far = Q()
+    for (name, descending), value in zip(keys, values):
+        if value is None:
+            after = None if not descending else Q(**{f'{name}__isnull': False})
+            equal = Q(**{f'{name}__isnull': True})
+        else:
+            if descending:
+                after = Q(**{f'{name}__lt': value})
+            else:
+                after = Q(**{f'{name}__gt': value}) | \
+                    Q(**{f'{name}__isnull': True})
+            equal = Q(**{name: value})
+        if after is not None:
+            disjuncts.append(equal_so_far & after)
+        equal_so_far &= equal
+    return reduce(operator.or_, disjuncts)
+
+
+class ContractCursorPagination(ContractPagination):
+    '''
+    Paginates contracts by keyset rather than by page number: each page
+    is fetched by seeking past the sort values of the last row on the
+    previous page, which are encoded in the opaque `cursor` that the
+    `next` link points to. This makes every page cost about the same,
+    no matter how deep into the results it is.
+
+    The first page is requested with an empty cursor, and is the only
+    page that includes the count and stats of the whole result set.
+    '''
+
+    cursor_query_param = 'cursor'
+
+    def __init__(self, context=None):
+        super().__init__(context)
+        self.count = None
+        self.cursor = None
+        self.next_cursor = None
+
+    @property
+    def is_first_page(self):
+        return self.cursor is None
+
+    def encode_cursor(self, sort, values):
+        data = json.dumps({'sort': sort, 'values': values},
+                          cls=DjangoJSONEncoder, separators=(',', ':'))
+        return urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, sort, fields):
+        '''
+        Return the sort values encoded in the request's cursor, converted
+        to the types of the given model fields that they were read from,
+        or None if the request has an empty cursor.
+        '''
+
+        encoded = request.query_params.get(self.cursor_query_param, '')
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values = cursor['values']
+            valid = cursor['sort'] == sort and \
+                isinstance(values, list) and len(values) == len(fields)
+            if valid:
+                # Cursors can be edited, so their values are checked
+                # before they're used to filter rows.
+                values = [
+                    None if value is None else field.to_python(value)
+                    for field, value in zip(fields, values)
+                ]
+        except (BinasciiError, UnicodeError, ValueError, TypeError, KeyError,
+                ArithmeticError, ValidationError):
+            valid = False
+        if not valid:
+            raise NotFound('Invalid cursor.')
+        return values
+
+    def paginate_queryset(self, queryset, request, sort, view=None):
+        '''
+        Return the page of the queryset that comes after the request's
+        cursor, when it is sorted by the given list of fields (which may
+        be prefixed by "-" to sort in descending order).
+        '''
+
+        self.request = request
+
+        keys = []
+        annotations = {}
+        fields = []
+        for i, field in enumerate(sort):
+            name = f'cursor_key_{i}'
+            annotations[name] = get_sort_expression(field.lstrip('-'))
+            keys.append((name, field.startswith('-')))
+            fields.append(queryset.model._meta.get_field(
+                annotations[name].name))
+        keys.append(('id', False))
+        fields.append(queryset.model._meta.pk)
+
+        self.cursor = self.decode_cursor(request, sort, fields)
+
+        queryset = queryset.annotate(**annotations).order_by(*[
+            ('-' if descending else '') + name for name, descending in keys
+        ])
+
+        if self.cursor is not None:
+            queryset = queryset.filter(get_keyset_filter(keys, self.cursor))
+
+        # Fetch one more row than we need, to find out if there's a next page.
+        results = list(queryset[:self.page_size + 1])
+        if len(results) > self.page_size:
+            results = results[:self.page_size]
+            last = results[-1]
+            self.next_cursor = self.encode_cursor(
+                sort, [getattr(last, name) for name, _ in keys])
+        return results
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.is_first_page:
+            return Response(OrderedDict([
+                ('next', self.get_next_link()),
+                ('results', data)
+            ]))
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', None),
+        ] + self.get_stats() + [
+            ('results', data)
+        ]))
@@ -0,0 +1,388 @@
+from collections import namedtuple
+from typing import List, Optional
+
+from django.db import connections
+
+from api.utils import (get_fractions_sql, get_histogram_range,
+                       make_histogram_bins)
+
+
+RatesQueryResult = namedtuple('RatesQueryResult', [
+    'rows', 'count', 'stats', 'wage_histogram',
+])
+
+
+class PrefetchedPage():
+    '''
+    Stands in for a queryset when handing results that have already
+    been fetched to a Django Paginator: it reports the precomputed
+    total count and returns the prefetched rows when the paginator
+    slices out the page at the offset they were fetched from.
+    '''
+
+    def __init__(self, rows, count: int, offset: int) -> None:
+        self.rows = rows
+        self.total = count
+        self.offset = offset
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.start != self.offset:
+            raise IndexError('Only the prefetched page can be sliced')
+        return self.rows[:key.stop - self.offset]
+
+
+class CombinedRatesQuery():
+    '''
+    Computes a page of contracts, the total number of contracts, and
+    the aggregate wage statistics (and, optionally, a wage histogram
+    and percentiles) for a filtered queryset of contracts in a single
+    SQL statement.
+
+    The filtered queryset, without its ordering, becomes a common table
+    expression (CTE) that the count, statistics and histogram are
+    computed from, so that the rows they need don't have to be sorted.
+    The page is read separately with the queryset's own ordering and
+    limit, so that it can be read off an index that matches the
+    ordering, stopping as soon as it's full.
+    '''
+
+    def __init__(self, queryset, wage_field: str,
+                 num_bins: Optional[int]=None,
+                 fractions: Optional[List[float]]=None) -> None:
+        if num_bins is not None and num_bins <= 0:
+            raise ValueError('num_bins must be greater than 0')
+        self.queryset = queryset
+        self.wage_field = wage_field
+        self.num_bins = num_bins
+        self.fractions = fractions
+        # If the queryset is from values_list(), the page is returned as
+        # tuples of its values rather than as model instances.
+        self.values_select = queryset.query.values_select
+        if self.values_select:
+            self.fields = [
+                queryset.model._meta.get_field(name)
+                for name in self.values_select
+            ]
+        else:
+            # Only select the fields the queryset loads, which may have
+            # been narrowed via only() or defer().
+            loaded = queryset.query.get_loaded_field_names().get(queryset.model)
+            self.fields = [
+                f for f in queryset.model._meta.concrete_fields
+                if loaded is None or f.attname in loaded
+            ]
+        self.wage_column = queryset.model._meta.get_field(wage_field).column
+
+    def get_stats_sql(self, qn) -> str:
+        wage = 'filtered.' + qn(self.wage_column)
+        percentiles = 'NULL'
+        if self.fractions:
+            percentiles = (
+                f'percentile_cont({get_fractions_sql(self.fractions)}) '
+                f'WITHIN GROUP (ORDER BY {wage})'
+            )
+        return (
+            f'SELECT COUNT(*) AS count, MIN({wage}) AS min, '
+            f'MAX({wage}) AS max, AVG({wage}) AS avg, '
+            f'STDDEV_POP({wage}) AS stddev, '
+            f'{percentiles} AS percentiles FROM filtered'
+        )
+
+    def get_histogram_sql(self, qn, num_bins: int) -> str:
+        # The bounds mirror api.utils.get_histogram_range(), and values
+        # equal to the max are put in the last bin rather than in the
+        # overflow bucket width_bucket() would put them in.
+        wage = 'filtered.' + qn(self.wage_column)
+        n = int(num_bins)
+        return (
+            f'SELECT LEAST(GREATEST(width_bucket({wage}::float8, '
+            f'bounds.lo, bounds.hi, {n}), 1), {n}) AS bucket, '
+            f'COUNT(*) AS count '
+            f'FROM filtered, ('
+            f'SELECT CASE WHEN min = max THEN min::float8 - 0.5 '
+            f'ELSE min::float8 END AS lo, '
+            f'CASE WHEN min = max THEN max::float8 + 0.5 '
+            f'ELSE max::float8 END AS hi FROM stats'
+            f') AS bounds GROUP BY 1'
+        )
+
+    def get_page_sql(self, offset: int, limit: int):
+        '''
+        Return the SQL of the queryset's page, with its ordering and
+        limit, which also selects the number of each row among all of
+        the queryset's rows as page_row.
+
+        Django can't compile an empty slice, so an empty page is read
+        as a page of one row, which as_sql() leaves out.
+        '''
+
+        queryset = self.queryset
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        query = queryset[offset:offset + max(limit, 1)].query
+        if query.distinct:
+            raise ValueError('Distinct querysets are not supported')
+
+        # Window functions can't refer to the aliases of the select
+        # list, so the ordering is compiled from the expressions
+        # that the aliases stand for.
+        compiler = query.get_compiler(using=queryset.db)
+        compiler.setup_query()
+        ordering = []
+        ordering_params: List = []
+        for order_by, (_, _, is_ref) in compiler.get_order_by():
+            if is_ref:
+                order_by = order_by.copy()
+                order_by.expression = order_by.expression.source
+            sql, params = compiler.compile(order_by)
+            ordering.append(sql)
+            ordering_params.extend(params)
+
+        sql, params = query.get_compiler(using=queryset.db).as_sql()
+        assert sql.startswith('SELECT ')
+        sql = (
+            f'SELECT row_number() OVER (ORDER BY {", ".join(ordering)}) '
+            f'AS page_row, {sql[len("SELECT "):]}'
+        )
+        return sql, tuple(ordering_params) + tuple(params)
+
+    def as_sql(self, offset: int, limit: int):
+        connection = connections[self.queryset.db]
+        qn = connection.ops.quote_name
+        # The stats and histogram only need the wage of each row.
+        inner_sql, inner_params = self.queryset.order_by().values_list(
+            self.wage_field).query.get_compiler(using=self.queryset.db).as_sql()
+        page_sql, page_params = self.get_page_sql(offset, limit)
+
+        columns = ', '.join('page.' + qn(f.column) for f in self.fields)
+
+        ctes = [
+            f'filtered AS ({inner_sql})',
+            f'stats AS ({self.get_stats_sql(qn)})',
+        ]
+        histogram_columns = 'NULL, NULL'
+        if self.num_bins:
+            ctes.append(f'histogram AS ({self.get_histogram_sql(qn, self.num_bins)})')
+            histogram_columns = (
+                '(SELECT array_agg(bucket) FROM histogram), '
+                '(SELECT array_agg(count) FROM histogram)'
+            )
+
+        sql = (
+            'WITH ' + ', '.join(ctes) + ' '
+            'SELECT stats.count, stats.min, stats.max, stats.avg, '
+            f'stats.stddev, stats.percentiles, {histogram_columns}, '
+            f'{columns}, page.page_row '
+            f'FROM stats LEFT JOIN ({page_sql}) AS page '
+            'ON page.page_row <= %s ORDER BY page.page_row'
+        )
+
+        return sql, tuple(inner_params) + page_params + (offset + limit,)
+
+    def execute(self, offset: int, limit: int) -> RatesQueryResult:
+        sql, params = self.as_sql(offset, limit)
+        with connections[self.queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            results = cursor.fetchall()
+
+        return self.get_result(results)
+
+    def get_result(self, results) -> RatesQueryResult:
+        '''
+        Return the result of this query, given the rows that executing
+        its SQL returned.
+        '''
+
+        first = results[0]
+        (count, minimum, maximum, avg, stddev, percentiles,
+         buckets, counts) = first[:8]
+
+        field_names = [f.attname for f in self.fields]
+        # The last column is the row number of the page row, which is
+        # null if the page is empty.
+        rows = [row[8:8 + len(field_names)]
+                for row in results if row[-1] is not None]
+        if not self.values_select:
+            rows = [
+                self.queryset.model.from_db(self.queryset.db, field_names, row)
+                for row in rows
+            ]
+
+        stats = {
+            self.wage_field + '__min': minimum,
+            self.wage_field + '__max': maximum,
+            self.wage_field + '__avg': None if avg is None else float(avg),
+            self.wage_field + '__stddev':
+                None if stddev is None else float(stddev),
+        }
+        if self.fractions:
+            stats[self.wage_field + '__percentiles'] = percentiles
+
+        wage_histogram: Optional[List[dict]] = None
+        if self.num_bins:
+            mn, mx = get_histogram_range(minimum, maximum)
+            wage_histogram = make_histogram_bins(mn, mx, self.num_bins)
+            for bucket, bucket_count in zip(buckets or [], counts or []):
+                wage_histogram[bucket - 1]['count'] = bucket_count
+
+        return RatesQueryResult(
+            rows=rows,
+            count=count,
+            stats=stats,
+            wage_histogram=wage_histogram,
+        )
+
+
+class RollupStatsQuery():
+    '''
+    Computes the total number of contracts and their aggregate wage
+    statistics (and, optionally, a wage histogram) in a single SQL
+    statement from a filtered queryset of the RateRollup objects that
+    summarize them, rather than from the contracts themselves.
+
+    The results are the same as CombinedRatesQuery's: the average is the
+    sum of the prices divided by their number, just like AVG() computes
+    it, the population standard deviation is computed from the sums of
+    the prices and of their squares just like STDDEV_POP() does, and the
+    histogram is computed from the price sketches of the rollups.
+    '''
+
+    def __init__(self, rollups, wage_field: str,
+                 num_bins: Optional[int]=None) -> None:
+        if num_bins is not None and num_bins <= 0:
+            raise ValueError('num_bins must be greater than 0')
+        self.rollups = rollups
+        self.wage_field = wage_field
+        self.num_bins = num_bins
+
+    def as_sql(self):
+        inner_sql, inner_params = self.rollups.order_by().query.get_compiler(
+            using=self.rollups.db).as_sql()
+
+        n = 'SUM(rollups.count)'
+        price_sum = 'SUM(rollups.price_sum)'
+        variance = (
+            f'{n} * SUM(rollups.price_sum_of_squares) - '
+            f'{price_sum} * {price_sum}'
+        )
+        ctes = [
+            f'rollups AS ({inner_sql})',
+            f'stats AS (SELECT COALESCE({n}, 0) AS count, '
+            f'MIN(rollups.min_price) AS min, MAX(rollups.max_price) AS max, '
+            f'{price_sum} / {n} AS avg, '
+            f'CASE WHEN {variance} <= 0 THEN 0 '
+            f'ELSE sqrt(({variance}) / ({n} * {n})) END AS stddev '
+            f'FROM rollups)',
+        ]
+        histogram_columns = 'NULL, NULL'
+        if self.num_bins:
+            num_bins = int(self.num_bins)
+            # The bounds mirror those of CombinedRatesQuery.
+            ctes.append(
+                f'histogram AS ('
+                f'SELECT LEAST(GREATEST(width_bucket(sketch.price::float8, '
+                f'bounds.lo, bounds.hi, {num_bins}), 1), {num_bins}) '
+                f'AS bucket, SUM(sketch.count) AS count '
+                f'FROM rollups, '
+                f'unnest(rollups.prices, rollups.price_counts) '
+                f'AS sketch (price, count), ('
+                f'SELECT CASE WHEN min = max THEN min::float8 - 0.5 '
+                f'ELSE min::float8 END AS lo, '
+                f'CASE WHEN min = max THEN max::float8 + 0.5 '
+                f'ELSE max::float8 END AS hi FROM stats'
+                f') AS bounds GROUP BY 1)'
+            )
+            histogram_columns = (
+                '(SELECT array_agg(bucket) FROM histogram), '
+                '(SELECT array_agg(count) FROM histogram)'
+            )
+
+        sql = (
+            'WITH ' + ', '.join(ctes) + ' '
+            'SELECT stats.count, stats.min, stats.max, stats.avg, '
+            f'stats.stddev, {histogram_columns} FROM stats'
+        )
+        return sql, tuple(inner_params)
+
+    def execute(self) -> RatesQueryResult:
+        sql, params = self.as_sql()
+        with connections[self.rollups.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            (count, minimum, maximum, avg, stddev,
+             buckets, counts) = cursor.fetchone()
+
+        stats = {
+            self.wage_field + '__min': minimum,
+            self.wage_field + '__max': maximum,
+            self.wage_field + '__avg': None if avg is None else float(avg),
+            self.wage_field + '__stddev':
+                None if stddev is None else float(stddev),
+        }
+
+        wage_histogram: Optional[List[dict]] = None
+        if self.num_bins:
+            mn, mx = get_histogram_range(minimum, maximum)
+            wage_histogram = make_histogram_bins(mn, mx, self.num_bins)
+            for bucket, bucket_count in zip(buckets or [], counts or []):
+                wage_histogram[bucket - 1]['count'] = int(bucket_count)
+
+        return RatesQueryResult(
+            rows=None,
+            count=int(count),
+            stats=stats,
+            wage_histogram=wage_histogram,
+        )
+
+
+class BatchRatesQuery():
+    '''
+    Runs several CombinedRatesQuery objects in a single SQL statement,
+    fetching the same number of contracts for each.
+
+    Each query becomes a subquery whose rows are tagged with the
+    query's position in the batch, and the subqueries are combined via
+    UNION ALL. Because their rows are combined into one result set,
+    the queries must select the same fields, and either all or none of
+    them must compute a histogram and percentiles.
+    '''
+
+    def __init__(self, queries: List[CombinedRatesQuery]) -> None:
+        self.queries = queries
+
+    def as_sql(self, limit: int):
+        parts = []
+        params: List = []
+        for i, query in enumerate(self.queries):
+            sql, query_params = query.as_sql(0, limit)
+            parts.append(
+                f'(SELECT %s AS batch_index, combined.* FROM ({sql}) AS combined)'
+            )
+            params.append(i)
+            params.extend(query_params)
+
+        sql = ' UNION ALL '.join(parts) + ' ORDER BY batch_index, page_row'
+        return sql, tuple(params)
+
+    def execute(self, limit: int) -> List[RatesQueryResult]:
+        if not self.queries:
+            return []
+
+        sql, params = self.as_sql(limit)
+        with connections[self.queries[0].queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            results = cursor.fetchall()
+
+        rows_by_query: List[list] = [[] for _ in self.queries]
+        for row in results:
+            rows_by_query[row[0]].append(row[1:])
+
+        return [
+            query.get_result(rows)
+            for query, rows in zip(self.queries, rows_by_query)
+        ]
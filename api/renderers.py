@@ -0,0 +1,12 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    '''
+    Renders JSON just like JSONRenderer does, but is selected via
+    `?format=columnar`, which views that support it take as a request
+    to return their results as one array per field ("columns") rather
+    than as one object per result.
+    '''
+
+    format = 'columnar'
@@ -0,0 +1,45 @@
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from api.caching import get_data_version
+from calc.routers import REPLICA_DB_ALIAS, reading_from_replica
+from contracts.models import DataVersion
+
+
+def is_replica_current(request) -> bool:
+    '''
+    Return whether there's a read replica that has caught up with the
+    default database's current DataVersion, which is looked up at most
+    once per request.
+
+    Because every change to the data the API serves bumps the
+    DataVersion, a replica with the same version has all of it.
+    '''
+
+    if REPLICA_DB_ALIAS not in settings.DATABASES:
+        return False
+    try:
+        replica_version = DataVersion.get_current(using=REPLICA_DB_ALIAS)
+    except DatabaseError:
+        return False
+    return replica_version == get_data_version(request)
+
+
+def read_from_replica(method):
+    '''
+    Decorator for a method of an API view that reads from the read
+    replica database while it runs, unless the replica is lagging
+    behind the default database (or there's no replica), in which case
+    it reads from the default database.
+    '''
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not is_replica_current(request):
+            return method(self, request, *args, **kwargs)
+        with reading_from_replica():
+            return method(self, request, *args, **kwargs)
+
+    return wrapper
@@ -1,4 +1,8 @@
-from contracts.models import Contract, ScheduleMetadata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from contracts.models import EDUCATION_CHOICES, Contract, ScheduleMetadata
 from rest_framework import serializers
 
 
@@ -30,6 +34,14 @@ class EducationLevelField(serializers.Field):
 class ContractSerializer(serializers.ModelSerializer):
     education_level = EducationLevelField(allow_null=True)
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Only include the given fields, if any were given.
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Contract
         fields = ('id', 'idv_piid', 'vendor_name', 'labor_category',
@@ -40,6 +52,99 @@ class ContractSerializer(serializers.ModelSerializer):
         list_serializer_class = ContractListSerializer
 
 
+class ContractValuesSerializer():
+    '''
+    A faster, read-only alternative to `ContractSerializer(many=True)`
+    that serializes tuples of contract field values, like the ones
+    `values_list()` returns, rather than model instances.
+
+    The values of each row must be in the order of `fields`; any
+    values after those are ignored. The results are the same as
+    `ContractSerializer`'s: the values the database returns for every
+    field already have the types (and, for prices, the number of
+    decimal places) that `ContractSerializer` would convert them to,
+    except for education levels, which are converted to their names.
+    '''
+
+    def __init__(self, fields: Optional[Sequence[str]]=None) -> None:
+        self.fields = [
+            name for name in ContractSerializer.Meta.fields
+            if fields is None or name in fields
+        ]
+        education_levels = dict(EDUCATION_CHOICES)
+        self.converters: List[Tuple[int, Callable[[Any, Any], Any]]] = [
+            (i, education_levels.get)
+            for i, name in enumerate(self.fields)
+            if name == 'education_level'
+        ]
+
+    def get_columns(self, *extra_fields: str) -> List[str]:
+        '''
+        Return the fields to pass to `values_list()` to get rows this
+        can serialize, followed by any of the given extra fields that
+        aren't already among them.
+        '''
+
+        return self.fields + [f for f in extra_fields if f not in self.fields]
+
+    def to_representation(self, rows: Iterable[Sequence]) -> List[dict]:
+        fields = self.fields
+        converters = self.converters
+        results = []
+        for row in rows:
+            values = list(row)
+            for i, convert in converters:
+                values[i] = convert(values[i], values[i])
+            results.append(dict(zip(fields, values)))
+        return results
+
+    def to_columns(self, rows: Iterable[Sequence]) -> Dict[str, list]:
+        '''
+        Like `to_representation()`, but returns a list of the values of
+        each field, keyed by field name, rather than a dict for each row.
+        '''
+
+        columns = list(zip(*rows)) or [()] * len(self.fields)
+        results = {
+            name: list(values) for name, values in zip(self.fields, columns)
+        }
+        for i, convert in self.converters:
+            name = self.fields[i]
+            results[name] = [convert(value, value) for value in results[name]]
+        return results
+
+
+class RatesBatchSerializer(serializers.Serializer):
+    '''
+    Validates the body of a request to /api/rates/batch/.
+    '''
+
+    MAX_QUERIES = 100
+
+    queries = serializers.ListField(
+        child=serializers.DictField(child=serializers.CharField()),
+        min_length=1,
+        max_length=MAX_QUERIES,
+    )
+    histogram = serializers.IntegerField(min_value=1, required=False)
+    percentiles = serializers.ListField(
+        child=serializers.FloatField(min_value=0, max_value=100),
+        required=False,
+    )
+    fields = serializers.ListField(
+        child=serializers.ChoiceField(choices=ContractSerializer.Meta.fields),
+        required=False,
+    )
+    page_size = serializers.IntegerField(min_value=0, default=0)
+
+    def validate_page_size(self, value):
+        if value > settings.PAGINATION:
+            raise serializers.ValidationError(
+                f'Ensure this value is less than or equal to '
+                f'{settings.PAGINATION}.')
+        return value
+
+
 class ScheduleMetadataSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScheduleMetadata
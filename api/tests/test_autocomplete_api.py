@@ -53,3 +53,68 @@ class GetAutocompleteTests(TestCase):
         self.assertEqual(res.status_code, 200)
         data = res.json()
         self.assertEqual(len(data), GetAutocomplete.MAX_RESULTS)
+
+    def test_orders_results_by_count(self):
+        get_contract_recipe().make(
+            _quantity=6,
+            labor_category=cycle(['Engineer I', 'Sr. Engineer',
+                                  'Engineer I', 'Engineer I',
+                                  'Sr. Engineer', 'Accountant'])
+        )
+        res = self.client.get(self.path, {'q': 'engineer'})
+        self.assertEqual(res.json(), [
+            {'labor_category': 'engineer i', 'count': 3},
+            {'labor_category': 'senior engineer', 'count': 2},
+        ])
+
+    def test_query_types(self):
+        get_contract_recipe().make(
+            _quantity=4,
+            labor_category=cycle(['Project Manager', 'Manager of Projects',
+                                  'Program Manager', 'Engineer'])
+        )
+        for query, query_type in [('manager', 'match_all'),
+                                  ('proj manag', 'match_all'),
+                                  ('engin, program', 'match_all'),
+                                  ('"manager of', 'match_all'),
+                                  ('program manager', 'match_phrase'),
+                                  ('project manager', 'match_exact'),
+                                  ('manager', 'match_exact'),
+                                  ('nope', 'match_all')]:
+            res = self.client.get(self.path, {'q': query,
+                                              'query_type': query_type})
+            expected = self.client.get(self.path, {
+                'q': query,
+                'query_type': query_type,
+                'query_by': '_normalized_labor_category',
+            })
+            self.assertEqual(sorted(res.json(), key=lambda d: d['labor_category']),
+                             sorted(expected.json(), key=lambda d: d['labor_category']),
+                             query)
+
+    def test_matches_words_anywhere_in_labor_category(self):
+        get_contract_recipe().make(labor_category='Software Engineer')
+        res = self.client.get(self.path, {'q': 'soft gineer'})
+        self.assertEqual(res.json(), [
+            {'labor_category': 'software engineer', 'count': 1},
+        ])
+
+    def test_results_update_when_contracts_change(self):
+        self.make_test_contracts()
+        res = self.client.get(self.path, {'q': 'test'})
+        self.assertEqual(res.json(), [{'labor_category': 'test_0', 'count': 1}])
+
+        contract = get_contract_recipe().make(labor_category='test_1')
+        res = self.client.get(self.path, {'q': 'test'})
+        self.assertEqual(len(res.json()), 2)
+
+        contract.delete()
+        res = self.client.get(self.path, {'q': 'test'})
+        self.assertEqual(res.json(), [{'labor_category': 'test_0', 'count': 1}])
+
+    def test_only_checks_data_version_when_index_is_current(self):
+        self.make_test_contracts()
+        self.client.get(self.path, {'q': 'test'})
+        with self.assertNumQueries(1):
+            res = self.client.get(self.path, {'q': 'tes'})
+        self.assertEqual(res.json(), [{'labor_category': 'test_0', 'count': 1}])
@@ -0,0 +1,48 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from contracts.mommy_recipes import get_contract_recipe
+from api.management.commands.benchmark_rates_queries import get_scans
+
+
+class BenchmarkRatesQueriesTests(TestCase):
+    def test_it_works(self):
+        get_contract_recipe().make(_quantity=3)
+        out = StringIO()
+        call_command('benchmark_rates_queries', 'sort=schedule',
+                     'fields=id,current_price', stdout=out)
+        self.assertIn('sort=schedule\n  count and stats from rollups: ',
+                      out.getvalue())
+        self.assertIn('\n  page: ', out.getvalue())
+        self.assertIn('index-only: ', out.getvalue())
+
+    @override_settings(API_RATES_USE_ROLLUPS=False)
+    def test_it_explains_the_statements_the_api_sends(self):
+        get_contract_recipe().make(_quantity=3)
+        out = StringIO()
+        call_command('benchmark_rates_queries', 'q=engineer', stdout=out)
+        self.assertRegex(out.getvalue(),
+                         r'^q=engineer\n  page, count and stats: [^\n]+\n$')
+
+    def test_it_raises_on_invalid_queries(self):
+        with self.assertRaisesRegexp(CommandError, 'Invalid query'):
+            call_command('benchmark_rates_queries', 'sort=blah',
+                         stdout=StringIO())
+
+    def test_get_scans_finds_nested_scans(self):
+        plan = {
+            'Node Type': 'Limit',
+            'Plans': [{
+                'Node Type': 'Nested Loop',
+                'Plans': [
+                    {'Node Type': 'Index Only Scan', 'Index Name': 'foo_idx'},
+                    {'Node Type': 'Seq Scan', 'Relation Name': 'bar'},
+                ],
+            }],
+        }
+        self.assertEqual(get_scans(plan), [
+            'Index Only Scan using foo_idx',
+            'Seq Scan on bar',
+        ])
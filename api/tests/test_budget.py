@@ -0,0 +1,109 @@
+import json
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from contracts.mommy_recipes import get_contract_recipe
+from api.budget import limit_statement_time
+
+
+RATES_API_PATH = '/api/rates/'
+
+
+class StatementTimeoutView(APIView):
+    @limit_statement_time
+    def get(self, request):
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            timeout = cursor.fetchone()[0]
+            if 'sleep' in request.query_params:
+                cursor.execute('SELECT pg_sleep(%s)',
+                               [float(request.query_params['sleep'])])
+        return Response({'timeout': timeout})
+
+
+@override_settings(API_MAX_SEARCH_PHRASES=3, API_MAX_SEARCH_WORDS=5)
+class SearchBudgetTests(TestCase):
+    def setUp(self):
+        get_contract_recipe().make(_quantity=2, labor_category='engineer')
+
+    def test_searches_within_budget_work(self):
+        res = self.client.get(RATES_API_PATH, {'q': 'a b,c d,engineer'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['count'], 2)
+
+    def test_too_many_phrases_are_rejected(self):
+        res = self.client.get(RATES_API_PATH, {'q': 'a,b,c,engineer'})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), ['Searches can have at most 3 phrases'])
+
+    def test_too_many_words_are_rejected(self):
+        res = self.client.get(RATES_API_PATH, {'q': 'a b c,d e engineer'})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), ['Searches can have at most 5 words'])
+
+    def test_autocomplete_by_other_fields_is_limited(self):
+        res = self.client.get('/api/search/', {
+            'q': 'a,b,c,d', 'query_by': 'vendor_name'})
+        self.assertEqual(res.status_code, 400)
+
+    def test_batch_queries_are_limited(self):
+        res = self.client.post('/api/rates/batch/', json.dumps({
+            'queries': [{'q': 'engineer'}, {'q': 'a,b,c,d'}],
+        }), content_type='application/json')
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), ['Searches can have at most 3 phrases'])
+
+
+class QueryCostTests(TestCase):
+    def setUp(self):
+        get_contract_recipe().make(_quantity=2, labor_category='engineer')
+
+    @override_settings(API_MAX_QUERY_COST=0.01)
+    def test_expensive_searches_are_rejected(self):
+        res = self.client.get(RATES_API_PATH, {'q': 'engineer'})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), [
+            'This search would take too long. Please narrow it down.'])
+
+    @override_settings(API_MAX_QUERY_COST=0.01)
+    def test_requests_without_searches_are_not_checked(self):
+        res = self.client.get(RATES_API_PATH)
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(API_MAX_QUERY_COST=None)
+    def test_cost_can_be_unlimited(self):
+        res = self.client.get(RATES_API_PATH, {'q': 'engineer'})
+        self.assertEqual(res.status_code, 200)
+
+
+class StatementTimeoutTests(TestCase):
+    def get(self, **params):
+        request = APIRequestFactory().get('/', params)
+        return StatementTimeoutView.as_view()(request)
+
+    @override_settings(API_STATEMENT_TIMEOUT=5000)
+    def test_statements_are_limited(self):
+        res = self.get()
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data, {'timeout': '5s'})
+
+    @override_settings(API_STATEMENT_TIMEOUT=10)
+    def test_slow_statements_get_503(self):
+        res = self.get(sleep=1)
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.data, {
+            'detail': 'This search took too long. Please try again later.'})
+        # The rest of the transaction is unaffected.
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    @override_settings(API_STATEMENT_TIMEOUT=None)
+    def test_timeout_can_be_disabled(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            initial = cursor.fetchone()[0]
+        self.assertEqual(self.get().data, {'timeout': initial})
@@ -0,0 +1,131 @@
+import datetime
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+
+from contracts.mommy_recipes import get_contract_recipe
+from contracts.models import Contract, DataVersion, ScheduleMetadata
+from ..caching import get_canonical_query
+
+
+class CanonicalQueryTests(SimpleTestCase):
+    def test_sorts_keys_and_values(self):
+        self.assertEqual(
+            get_canonical_query(QueryDict('sort=b&q=z&exclude=2&exclude=1')),
+            'exclude=1&exclude=2&q=z&sort=b'
+        )
+
+    def test_keeps_empty_values(self):
+        self.assertEqual(get_canonical_query(QueryDict('cursor=')),
+                         'cursor=')
+
+
+@override_settings(API_CACHE_ENABLED=True)
+class CachedResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_contract_recipe().make(_quantity=2, labor_category='Engineer')
+
+    def test_rates_are_cached(self):
+        resp = self.client.get('/api/rates/', {'q': 'engineer', 'sort': 'idv_piid'})
+        self.assertEqual(resp.json()['count'], 2)
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/rates/?sort=idv_piid&q=engineer')
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.json(), resp.json())
+
+    def test_rates_are_not_cached_after_contracts_change(self):
+        self.client.get('/api/rates/')
+        get_contract_recipe().make(labor_category='Engineer')
+        self.assertEqual(self.client.get('/api/rates/').json()['count'], 3)
+        Contract.objects.all().delete()
+        self.assertEqual(self.client.get('/api/rates/').json()['count'], 0)
+
+    def test_errors_are_not_cached(self):
+        self.assertEqual(
+            self.client.get('/api/rates/?sort=blarg').status_code, 400)
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/rates/?sort=blarg')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_autocomplete_is_cached(self):
+        resp = self.client.get('/api/search/', {'q': 'engineer'})
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/search/', {'q': 'engineer'})
+        self.assertEqual(cached.json(), resp.json())
+
+    def test_schedules_are_not_cached_after_they_change(self):
+        count = len(self.client.get('/api/schedules/').json())
+        ScheduleMetadata.objects.create(schedule='Blarg', name='Blarg')
+        self.assertEqual(len(self.client.get('/api/schedules/').json()),
+                         count + 1)
+
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        get_contract_recipe().make(_quantity=2, labor_category='Engineer')
+        # Last-Modified is only sent once the second that the data
+        # last changed in is over.
+        DataVersion.objects.update(
+            updated_at=timezone.now() - datetime.timedelta(seconds=2))
+
+    def test_rates_have_validators(self):
+        resp = self.client.get('/api/rates/', {'q': 'engineer'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('ETag', resp)
+        self.assertIn('Last-Modified', resp)
+
+    def test_etag_depends_on_canonical_query(self):
+        etag = self.client.get('/api/rates/?q=engineer&sort=idv_piid')['ETag']
+        self.assertEqual(
+            self.client.get('/api/rates/?sort=idv_piid&q=engineer')['ETag'],
+            etag)
+        self.assertNotEqual(
+            self.client.get('/api/rates/?q=engineer')['ETag'], etag)
+
+    def test_matching_etag_gets_304_without_querying_contracts(self):
+        etag = self.client.get('/api/rates/')['ETag']
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/rates/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_etag_changes_when_contracts_change(self):
+        etag = self.client.get('/api/rates/')['ETag']
+        get_contract_recipe().make(labor_category='Engineer')
+        resp = self.client.get('/api/rates/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_if_modified_since_gets_304(self):
+        last_modified = self.client.get('/api/schedules/')['Last-Modified']
+        resp = self.client.get('/api/schedules/',
+                               HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_last_modified_is_only_sent_once_its_second_is_over(self):
+        DataVersion.bump()
+        updated_at = DataVersion.get_current()[1].timestamp()
+        with patch('api.caching.time.time', return_value=updated_at):
+            resp = self.client.get('/api/rates/')
+        self.assertIn('ETag', resp)
+        self.assertNotIn('Last-Modified', resp)
+        with patch('api.caching.time.time', return_value=updated_at + 1):
+            resp = self.client.get('/api/rates/')
+        self.assertIn('Last-Modified', resp)
+
+    def test_changes_in_the_same_second_dont_get_304(self):
+        DataVersion.bump()
+        updated_at = DataVersion.get_current()[1].timestamp()
+        with patch('api.caching.time.time', return_value=updated_at):
+            resp = self.client.get('/api/schedules/',
+                                   HTTP_IF_MODIFIED_SINCE=http_date(updated_at))
+        self.assertEqual(resp.status_code, 200)
+
+    def test_errors_have_no_validators(self):
+        resp = self.client.get('/api/rates/?sort=blarg')
+        self.assertEqual(resp.status_code, 400)
+        self.assertNotIn('ETag', resp)
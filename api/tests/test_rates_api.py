@@ -1,6 +1,13 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from urllib.parse import parse_qs, urlparse
+
+from django.db import connection
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from model_mommy import mommy
 from model_mommy.recipe import seq
+from api.views import ALL_CONTRACT_FIELDS
 from contracts.models import Contract
 from contracts.mommy_recipes import get_contract_recipe
 
@@ -41,6 +48,476 @@ class ContractsPaginationTest(TestCase):
         self.assertEqual(resp.status_code, 404)
 
 
+@override_settings(PAGINATION=1)
+class ContractsCursorPaginationTest(TestCase):
+
+    def setUp(self):
+        GetRatesTests.make_test_set()
+        self.path = RATES_API_PATH
+
+    def crawl(self, params):
+        resp = self.client.get(self.path, dict(params, cursor=''))
+        self.assertEqual(resp.status_code, 200)
+        pages = [resp.data]
+        while resp.data['next'] is not None:
+            resp = self.client.get(resp.data['next'])
+            self.assertEqual(resp.status_code, 200)
+            pages.append(resp.data)
+        return pages
+
+    def test_first_page_has_stats(self):
+        resp = self.client.get(self.path, {'cursor': '', 'histogram': 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['count'], 4)
+        self.assertEqual(resp.data['minimum'], 16.0)
+        self.assertEqual(resp.data['maximum'], 50.0)
+        self.assertEqual(len(resp.data['wage_histogram']), 2)
+        self.assertEqual(len(resp.data['results']), 1)
+        self.assertIn('cursor=', resp.data['next'])
+
+    def test_next_pages_omit_stats(self):
+        first = self.client.get(self.path, {'cursor': ''})
+        resp = self.client.get(first.data['next'])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(list(resp.data.keys()), ['next', 'results'])
+
+    def test_crawl_returns_every_contract_in_order(self):
+        for sort in ['current_price', '-current_price', 'education_level',
+                     '-education_level', 'education_level,-vendor_name',
+                     'schedule', '-schedule']:
+            pages = self.crawl({'sort': sort})
+            ids = [r['id'] for page in pages for r in page['results']]
+            expected = list(Contract.objects.all().order_by(
+                *sort.split(','), 'id').values_list('id', flat=True))
+            self.assertEqual(ids, expected, sort)
+
+    def test_crawl_keeps_filters(self):
+        pages = self.crawl({'q': 'accounting,legal'})
+        ids = [r['id'] for page in pages for r in page['results']]
+        self.assertEqual(ids, [1, 2])
+
+    def test_empty_results(self):
+        resp = self.client.get(self.path, {'cursor': '',
+                                           'q': 'nsfr87y3487h3rufbf'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['count'], 0)
+        self.assertEqual(resp.data['next'], None)
+        self.assertEqual(resp.data['results'], [])
+
+    def test_invalid_cursor(self):
+        resp = self.client.get(self.path, {'cursor': 'blarg'})
+        self.assertEqual(resp.status_code, 404)
+
+    def test_cursor_with_tampered_values_is_invalid(self):
+        first = self.client.get(self.path, {'cursor': ''})
+        cursor = json.loads(urlsafe_b64decode(
+            parse_qs(urlparse(first.data['next']).query)['cursor'][0]))
+        self.assertEqual(cursor['sort'], ['current_price'])
+        for values in [[cursor['values'][0], 'abc'],
+                       [[1, 2], cursor['values'][1]],
+                       [{'a': 1}, cursor['values'][1]],
+                       ['Infinity', cursor['values'][1]]]:
+            tampered = urlsafe_b64encode(json.dumps(
+                dict(cursor, values=values)).encode('utf-8')).decode('ascii')
+            resp = self.client.get(self.path, {'cursor': tampered})
+            self.assertEqual(resp.status_code, 404, values)
+
+    def test_cursor_for_different_sort_is_invalid(self):
+        first = self.client.get(self.path, {'cursor': ''})
+        resp = self.client.get(first.data['next'] + '&sort=vendor_name')
+        self.assertEqual(resp.status_code, 404)
+
+
+@override_settings(PAGINATION=2, API_RATES_USE_ROLLUPS=False)
+class SingleQueryRatesTest(TestCase):
+    QUERIES = [
+        {},
+        {'page': 2},
+        {'page': 'last'},
+        {'histogram': 3},
+        {'histogram': 2, 'page': 2, 'sort': '-education_level'},
+        {'q': 'accounting,legal', 'sort': 'labor_category'},
+        {'q': 'nsfr87y3487h3rufbf', 'histogram': 4},
+        {'contract-year': 1, 'sort': '-current_price'},
+    ]
+
+    def setUp(self):
+        GetRatesTests.make_test_set()
+        self.path = RATES_API_PATH
+
+    def test_uses_a_single_query(self):
+        # The other query looks up the data version, for the ETag.
+        with self.assertNumQueries(2):
+            resp = self.client.get(self.path, {'histogram': 3, 'page': 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['count'], 4)
+        self.assertEqual(len(resp.data['results']), 2)
+
+    def test_results_match_multiple_query_results(self):
+        for query in self.QUERIES:
+            resp = self.client.get(self.path, query)
+            with override_settings(API_RATES_SINGLE_QUERY=False):
+                expected = self.client.get(self.path, query)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json(), expected.json(), query)
+
+    def test_nonexistent_page(self):
+        resp = self.client.get(self.path + '?page=99999')
+        self.assertEqual(resp.status_code, 404)
+
+    def test_only_the_page_is_sorted(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.path, {'histogram': 3, 'page': 2})
+        sql = queries.captured_queries[-1]['sql']
+        # The rows the stats are computed from aren't ordered.
+        self.assertNotIn('ORDER BY', sql[:sql.index('stats AS')])
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute('EXPLAIN ' + sql)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        # The page is read off an index in order, and only the page's
+        # rows are sorted again by their row numbers.
+        self.assertIn('Index Scan', plan)
+        self.assertEqual(
+            [line.strip() for line in plan.splitlines() if 'Sort Key' in line],
+            ['Sort Key: page.page_row'])
+
+
+@override_settings(PAGINATION=2)
+class RollupRatesTest(TestCase):
+    QUERIES = SingleQueryRatesTest.QUERIES + [
+        {'histogram': 5, 'q': 'engineer'},
+        {'q': 'accounting,legal', 'query_type': 'match_exact'},
+        {'q': 'legal services', 'query_type': 'match_exact', 'histogram': 2},
+        {'min_education': 'BA', 'histogram': 3},
+        {'education': 'BA,MA', 'experience_range': '1,5'},
+        {'schedule': 'pes', 'business_size': 's', 'histogram': 2},
+        {'min_experience': 4, 'max_experience': 12, 'contract-year': 2},
+        {'page': 3, 'histogram': 2},
+        {'site': 'customer', 'histogram': 2},
+        {'exclude': '1,2'},
+    ]
+
+    def setUp(self):
+        GetRatesTests.make_test_set()
+        prices = cycle(['16.00', '33.33', '50.00', '71.10', '16.00'])
+        educations = cycle(['HS', 'BA', None, 'PHD'])
+        business_sizes = cycle(['S', 'O', None])
+        for i in range(20):
+            get_contract_recipe().make(
+                id=100 + i,
+                labor_category=f'Software Engineer {i % 3}',
+                current_price=next(prices),
+                education_level=next(educations),
+                business_size=next(business_sizes),
+                schedule='PES',
+                contractor_site='Customer',
+            )
+        self.path = RATES_API_PATH
+
+    def test_results_match_contract_query_results(self):
+        for query in self.QUERIES:
+            resp = self.client.get(self.path, query)
+            with override_settings(API_RATES_USE_ROLLUPS=False):
+                expected = self.client.get(self.path, query)
+            self.assertEqual(resp.status_code, 200)
+
+            # Rates with the same price can be in any order, so only the
+            # number of results is compared.
+            data, expected_data = resp.json(), expected.json()
+            self.assertEqual(len(data.pop('results')),
+                             len(expected_data.pop('results')), query)
+            self.assertEqual(data, expected_data, query)
+
+    def test_searches_match_contract_searches(self):
+        searches = [
+            {'q': 'engin'},
+            {'q': 'ware'},
+            {'q': 'ware eng, account'},
+            {'q': 'analy'},
+            {'q': 'services legal'},
+            {'q': '"legal services"'},
+            {'q': 'legal services', 'query_type': 'match_exact'},
+            {'q': 'legal', 'query_type': 'match_exact'},
+            {'q': 'software engineer 1', 'query_type': 'match_phrase'},
+            {'q': 'software engineer 1,design', 'query_type': 'match_all'},
+        ]
+        for search in searches:
+            for exclude in [None, '100,101']:
+                query = dict(search, histogram=3)
+                if exclude:
+                    query['exclude'] = exclude
+                responses = []
+                for use_rollups in [True, False]:
+                    with override_settings(API_RATES_USE_ROLLUPS=use_rollups):
+                        resp = self.client.get(self.path, query)
+                    self.assertEqual(resp.status_code, 200)
+                    data = resp.json()
+                    self.assertEqual(bool(data['count']),
+                                     bool(data['results']), query)
+                    data.pop('results')
+                    responses.append(data)
+                self.assertEqual(responses[0], responses[1], query)
+
+    def test_uses_rollups_when_filters_allow_it(self):
+        # The queries look up the data version, get the stats from the
+        # rollups, and fetch the page of contracts.
+        with self.assertNumQueries(3):
+            resp = self.client.get(self.path, {'q': 'engineer',
+                                               'histogram': 3})
+        self.assertEqual(resp.data['count'], 20)
+        self.assertIn('FROM "contracts_raterollup"', self.get_sql(
+            {'schedule': 'pes', 'min_education': 'HS'}))
+
+    def test_does_not_use_rollups_when_filters_disallow_it(self):
+        for query in [{'site': 'customer'}, {'exclude': '1'},
+                      {'price__gte': 20}, {'percentiles': 50},
+                      {'q': 'acme', 'query_by': 'vendor_name'}]:
+            self.assertNotIn('contracts_raterollup', self.get_sql(query),
+                             query)
+
+    def get_sql(self, query):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.path, query)
+        self.assertEqual(resp.status_code, 200)
+        return '\n'.join(query['sql'] for query in ctx.captured_queries)
+
+
+@override_settings(PAGINATION=2)
+class FastSerializerRatesTest(TestCase):
+    QUERIES = SingleQueryRatesTest.QUERIES + [
+        {'fields': 'education_level,current_price'},
+        {'fields': 'sin,id', 'page': 2, 'histogram': 2},
+    ]
+
+    def setUp(self):
+        GetRatesTests.make_test_set()
+        get_contract_recipe().make(id=5, education_level=None,
+                                   current_price=33.5, sin=None)
+        self.path = RATES_API_PATH
+
+    def test_json_is_identical_to_contract_serializer_json(self):
+        for single_query in [True, False]:
+            for query in self.QUERIES:
+                with override_settings(API_RATES_SINGLE_QUERY=single_query):
+                    resp = self.client.get(self.path, query)
+                    with override_settings(API_RATES_FAST_SERIALIZER=False):
+                        expected = self.client.get(self.path, query)
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.content, expected.content, query)
+
+
+@override_settings(PAGINATION=2)
+class ColumnarFormatTest(TestCase):
+
+    def setUp(self):
+        GetRatesTests.make_test_set()
+        self.path = RATES_API_PATH
+
+    def assertColumnsMatchResults(self, params):
+        resp = self.client.get(self.path, dict(params, format='columnar'))
+        expected = self.client.get(self.path, params)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/json')
+
+        columns = resp.json().pop('results')
+        results = expected.json().pop('results')
+        self.assertEqual(columns, {
+            name: [result[name] for result in results]
+            for name in columns
+        }, params)
+        self.assertEqual(list(columns.keys()),
+                         params.get('fields', ','.join(ALL_CONTRACT_FIELDS))
+                         .split(','))
+
+        # The rest of the response is unchanged, except that links keep
+        # the format.
+        data, expected_data = resp.json(), expected.json()
+        for link in ['next', 'previous']:
+            if expected_data.get(link) is not None:
+                self.assertIn('format=columnar', data.pop(link))
+                expected_data.pop(link)
+        self.assertEqual(data, expected_data, params)
+
+    def test_results_are_columns(self):
+        for fast_serializer in [True, False]:
+            with override_settings(API_RATES_FAST_SERIALIZER=fast_serializer):
+                for params in [{}, {'page': 2, 'histogram': 2},
+                               {'fields': 'id,education_level'},
+                               {'cursor': ''}]:
+                    self.assertColumnsMatchResults(params)
+
+    def test_empty_results(self):
+        resp = self.client.get(self.path, {'format': 'columnar',
+                                           'fields': 'id,sin',
+                                           'q': 'nsfr87y3487h3rufbf'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['results'], {'id': [], 'sin': []})
+
+
+@override_settings(PAGINATION=2)
+class PercentilesTest(TestCase):
+
+    def setUp(self):
+        GetRatesTests.make_test_set()
+        self.path = RATES_API_PATH
+
+    def test_returns_percentiles(self):
+        for single_query in [True, False]:
+            for extra in [{}, {'page': 2}, {'cursor': ''}]:
+                with override_settings(API_RATES_SINGLE_QUERY=single_query):
+                    resp = self.client.get(self.path, dict(
+                        extra, percentiles='25,50,75,90,0,100'))
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.json()['percentiles'], {
+                    '25': 17.5,
+                    '50': 21.0,
+                    '75': 30.5,
+                    '90': 42.2,
+                    '0': 16.0,
+                    '100': 50.0,
+                }, extra)
+
+    def test_uses_a_single_query(self):
+        with self.assertNumQueries(2):
+            resp = self.client.get(self.path, {'percentiles': '50',
+                                               'histogram': 2})
+        self.assertEqual(resp.data['percentiles'], {'50': 21.0})
+
+    def test_fractional_percentiles(self):
+        resp = self.client.get(self.path, {'percentiles': '12.5'})
+        self.assertEqual(list(resp.data['percentiles']), ['12.5'])
+
+    def test_not_included_unless_requested(self):
+        resp = self.client.get(self.path)
+        self.assertNotIn('percentiles', resp.data)
+
+    def test_empty_results(self):
+        resp = self.client.get(self.path, {'percentiles': '50,90',
+                                           'q': 'nsfr87y3487h3rufbf'})
+        self.assertEqual(resp.data['percentiles'], {'50': None, '90': None})
+
+    def test_invalid_percentiles(self):
+        for percentile in ['blarg', '-1', '101', 'nan']:
+            resp = self.client.get(self.path, {'percentiles': f'50,{percentile}'})
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(resp.data,
+                             [f'"{percentile}" is not a valid percentile'])
+
+
+@override_settings(PAGINATION=2)
+class RatesBatchTest(TestCase):
+    QUERIES = [
+        {},
+        {'q': 'accounting,legal', 'sort': 'labor_category'},
+        {'min_education': 'BA', 'contract-year': 1},
+        {'q': 'nsfr87y3487h3rufbf'},
+        {'experience_range': '5,10', 'sort': '-current_price'},
+    ]
+
+    def setUp(self):
+        GetRatesTests.make_test_set()
+        self.path = RATES_API_PATH + 'batch/'
+
+    def post(self, body):
+        return self.client.post(self.path, json.dumps(body),
+                                content_type='application/json')
+
+    def test_matches_rates_api(self):
+        resp = self.post({'queries': self.QUERIES, 'histogram': 2,
+                          'percentiles': [50], 'page_size': 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), len(self.QUERIES))
+        for query, item in zip(self.QUERIES, resp.json()):
+            expected = self.client.get(RATES_API_PATH, dict(
+                query, histogram=2, percentiles=50)).json()
+            del expected['next']
+            del expected['previous']
+            self.assertEqual(item, expected, query)
+
+    def test_uses_a_single_query(self):
+        with self.assertNumQueries(1):
+            resp = self.post({'queries': self.QUERIES, 'page_size': 1})
+        self.assertEqual([item['count'] for item in resp.json()],
+                         [4, 2, 0, 0, 3])
+
+    def test_omits_results_by_default(self):
+        resp = self.post({'queries': [{'q': 'legal'}]})
+        self.assertEqual(resp.json(), [{
+            'count': 1,
+            'average': 18.0,
+            'minimum': 18.0,
+            'maximum': 18.0,
+            'wage_histogram': [],
+            'first_standard_deviation': 0.0,
+        }])
+
+    def test_only_includes_requested_fields(self):
+        resp = self.post({'queries': [{'q': 'legal'}], 'page_size': 1,
+                          'fields': ['id', 'vendor_name']})
+        self.assertEqual(resp.json()[0]['results'], [
+            {'id': 1, 'vendor_name': 'ACME Corp.'},
+        ])
+
+    def test_invalid_requests(self):
+        for body in [{}, {'queries': []}, {'queries': [{}] * 101},
+                     {'queries': ['blarg']}, {'queries': [{}], 'page_size': 3},
+                     {'queries': [{}], 'fields': ['blarg']},
+                     {'queries': [{}], 'percentiles': [101]},
+                     {'queries': [{'sort': 'blarg'}]}]:
+            resp = self.post(body)
+            self.assertEqual(resp.status_code, 400, body)
+
+
+@override_settings(PAGINATION=2)
+class SparseFieldsetsTest(TestCase):
+
+    def setUp(self):
+        GetRatesTests.make_test_set()
+        self.path = RATES_API_PATH
+
+    def get_results(self, params):
+        resp = self.client.get(self.path, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.data['results']
+
+    def test_only_includes_requested_fields(self):
+        for params in [{}, {'histogram': 2, 'page': 2},
+                       {'cursor': '', 'sort': '-education_level'}]:
+            results = self.get_results(
+                dict(params, fields='id,vendor_name,education_level'))
+            full_results = self.get_results(params)
+            self.assertEqual(len(results), 2)
+            self.assertEqual(results, [{
+                'id': r['id'],
+                'vendor_name': r['vendor_name'],
+                'education_level': r['education_level'],
+            } for r in full_results], params)
+
+    def test_stats_are_unaffected(self):
+        resp = self.client.get(self.path, {'fields': 'id', 'histogram': 2})
+        expected = self.client.get(self.path, {'histogram': 2})
+        self.assertEqual(resp.data['count'], expected.data['count'])
+        self.assertEqual(resp.data['average'], expected.data['average'])
+        self.assertEqual(resp.data['wage_histogram'],
+                         expected.data['wage_histogram'])
+
+    def test_only_selects_requested_columns(self):
+        for single_query in [True, False]:
+            with override_settings(API_RATES_SINGLE_QUERY=single_query):
+                with CaptureQueriesContext(connection) as ctx:
+                    self.get_results({'fields': 'id,labor_category'})
+            sql = '\n'.join(query['sql'] for query in ctx.captured_queries)
+            self.assertIn('"labor_category"', sql)
+            self.assertNotIn('"vendor_name"', sql)
+
+    def test_invalid_field(self):
+        resp = self.client.get(self.path, {'fields': 'id,blarg'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data, ['"blarg" is not a valid field'])
+
+
 class GetRatesTests(TestCase):
     """ tests for the /api/rates endpoint """
     BUSINESS_SIZES = ('small business', 'other than small business')
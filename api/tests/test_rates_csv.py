@@ -1,7 +1,9 @@
+import csv
 import urllib
 
 from django.test import TestCase
 
+from contracts.models import Contract
 from . import test_rates_api
 
 RATES_CSV_PATH = '/api/rates/csv'
@@ -33,3 +35,36 @@ class GetRatesCSVTests(TestCase):
         self.assertEqual(resp.json(), [
             '"blarg" is not a valid field to sort on'
         ])
+
+    def test_streams_matching_contracts(self):
+        resp = self.client.get(f'{self.path}/?q=accounting')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        rows = list(csv.reader(
+            b''.join(resp.streaming_content).decode('utf-8').splitlines()))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][0], 'accounting')
+        self.assertEqual(rows[3], [
+            'ABC234', '', '', '', '', '', '', 'Numbers R Us',
+            'Accounting, CPA', 'Masters', '5', '50.00', '', '',
+        ])
+
+    def test_includes_readable_business_sizes(self):
+        Contract.objects.all().update(business_size='S')
+        Contract.objects.filter(id=1).update(business_size='other')
+        resp = self.client.get(f'{self.path}/?sort=current_price')
+        rows = list(csv.reader(
+            b''.join(resp.streaming_content).decode('utf-8').splitlines()))
+        self.assertEqual([row[1] for row in rows[3:]], [
+            'small business', 'other than small business',
+            'small business', 'small business',
+        ])
+
+    def test_sorts_by_education_level(self):
+        resp = self.client.get(f'{self.path}/?sort=-education_level')
+        rows = list(csv.reader(
+            b''.join(resp.streaming_content).decode('utf-8').splitlines()))
+        self.assertEqual([row[9] for row in rows[3:]], [
+            'Masters', 'Bachelors', 'Bachelors', '',
+        ])
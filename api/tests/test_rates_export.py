@@ -0,0 +1,63 @@
+import gzip
+import json
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from contracts.models import Contract
+from api.views import ALL_CONTRACT_FIELDS, GetRatesExport
+from . import test_rates_api
+
+RATES_EXPORT_PATH = '/api/rates/export/'
+
+
+class GetRatesExportTests(TestCase):
+    def setUp(self):
+        test_rates_api.GetRatesTests.make_test_set()
+        self.path = RATES_EXPORT_PATH
+
+    def get_chunks(self, params, **extra):
+        resp = self.client.get(self.path, params, **extra)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        content = b''.join(resp.streaming_content)
+        if resp.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return [json.loads(line) for line in content.decode('utf-8').splitlines()]
+
+    def test_exports_columns_of_matching_contracts(self):
+        chunks = self.get_chunks({'q': 'accounting,legal',
+                                  'fields': 'idv_piid,education_level'})
+        self.assertEqual(chunks, [{
+            'idv_piid': ['ABC123', 'ABC234'],
+            'education_level': [None, 'Masters'],
+        }])
+
+    def test_exports_every_field_by_default(self):
+        chunks = self.get_chunks({})
+        self.assertEqual(list(chunks[0].keys()),
+                         list(ALL_CONTRACT_FIELDS))
+        self.assertEqual(chunks[0]['current_price'], [16.0, 18.0, 24.0, 50.0])
+
+    @patch.object(GetRatesExport, 'chunk_size', 3)
+    def test_splits_results_into_chunks(self):
+        chunks = self.get_chunks({'fields': 'id'})
+        self.assertEqual(chunks, [
+            {'id': [3, 1, 4]},
+            {'id': [2]},
+        ])
+
+    def test_empty_results(self):
+        self.assertEqual(self.get_chunks({'q': 'nsfr87y3487h3rufbf'}), [])
+
+    def test_gzips_response_when_accepted(self):
+        resp = self.client.get(self.path, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        chunks = self.get_chunks({}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(len(chunks[0]['id']), Contract.objects.count())
+
+    def test_invalid_field_raises_400(self):
+        resp = self.client.get(self.path, {'fields': 'blarg'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json(), ['"blarg" is not a valid field'])
@@ -0,0 +1,77 @@
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase
+
+from api.replica import is_replica_current
+from calc.routers import REPLICA_DB_ALIAS
+from contracts.models import DataVersion
+from contracts.mommy_recipes import get_contract_recipe
+
+
+RATES_API_PATH = '/api/rates/'
+
+HAS_REPLICA = REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@skipIf(HAS_REPLICA, 'DATABASE_REPLICA_URL is set')
+class NoReplicaTests(TestCase):
+    def test_replica_is_never_current(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(is_replica_current(RequestFactory().get('/')))
+
+
+@skipUnless(HAS_REPLICA, 'DATABASE_REPLICA_URL is not set')
+class ReplicaTests(TestCase):
+    '''
+    These tests use the replica as an independent database, so that
+    they can tell which database the API reads from: the replica has no
+    contracts, while the default database has one.
+    '''
+
+    multi_db = True
+
+    def setUp(self):
+        get_contract_recipe().make(labor_category='engineer')
+
+    def sync_replica(self):
+        version, updated_at = DataVersion.get_current()
+        DataVersion.objects.using(REPLICA_DB_ALIAS).update_or_create(
+            pk=DataVersion.SINGLETON_ID,
+            defaults={'version': version, 'updated_at': updated_at},
+        )
+
+    def get_count(self, path=RATES_API_PATH, **params):
+        res = self.client.get(path, params)
+        self.assertEqual(res.status_code, 200)
+        return res.json()['count']
+
+    def test_reads_from_replica_when_it_is_current(self):
+        self.sync_replica()
+        self.assertEqual(self.get_count(), 0)
+        self.assertEqual(self.get_count(q='engineer'), 0)
+
+    def test_reads_from_default_database_when_replica_lags(self):
+        self.sync_replica()
+        DataVersion.bump()
+        self.assertEqual(self.get_count(), 1)
+
+    def test_reads_from_default_database_when_replica_fails(self):
+        self.sync_replica()
+        get_current = DataVersion.get_current
+
+        def fail_on_replica(using=None):
+            if using == REPLICA_DB_ALIAS:
+                raise DatabaseError('replica is down')
+            return get_current(using)
+
+        with patch.object(DataVersion, 'get_current', fail_on_replica):
+            self.assertEqual(self.get_count(), 1)
+
+    def test_csv_rows_are_streamed_from_replica(self):
+        self.sync_replica()
+        res = self.client.get('/api/rates/csv/')
+        rows = b''.join(res.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(rows), 3)
@@ -1,8 +1,14 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import SimpleTestCase, TestCase
+from rest_framework.renderers import JSONRenderer
 from rest_framework.serializers import ValidationError
 
 from contracts.models import Contract
-from api.serializers import EducationLevelField, ContractSerializer
+from contracts.mommy_recipes import get_contract_recipe
+from api.serializers import (EducationLevelField, ContractSerializer,
+                             ContractValuesSerializer)
 
 
 class EducationLevelFieldTests(SimpleTestCase):
@@ -36,3 +42,42 @@ class ContractListSerializerTests(TestCase):
         serializer.save()
         results = Contract.objects.all().multi_phrase_search('engineer').all()
         self.assertEqual([r.labor_category for r in results], ['Software Engineer'])
+
+
+class ContractValuesSerializerTests(TestCase):
+    def setUp(self):
+        get_contract_recipe().make(_quantity=3)
+        get_contract_recipe().make(education_level=None, sin=None,
+                                   current_price=None)
+
+    def assertRendersLikeContractSerializer(self, fields=None):
+        serializer = ContractValuesSerializer(fields)
+        rows = Contract.objects.all().order_by('id')\
+            .values_list(*serializer.get_columns())
+        expected = ContractSerializer(
+            Contract.objects.all().order_by('id'), many=True, fields=fields)
+        self.assertEqual(
+            JSONRenderer().render(serializer.to_representation(rows)),
+            JSONRenderer().render(expected.data)
+        )
+
+    def test_renders_like_contract_serializer(self):
+        self.assertRendersLikeContractSerializer()
+
+    def test_renders_like_contract_serializer_with_fields(self):
+        self.assertRendersLikeContractSerializer(['sin', 'education_level'])
+
+    def test_ignores_extra_columns(self):
+        serializer = ContractValuesSerializer(['id'])
+        self.assertEqual(serializer.get_columns('current_price', 'id'),
+                         ['id', 'current_price'])
+        self.assertEqual(serializer.to_representation([(1, 5)]),
+                         [{'id': 1}])
+
+
+class BenchmarkRatesSerializerTests(SimpleTestCase):
+    def test_it_works(self):
+        out = StringIO()
+        call_command('benchmark_rates_serializer', rows=10, repeat=1,
+                     stdout=out)
+        self.assertIn('ContractValuesSerializer: ', out.getvalue())
@@ -3,7 +3,12 @@ import unittest
 import random
 import decimal
 
-from api.utils import get_histogram
+from django.test import TestCase
+
+from api.utils import (PercentileCont, get_histogram,
+                       get_histogram_from_queryset)
+from contracts.models import Contract
+from contracts.mommy_recipes import get_contract_recipe
 
 
 class HistogramTests(unittest.TestCase):
@@ -58,3 +63,72 @@ class HistogramTests(unittest.TestCase):
         mn = min(values)
         self.assertEqual(bins[0]['min'], mn)
         self.assertEqual(bins[-1]['max'], mx)
+
+
+class QuerysetHistogramTests(TestCase):
+
+    def make_contracts(self, prices):
+        for price in prices:
+            get_contract_recipe().make(current_price=price)
+        return Contract.objects.all()
+
+    def assertMatchesPythonHistogram(self, prices, num_bins):
+        qs = self.make_contracts(prices)
+        self.assertEqual(
+            get_histogram_from_queryset(qs, 'current_price', num_bins),
+            get_histogram(prices, num_bins)
+        )
+
+    def test_returns_bins_on_empty_queryset(self):
+        bins = get_histogram_from_queryset(
+            Contract.objects.all(), 'current_price', 10)
+        self.assertEqual(bins, get_histogram([], 10))
+
+    def test_raises_on_invalid_num_bins(self):
+        self.assertRaises(
+            ValueError,
+            get_histogram_from_queryset,
+            Contract.objects.all(),
+            'current_price',
+            0
+        )
+
+    def test_when_inputs_are_same_value(self):
+        self.assertMatchesPythonHistogram([5, 5, 5], 2)
+
+    def test_simple_histogram(self):
+        self.assertMatchesPythonHistogram([1, 2, 3], 3)
+
+    def test_max_value_goes_in_last_bin(self):
+        self.assertMatchesPythonHistogram([16, 18, 24, 50], 2)
+
+    def test_bigger_histogram(self):
+        prices = [decimal.Decimal(random.randrange(1000, 10000)) / 100
+                  for _ in range(50)]
+        qs = self.make_contracts(prices)
+        bins = get_histogram_from_queryset(qs, 'current_price', 12)
+        self.assertEqual(len(bins), 12)
+        self.assertEqual(sum(b['count'] for b in bins), len(prices))
+        self.assertAlmostEqual(bins[0]['min'], float(min(prices)))
+        self.assertAlmostEqual(bins[-1]['max'], float(max(prices)))
+
+    def test_uses_given_minimum_and_maximum(self):
+        qs = self.make_contracts([10, 20, 30])
+        with self.assertNumQueries(1):
+            bins = get_histogram_from_queryset(
+                qs, 'current_price', 2, minimum=10, maximum=30)
+        self.assertEqual([b['count'] for b in bins], [1, 2])
+
+
+class PercentileContTests(TestCase):
+
+    def test_computes_percentiles(self):
+        for price in [10, 20, 30, 40]:
+            get_contract_recipe().make(current_price=price)
+        result = Contract.objects.aggregate(
+            PercentileCont('current_price', [0.5, 0.1]))
+        self.assertEqual(result['current_price__percentiles'], [25.0, 13.0])
+
+    def test_raises_on_invalid_fractions(self):
+        with self.assertRaises(ValueError):
+            PercentileCont('current_price', [0.5, 50])
@@ -7,6 +7,8 @@ from api import views
 urlpatterns = [
     url(r'^rates/$', views.GetRates.as_view()),
     url(r'^rates/csv/$', views.GetRatesCSV.as_view()),
+    url(r'^rates/export/$', views.GetRatesExport.as_view()),
+    url(r'^rates/batch/$', views.GetRatesBatch.as_view()),
     url(r'^search/$', views.GetAutocomplete.as_view()),
     url(r'^schedules/$', views.ScheduleMetadataList.as_view()),
     url(r'^docs/', include_docs_urls(
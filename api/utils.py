@@ -1,4 +1,108 @@
-from typing import List, SupportsFloat
+from typing import List, Optional, SupportsFloat, Tuple
+
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import (Aggregate, Count, FloatField, Func,
+                              IntegerField, Max, Min, Value)
+from django.db.models.functions import Cast, Greatest, Least
+
+
+class WidthBucket(Func):
+    '''
+    Postgres' `width_bucket(operand, low, high, count)`, which returns
+    the 1-based number of the equal-width bucket the operand falls in.
+    Values equal to `high` are placed in bucket `count + 1`.
+    '''
+
+    function = 'width_bucket'
+    arity = 4
+
+    def __init__(self, *expressions, **extra):
+        extra.setdefault('output_field', IntegerField())
+        super().__init__(*expressions, **extra)
+
+
+class PercentileCont(Aggregate):
+    '''
+    Postgres' `percentile_cont(fractions) WITHIN GROUP (ORDER BY
+    expression)` aggregate, which returns an array of the continuous
+    percentiles of the expression at each of the given fractions
+    (between 0 and 1), interpolating between values as needed.
+    '''
+
+    function = 'percentile_cont'
+    name = 'Percentiles'
+    template = ('%(function)s(%(fractions)s) '
+                'WITHIN GROUP (ORDER BY %(expressions)s)')
+
+    def __init__(self, expression, fractions: List[float], **extra) -> None:
+        extra.setdefault('output_field', ArrayField(FloatField()))
+        super().__init__(
+            expression, fractions=get_fractions_sql(fractions), **extra)
+
+
+def get_fractions_sql(fractions: List[float]) -> str:
+    '''
+    Return an SQL array literal of the given fractions, for
+    `percentile_cont()`:
+
+        >>> get_fractions_sql([0.5, 0.9])
+        'ARRAY[0.5, 0.9]::float8[]'
+    '''
+
+    for fraction in fractions:
+        if not 0 <= fraction <= 1:
+            raise ValueError('fractions must be between 0 and 1')
+    return 'ARRAY[' + ', '.join(repr(float(f)) for f in fractions) + \
+        ']::float8[]'
+
+
+def get_histogram_range(minimum: Optional[SupportsFloat],
+                        maximum: Optional[SupportsFloat]) -> Tuple[float, float]:
+    '''
+    Return the (min, max) range a histogram of values with the given
+    minimum and maximum should span.
+
+    When there are no values, we can't determine the range so we use
+    0.0 - 1.0 as numpy.histogram does:
+
+        >>> get_histogram_range(None, None)
+        (0.0, 1.0)
+
+    If the minimum and maximum are equivalent (ie, the input values are
+    all the same number), the range is widened around that number:
+
+        >>> get_histogram_range(5, 5)
+        (4.5, 5.5)
+    '''
+
+    if minimum is None or maximum is None:
+        return 0.0, 1.0
+
+    mn, mx = float(minimum), float(maximum)
+
+    if (mn == mx):
+        mn -= 0.5
+        mx += 0.5
+
+    return mn, mx
+
+
+def make_histogram_bins(mn: float, mx: float, num_bins: int) -> List[dict]:
+    '''
+    Return a list of `num_bins` empty "bin" dicts of equal width
+    spanning the given range.
+    '''
+
+    if (num_bins <= 0):
+        raise ValueError('num_bins must be greater than 0')
+
+    bin_width = (mx - mn) / num_bins
+
+    return [{
+        'min': mn + bin_width * i,
+        'max': mn + bin_width * (i + 1),
+        'count': 0
+    } for i in range(0, num_bins)]
 
 
 def get_histogram(values: List[SupportsFloat], num_bins: int=10) -> List[dict]:
@@ -13,28 +117,14 @@ def get_histogram(values: List[SupportsFloat], num_bins: int=10) -> List[dict]:
     # convert values to floats
     fvalues = [float(v) for v in values]
 
-    # When input array is empty, can't determine range so use 0.0 - 1.0
-    # as numpy.histogram does
     if (len(fvalues) == 0):
-        mn, mx = 0.0, 1.0
+        mn, mx = get_histogram_range(None, None)
     else:
         # find the min and max
-        mn, mx = min(fvalues), max(fvalues)
-
-    # Adjust mn and mx if they are equivalent (ie, the input array
-    # values are all the same number)
-    if (mn == mx):
-        mn -= 0.5
-        mx += 0.5
-
-    bin_width = (mx - mn) / num_bins
+        mn, mx = get_histogram_range(min(fvalues), max(fvalues))
 
     # initialize the bins
-    bins = [{
-        'min': mn + bin_width * i,
-        'max': mn + bin_width * (i + 1),
-        'count': 0
-    } for i in range(0, num_bins)]
+    bins = make_histogram_bins(mn, mx, num_bins)
 
     # bin the values
     for val in fvalues:
@@ -46,3 +136,58 @@ def get_histogram(values: List[SupportsFloat], num_bins: int=10) -> List[dict]:
             b['count'] += 1
 
     return bins
+
+
+def get_histogram_from_queryset(queryset, field: str, num_bins: int=10,
+                                minimum: Optional[SupportsFloat]=None,
+                                maximum: Optional[SupportsFloat]=None
+                                ) -> List[dict]:
+    """
+    Get a histogram of the values of the given field in a queryset.
+
+    This returns the same bins as get_histogram(), but the values are
+    binned by the database (via `width_bucket`) and only the per-bin
+    counts are sent back, rather than every value in the queryset.
+
+    If the minimum and maximum values of the field are already known,
+    they can be passed in to avoid an extra query.
+    """
+
+    if (num_bins <= 0):
+        raise ValueError('num_bins must be greater than 0')
+
+    # Clear any ordering, as it would otherwise end up in the GROUP BY.
+    queryset = queryset.order_by()
+
+    if minimum is None and maximum is None:
+        stats = queryset.aggregate(Min(field), Max(field))
+        minimum, maximum = stats[field + '__min'], stats[field + '__max']
+
+    mn, mx = get_histogram_range(minimum, maximum)
+    bins = make_histogram_bins(mn, mx, num_bins)
+
+    if minimum is None or maximum is None:
+        # There are no values to count.
+        return bins
+
+    # Values equal to the max go in the last bin rather than in the
+    # overflow bucket width_bucket() would put them in; we also clamp
+    # at the low end in case the data changed since the min was taken.
+    bucket = Greatest(Least(
+        WidthBucket(
+            Cast(field, FloatField()),
+            Cast(Value(mn), FloatField()),
+            Cast(Value(mx), FloatField()),
+            Value(num_bins)
+        ),
+        Value(num_bins),
+        output_field=IntegerField()
+    ), Value(1), output_field=IntegerField())
+
+    counts = queryset.annotate(bucket=bucket).values('bucket')\
+        .annotate(count=Count('id')).order_by()
+
+    for row in counts:
+        bins[row['bucket'] - 1]['count'] = row['count']
+
+    return bins
@@ -1,24 +1,42 @@
 import bleach
 import csv
+from collections import OrderedDict
 from decimal import Decimal
+from itertools import chain, islice
 from textwrap import dedent
+from typing import Iterator
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import QueryDict, StreamingHttpResponse
 from django.db.models import Avg, Max, Min, Count, StdDev
+from django.utils.decorators import method_decorator
 from django.utils.safestring import SafeString
+from django.views.decorators.gzip import gzip_page
 
 from markdown import markdown
 from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.schemas import AutoSchema
 from rest_framework.compat import coreapi, coreschema
 from rest_framework import generics
-
-from api.pagination import ContractPagination
-from api.serializers import ContractSerializer, ScheduleMetadataSerializer
-from api.utils import get_histogram
-from contracts.models import Contract, EDUCATION_CHOICES, ScheduleMetadata
+from rest_framework.settings import api_settings
+
+from api.autocomplete import get_autocomplete_index
+from api.budget import (check_query_cost, check_search_budget,
+                        limit_statement_time)
+from api.caching import cache_response, conditional_response
+from api.pagination import ContractCursorPagination, ContractPagination
+from api.renderers import ColumnarJSONRenderer
+from api.replica import read_from_replica
+from api.queries import (BatchRatesQuery, CombinedRatesQuery, PrefetchedPage,
+                         RollupStatsQuery)
+from api.serializers import (ContractSerializer, ContractValuesSerializer,
+                             RatesBatchSerializer, ScheduleMetadataSerializer)
+from api.utils import PercentileCont, get_histogram_from_queryset
+from contracts.models import (Contract, EDUCATION_CHOICES, RateRollup,
+                              ScheduleMetadata)
 from calc.utils import humanlist, backtickify
 
 
@@ -169,52 +187,66 @@ GET_CONTRACTS_QUERYARGS = [
     )
 ]
 
+FIELDS_QUERYARG = queryarg(
+    "fields",
+    str,
+    f"""
+    Comma-separated list of the fields to include in each result.
+    Defaults to all of them.
 
-def get_contracts_queryset(request_params, wage_field):
+    Fields include {humanlist(backtickify(ALL_CONTRACT_FIELDS))}.
     """
-    Filters and returns contracts based on query params
+)
 
-    Args:
-        request_params (dict): the request query parameters, corresponding
-            to GET_CONTRACTS_QUERYARGS above.
-        wage_field (str): the name of the field currently being used for
-            wage calculations and sorting
 
-    Returns:
-        QuerySet: a filtered and sorted QuerySet to retrieve Contract objects
+def get_requested_fields(request_params):
+    """
+    Returns the contract fields requested via the `fields` query
+    param, or None if all of them should be returned.
     """
+    fields = request_params.get('fields', None)
+    if not fields:
+        return None
 
-    query = request_params.get('q', None)
-    # Ideally we'd go ahead and return a plain queryset here if there is
-    # no query to avoid doing extra work, but before we can do that
-    # we'll have to ensure filtering fields can't do anything in the absence
-    # of a query or else Very Strange Things happen.
+    fields = fields.split(',')
+    for field in fields:
+        if field not in ALL_CONTRACT_FIELDS:
+            raise serializers.ValidationError(f'"{field}" is not a valid field')
 
-    # Since our query can be multi-phrase, leave the original queryset alone.
-    # Instead, start with an empty queryset, then find matching subsets
-    # in the original and chain them together.
-    if query:
-        query_type = request_params.get('query_type', 'match_all')
-        query_by = request_params.get('query_by', None)
-        contracts = Contract.objects.all().multi_phrase_search(
-            query, query_by, query_type)
-    else:  # no query, so start with full query set
-        contracts = Contract.objects.all()
+    return fields
 
-    # Exclude records w/o rates for the selected contract period.
-    # Additional price filtering is already in the CurrentContractManager
-    contracts = contracts.exclude(**{wage_field + '__isnull': True})
 
-    exclude = request_params.getlist('exclude')
-    if exclude:
-        # getlist only works for key=val&key=val2, not for key=val1,val2
-        # this is safe because any non-integer value in the request params
-        # wouldn't match id__in anyway.
+def get_requested_percentiles(request_params):
+    """
+    Returns the percentiles (between 0 and 100) requested via the
+    `percentiles` query param, or None if none were requested.
+    """
+    percentiles = request_params.get('percentiles', None)
+    if not percentiles:
+        return None
 
-        # TO-DO: take a list of phrases, pass them through
-        # `clean_search` and then exclude those phrases
-        exclude = exclude[0].split(',')
-        contracts = contracts.exclude(id__in=exclude)
+    result = []
+    for percentile in percentiles.split(','):
+        try:
+            value = float(percentile)
+        except ValueError:
+            value = -1
+        if not 0 <= value <= 100:
+            raise serializers.ValidationError(
+                f'"{percentile}" is not a valid percentile')
+        result.append(value)
+
+    return result
+
+
+def filter_by_rate_attributes(contracts, request_params):
+    """
+    Filters contracts by the experience, education, schedule and
+    business size query params.
+
+    This also works on rate rollups, which have the same fields for
+    these attributes as contracts do.
+    """
 
     # *** EXPERIENCE ***
     min_experience = request_params.get('min_experience', None)
@@ -252,11 +284,6 @@ def get_contracts_queryset(request_params, wage_field):
         schedule = bleach.clean(schedule)
         contracts = contracts.filter(schedule__iexact=schedule)
 
-    site = request_params.get('site', None)
-    if site:
-        site = bleach.clean(site)
-        contracts = contracts.filter(contractor_site__icontains=site)
-
     business_size = request_params.get('business_size', None)
     if business_size and business_size in ('s', 'o'):
         if business_size == 's':
@@ -264,11 +291,68 @@ def get_contracts_queryset(request_params, wage_field):
         else:
             contracts = contracts.filter(business_size__istartswith='o')
 
+    return contracts
+
+
+def get_contracts_queryset(request_params, wage_field):
+    """
+    Filters and returns contracts based on query params
+
+    Args:
+        request_params (dict): the request query parameters, corresponding
+            to GET_CONTRACTS_QUERYARGS above.
+        wage_field (str): the name of the field currently being used for
+            wage calculations and sorting
+
+    Returns:
+        QuerySet: a filtered and sorted QuerySet to retrieve Contract objects
+    """
+
+    query = request_params.get('q', None)
+    # Ideally we'd go ahead and return a plain queryset here if there is
+    # no query to avoid doing extra work, but before we can do that
+    # we'll have to ensure filtering fields can't do anything in the absence
+    # of a query or else Very Strange Things happen.
+
+    # Since our query can be multi-phrase, leave the original queryset alone.
+    # Instead, start with an empty queryset, then find matching subsets
+    # in the original and chain them together.
+    if query:
+        check_search_budget(query)
+        query_type = request_params.get('query_type', 'match_all')
+        query_by = request_params.get('query_by', None)
+        contracts = Contract.objects.all().multi_phrase_search(
+            query, query_by, query_type)
+    else:  # no query, so start with full query set
+        contracts = Contract.objects.all()
+
+    # Exclude records w/o rates for the selected contract period.
+    # Additional price filtering is already in the CurrentContractManager
+    contracts = contracts.exclude(**{wage_field + '__isnull': True})
+
+    exclude = request_params.getlist('exclude')
+    if exclude:
+        # getlist only works for key=val&key=val2, not for key=val1,val2
+        # this is safe because any non-integer value in the request params
+        # wouldn't match id__in anyway.
+
+        # TO-DO: take a list of phrases, pass them through
+        # `clean_search` and then exclude those phrases
+        exclude = exclude[0].split(',')
+        contracts = contracts.exclude(id__in=exclude)
+
+    contracts = filter_by_rate_attributes(contracts, request_params)
+
+    site = request_params.get('site', None)
+    if site:
+        site = bleach.clean(site)
+        contracts = contracts.filter(contractor_site__trigram_icontains=site)
+
     # WE NEED TO DOUBLE CHECK SIN AND PRICE.
     # THEY DO NOT APPEAR TO BE ON THE SEARCH PAGE.
     sin = request_params.get('sin', None)
     if sin:
-        contracts = contracts.filter(sin__icontains=sin)
+        contracts = contracts.filter(sin__trigram_icontains=sin)
 
     price = request_params.get('price', None)
     price__gte = request_params.get('price__gte')
@@ -291,7 +375,54 @@ def get_contracts_queryset(request_params, wage_field):
         if field not in SORTABLE_CONTRACT_FIELDS:
             raise serializers.ValidationError(f'Unable to sort on the field "{field}"')
 
-    return contracts.order_by(*sort)
+    # Contracts that tie on the sort fields are ordered by id, so that
+    # pages are the same however the query is planned.
+    contracts = contracts.order_by(*sort, 'id')
+
+    if query:
+        check_query_cost(contracts)
+
+    return contracts
+
+
+POSSIBLE_WAGE_FIELDS = ['current_price', 'next_year_price', 'second_year_price']
+
+
+def get_wage_field(request_params):
+    year = request_params.get('contract-year', 0)
+    return POSSIBLE_WAGE_FIELDS[int(year)]
+
+
+def get_fractions(percentiles):
+    if not percentiles:
+        return None
+    return [percentile / 100 for percentile in percentiles]
+
+
+# Query params that filter contracts by something that rate rollups
+# don't keep track of.
+ROLLUP_UNSUPPORTED_PARAMS = ('query_by', 'site', 'sin', 'price',
+                             'price__gte', 'price__lte')
+
+
+def get_rollup_queryset(request_params, wage_field):
+    """
+    Returns the rate rollups that summarize the contracts that
+    get_contracts_queryset() returns for the same query params, or None
+    if the query params filter contracts in ways that rollups can't.
+    """
+    if request_params.getlist('exclude') or any(
+            request_params.get(param) for param in ROLLUP_UNSUPPORTED_PARAMS):
+        return None
+
+    rollups = RateRollup.objects.filter(wage_field=wage_field)
+
+    query = request_params.get('q', None)
+    if query:
+        query_type = request_params.get('query_type', 'match_all')
+        rollups = rollups.multi_phrase_search(query, query_type)
+
+    return filter_by_rate_attributes(rollups, request_params)
 
 
 def quantize(num, precision=2):
@@ -336,6 +467,13 @@ class GetRates(APIView):
         * `business_size` is the business size of the vendor
             offering the labor rate.
 
+        The `fields` query parameter can be used to only include
+        some of these keys.
+
+        If `format=columnar` is passed, `results` is instead an object
+        that maps each of these keys to an array of its values for
+        every result on the page, in order.
+
     Additionally, the response contains aggregate details about
     the distribution of the search results, across all pages:
 
@@ -351,12 +489,20 @@ class GetRates(APIView):
         * `min` is the minimum price of the bin.
         * `max` is the maximum price of the bin.
         * `count` is the number of prices in the bin.
+    * `percentiles` is only included if percentiles of the prices
+      were requested via the `percentiles` query parameter. It is an
+      object that maps each of the requested percentiles to the price
+      at that percentile, e.g. `{"50": 48.5}` for the median.
     """
 
     # The AutoSchema will introspect this to ultimately generate
     # documentation about our pagination query args.
     pagination_class = ContractPagination
 
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [
+        ColumnarJSONRenderer,
+    ]
+
     schema = AutoSchema(
         manual_fields=[
             queryarg(
@@ -375,11 +521,40 @@ class GetRates(APIView):
                 If not provided, no histogram data will be returned.
                 """
             ),
+            queryarg(
+                "cursor",
+                str,
+                """
+                Paginate by cursor rather than by page number, which
+                keeps deep pages fast. Pass an empty cursor to get the
+                first page, then follow the `next` link of each page to
+                get the one after it.
+
+                Only the first page includes the count and price
+                statistics of the results.
+                """
+            ),
+            queryarg(
+                "percentiles",
+                str,
+                """
+                Comma-separated list of percentiles (between 0 and 100)
+                of the prices to return, e.g. `25,50,75,90`.
+                If not provided, no percentiles will be returned.
+                """
+            ),
+            FIELDS_QUERYARG,
         ] + GET_CONTRACTS_QUERYARGS
     )
 
+    @conditional_response
+    @cache_response
+    @read_from_replica
+    @limit_statement_time
     def get(self, request):
         bins = request.query_params.get('histogram', None)
+        num_bins = int(bins) if bins and bins.isnumeric() else None
+        percentiles = get_requested_percentiles(request.query_params)
 
         """
         wage_field determines prices for a given year:
@@ -389,15 +564,121 @@ class GetRates(APIView):
         This is used both here in get() and downstream in get_query_set(),
         so we have to pass it through.
         """
-        possible_wage_fields = ['current_price', 'next_year_price', 'second_year_price']
-        year = request.query_params.get('contract-year', 0)
-        wage_field = possible_wage_fields[int(year)]
+        wage_field = get_wage_field(request.query_params)
         contracts_all = self.get_queryset(request.query_params, wage_field)
 
-        stats = contracts_all.aggregate(
-            Min(wage_field), Max(wage_field),
-            Avg(wage_field), StdDev(wage_field))
-
+        fields = get_requested_fields(request.query_params)
+        if fields is not None:
+            # Only load the requested columns, plus the wage field that
+            # the price statistics are computed from.
+            contracts_all = contracts_all.only(wage_field, *fields)
+
+        if ContractCursorPagination.cursor_query_param in request.query_params:
+            return self.get_cursor_page(
+                request, contracts_all, wage_field, num_bins, fields,
+                percentiles)
+
+        pagination = self.pagination_class()
+        offset = pagination.get_page_offset(request)
+        wage_histogram = None
+
+        values_serializer = None
+        contracts_rows = contracts_all
+        if settings.API_RATES_FAST_SERIALIZER:
+            # Serialize the page straight from tuples of its values,
+            # rather than from model instances.
+            values_serializer = ContractValuesSerializer(fields)
+            contracts_rows = contracts_all.values_list(
+                *values_serializer.get_columns(wage_field))
+
+        rollups = None
+        if settings.API_RATES_USE_ROLLUPS and offset is not None \
+                and not percentiles:
+            rollups = get_rollup_queryset(request.query_params, wage_field)
+
+        if rollups is not None:
+            # Get the count and the stats from the rollups, so that only
+            # the page of contracts needs to be fetched.
+            result = RollupStatsQuery(rollups, wage_field, num_bins).execute()
+            stats = result.stats
+            wage_histogram = result.wage_histogram
+            rows: list = []
+            if offset < result.count:
+                rows = list(
+                    contracts_rows[offset:offset + pagination.page_size])
+            contracts_page = PrefetchedPage(rows, result.count, offset)
+        elif settings.API_RATES_SINGLE_QUERY and offset is not None:
+            # Fetch the page, the count, and the stats all at once, and
+            # hand the prefetched page to the paginator.
+            result = CombinedRatesQuery(
+                contracts_rows, wage_field, num_bins,
+                get_fractions(percentiles)
+            ).execute(offset, pagination.page_size)
+            stats = result.stats
+            wage_histogram = result.wage_histogram
+            contracts_page = PrefetchedPage(result.rows, result.count, offset)
+        else:
+            stats = contracts_all.aggregate(
+                *self.get_stats_aggregates(wage_field, percentiles))
+            contracts_page = contracts_rows
+
+        page_stats = self.get_page_stats(
+            contracts_all, wage_field, stats, num_bins, wage_histogram,
+            percentiles)
+
+        pagination.context = page_stats
+        results = pagination.paginate_queryset(contracts_page, request)
+        data = self.serialize_results(
+            request, results, fields, values_serializer)
+        return pagination.get_paginated_response(data)
+
+    def get_cursor_page(self, request, contracts_all, wage_field, num_bins,
+                        fields=None, percentiles=None):
+        sort = request.query_params.get('sort', wage_field).split(',')
+        pagination = ContractCursorPagination()
+        results = pagination.paginate_queryset(contracts_all, request, sort)
+
+        if pagination.is_first_page:
+            stats = contracts_all.aggregate(
+                Count('id'), *self.get_stats_aggregates(wage_field, percentiles))
+            pagination.count = stats['id__count']
+            pagination.context = self.get_page_stats(
+                contracts_all, wage_field, stats, num_bins,
+                percentiles=percentiles)
+
+        data = self.serialize_results(request, results, fields)
+        return pagination.get_paginated_response(data)
+
+    def serialize_results(self, request, results, fields,
+                          values_serializer=None):
+        columnar = isinstance(request.accepted_renderer, ColumnarJSONRenderer)
+
+        if values_serializer is not None:
+            if columnar:
+                return values_serializer.to_columns(results)
+            return values_serializer.to_representation(results)
+
+        serializer = ContractSerializer(results, many=True, fields=fields)
+        data = serializer.data
+        if columnar:
+            return OrderedDict(
+                (name, [result[name] for result in data])
+                for name in serializer.child.fields
+            )
+        return data
+
+    @staticmethod
+    def get_stats_aggregates(wage_field, percentiles=None):
+        aggregates = [Min(wage_field), Max(wage_field),
+                      Avg(wage_field), StdDev(wage_field)]
+        if percentiles:
+            aggregates.append(
+                PercentileCont(wage_field, get_fractions(percentiles)))
+        return aggregates
+
+    @staticmethod
+    def get_page_stats(contracts_all, wage_field, stats, num_bins,
+                       wage_histogram=None, percentiles=None):
         page_stats = {
             'minimum': stats[wage_field + '__min'],
             'maximum': stats[wage_field + '__max'],
@@ -407,14 +688,24 @@ class GetRates(APIView):
             )
         }
 
-        if bins and bins.isnumeric():
-            values = contracts_all.values_list(wage_field, flat=True)
-            page_stats['wage_histogram'] = get_histogram(values, int(bins))
+        if num_bins is not None:
+            if wage_histogram is None:
+                wage_histogram = get_histogram_from_queryset(
+                    contracts_all, wage_field, num_bins,
+                    minimum=page_stats['minimum'],
+                    maximum=page_stats['maximum'],
+                )
+            page_stats['wage_histogram'] = wage_histogram
+
+        if percentiles:
+            values = stats[wage_field + '__percentiles'] or \
+                [None] * len(percentiles)
+            page_stats['percentiles'] = OrderedDict(
+                (f'{percentile:g}', quantize(value))
+                for percentile, value in zip(percentiles, values)
+            )
 
-        pagination = self.pagination_class(page_stats)
-        results = pagination.paginate_queryset(contracts_all, request)
-        serializer = ContractSerializer(results, many=True)
-        return pagination.get_paginated_response(serializer.data)
+        return page_stats
 
     def get_queryset(self, request, wage_field):
         return get_contracts_queryset(request, wage_field)
@@ -435,6 +726,100 @@ class ScheduleMetadataList(generics.ListAPIView):
     queryset = ScheduleMetadata.objects.all()
     serializer_class = ScheduleMetadataSerializer
 
+    @conditional_response
+    @cache_response
+    @read_from_replica
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class GetRatesBatch(APIView):
+    """
+    Get the price statistics, and optionally the first page of results,
+    of many labor rate searches at once.
+
+    The request body is a JSON object with the following keys:
+
+    * `queries` is an array of up to 100 objects, each of which contains
+      the query parameters of a search, as they would be passed to
+      [/api/rates/](/api/rates/), e.g. `{"q": "engineer", "min_education":
+      "BA"}`.
+    * `histogram` (optional) is the number of bins to divide a wage
+      histogram of each search into.
+    * `percentiles` (optional) is an array of percentiles (between 0 and
+      100) of the prices of each search to return.
+    * `fields` (optional) is an array of the fields to include in each
+      result.
+    * `page_size` (optional) is the number of results of each search to
+      return. Defaults to 0.
+
+    The JSON response is an array that contains an object for each
+    search, in the order they were given in. Each object contains the
+    `count` and price statistics of the search, as described at
+    [/api/rates/](/api/rates/), along with its `results` if `page_size`
+    isn't 0.
+
+    The searches are all run in a single SQL statement.
+    """
+
+    # The request doesn't change anything, so there's no need for
+    # the CSRF protection that session authentication would enforce.
+    authentication_classes: list = []
+
+    @read_from_replica
+    @limit_statement_time
+    def post(self, request, format=None):
+        serializer = RatesBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        batch = serializer.validated_data
+        num_bins = batch.get('histogram')
+        percentiles = batch.get('percentiles') or None
+        page_size = batch['page_size']
+
+        values_serializer = ContractValuesSerializer(batch.get('fields'))
+        columns = values_serializer.get_columns(*POSSIBLE_WAGE_FIELDS)
+        queries = []
+        for query in batch['queries']:
+            params = QueryDict(mutable=True)
+            params.update(query)
+            wage_field = get_wage_field(params)
+            contracts = get_contracts_queryset(params, wage_field)
+            queries.append(CombinedRatesQuery(
+                contracts.values_list(*columns), wage_field, num_bins,
+                get_fractions(percentiles)
+            ))
+
+        data = []
+        for query, result in zip(queries, BatchRatesQuery(queries).execute(page_size)):
+            pagination = ContractPagination(GetRates.get_page_stats(
+                query.queryset, query.wage_field, result.stats, num_bins,
+                result.wage_histogram, percentiles))
+            item = OrderedDict([('count', result.count)] + pagination.get_stats())
+            if page_size:
+                item['results'] = values_serializer.to_representation(
+                    result.rows)
+            data.append(item)
+
+        return Response(data)
+
+
+CSV_CONTRACT_FIELDS = (
+    'idv_piid', 'business_size', 'schedule', 'contractor_site',
+    'contract_start', 'contract_end', 'sin', 'vendor_name', 'labor_category',
+    'education_level', 'min_years_experience', 'current_price',
+    'next_year_price', 'second_year_price',
+)
+
+
+class Echo():
+    '''
+    A file-like object that just returns what is written to it, so that
+    a csv.writer can produce the rows of a streaming response.
+    '''
+
+    def write(self, value):
+        return value
+
 
 class GetRatesCSV(APIView):
     """
@@ -449,9 +834,13 @@ class GetRatesCSV(APIView):
         manual_fields=GET_CONTRACTS_QUERYARGS
     )
 
+    @read_from_replica
     def get(self, request, format=None):
         wage_field = 'current_price'
         contracts_all = get_contracts_queryset(request.GET, wage_field)
+        # The rows are streamed after this method returns, so they need
+        # to be read from the database it would have read them from.
+        contracts_all = contracts_all.using(contracts_all.db)
 
         q = request.query_params.get('q', 'None')
 
@@ -478,32 +867,100 @@ class GetRatesCSV(APIView):
         if business_size_set:
             business_size = business_size_set
 
-        response = HttpResponse(content_type="text/csv")
+        header_rows = [
+            ("Search Query", "Minimum Education Level",
+             "Minimum Years Experience", "Worksite",
+             "Business Size", "", "", "", "", "", "", "", "", ""),
+            (q, min_education, min_experience, site,
+             business_size, "", "", "", "", "", "", "", "", ""),
+            ("Contract #", "Business Size", "Schedule", "Site",
+             "Begin Date", "End Date", "SIN", "Vendor Name",
+             "Labor Category", "education Level",
+             "Minimum Years Experience",
+             "Current Year Labor Price", "Next Year Labor Price",
+             "Second Year Labor Price"),
+        ]
+
+        writer = csv.writer(Echo())
+        rows = chain(header_rows, self.iter_contract_rows(contracts_all))
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in rows),  # type: ignore
+            content_type="text/csv"
+        )
         response['Content-Disposition'] = ('attachment; '
                                            'filename="pricing_results.csv"')
-        writer = csv.writer(response)
-        writer.writerow(("Search Query", "Minimum Education Level",
-                         "Minimum Years Experience", "Worksite",
-                         "Business Size", "", "", "", "", "", "", "", "", ""))
-        writer.writerow((q, min_education, min_experience, site,
-                         business_size, "", "", "", "", "", "", "", "", ""))
-        writer.writerow(("Contract #", "Business Size", "Schedule", "Site",
-                         "Begin Date", "End Date", "SIN", "Vendor Name",
-                         "Labor Category", "education Level",
-                         "Minimum Years Experience",
-                         "Current Year Labor Price", "Next Year Labor Price",
-                         "Second Year Labor Price"))
-
-        for c in contracts_all:
-            writer.writerow((c.idv_piid, c.get_readable_business_size(),
-                             c.schedule, c.contractor_site, c.contract_start,
-                             c.contract_end, c.sin, c.vendor_name,
-                             c.labor_category, c.get_education_level_display(),
-                             c.min_years_experience, c.current_price,
-                             c.next_year_price, c.second_year_price))
-
         return response
 
+    @staticmethod
+    def iter_contract_rows(contracts_all):
+        '''
+        Yield a CSV row for each of the given contracts, without loading
+        them all into memory: rows are fetched in batches via a
+        server-side cursor, as tuples rather than model instances.
+        '''
+
+        education_levels = dict(EDUCATION_CHOICES)
+        business_sizes = {None: None}
+
+        for row in contracts_all.values_list(*CSV_CONTRACT_FIELDS).iterator():
+            (idv_piid, business_size, schedule, contractor_site,
+             contract_start, contract_end, sin, vendor_name, labor_category,
+             education_level, min_years_experience, current_price,
+             next_year_price, second_year_price) = row
+            if business_size not in business_sizes:
+                business_sizes[business_size] = \
+                    Contract.get_readable_business_size_for(business_size)
+            yield (idv_piid, business_sizes[business_size], schedule,
+                   contractor_site, contract_start, contract_end, sin,
+                   vendor_name, labor_category,
+                   education_levels.get(education_level, education_level),
+                   min_years_experience, current_price, next_year_price,
+                   second_year_price)
+
+
+class GetRatesExport(APIView):
+    """
+    Returns every rate that matches a search query, for bulk consumers
+    of CALC's data, as newline-delimited JSON.
+
+    Each line is a JSON object that contains a chunk of the results in
+    columnar form: it maps each of the fields of
+    [/api/rates/](/api/rates/) results (or only the fields passed via
+    the `fields` query parameter) to an array of their values for every
+    result in the chunk, in order.
+
+    The response is gzip-compressed for clients that accept it.
+    """
+
+    chunk_size = 10000
+
+    schema = AutoSchema(
+        manual_fields=[FIELDS_QUERYARG] + GET_CONTRACTS_QUERYARGS
+    )
+
+    @method_decorator(gzip_page)
+    @read_from_replica
+    def get(self, request, format=None):
+        wage_field = 'current_price'
+        contracts_all = get_contracts_queryset(request.query_params, wage_field)
+        # The rows are streamed after this method returns, so they need
+        # to be read from the database it would have read them from.
+        contracts_all = contracts_all.using(contracts_all.db)
+        values_serializer = ContractValuesSerializer(
+            get_requested_fields(request.query_params))
+
+        rows = contracts_all.values_list(
+            *values_serializer.get_columns()).iterator()
+        chunks: Iterator[list] = iter(
+            lambda: list(islice(rows, self.chunk_size)), [])
+        renderer = JSONRenderer()
+
+        return StreamingHttpResponse(
+            (renderer.render(values_serializer.to_columns(chunk)) + b'\n'
+             for chunk in chunks),
+            content_type='application/x-ndjson'
+        )
+
 
 class GetAutocomplete(APIView):
     """
@@ -534,12 +991,19 @@ class GetAutocomplete(APIView):
 
     MAX_RESULTS = 20
 
+    @cache_response
+    @read_from_replica
+    @limit_statement_time
     def get(self, request, format=None):
         q = request.query_params.get('q', False)
         query_type = request.query_params.get('query_type', 'match_all')
         query_by = request.query_params.get('query_by', None)
 
-        if q:
+        if q and not query_by:
+            return Response(get_autocomplete_index().search(
+                q, query_type, limit=self.MAX_RESULTS))
+        elif q:
+            check_search_budget(q)
             data = Contract.objects.all().multi_phrase_search(
                 q, query_by, query_type)
 
@@ -0,0 +1,54 @@
+'''
+Helpers for reusing database connections across requests and jobs.
+
+Django keeps each thread's database connections open for up to
+CONN_MAX_AGE seconds. Because gunicorn's sync workers handle one request
+at a time, this gives each worker process a pool of one connection per
+database, so the size of the pool is the number of workers.
+'''
+
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+def mark_connections_used() -> None:
+    '''
+    Note that this thread's open database connections were just used.
+    '''
+
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is not None:
+            conn.calc_last_used = now
+
+
+def close_stale_connections() -> None:
+    '''
+    Close this thread's open database connections that have been idle
+    for longer than settings.DATABASE_CONN_IDLE_TIMEOUT seconds, that
+    are broken, or that are older than their CONN_MAX_AGE, so that the
+    next query opens a new connection rather than failing.
+
+    If settings.DATABASE_CONN_PRE_PING is True, connections are checked
+    with a trivial query, which notices connections that the database
+    (or the network between us) dropped while they were idle. Otherwise,
+    only connections that Django has seen errors on are checked.
+
+    Connections in the middle of a transaction are left alone.
+    '''
+
+    now = time.monotonic()
+    idle_timeout = settings.DATABASE_CONN_IDLE_TIMEOUT
+    for conn in connections.all():
+        if conn.connection is None or conn.in_atomic_block:
+            continue
+        last_used = getattr(conn, 'calc_last_used', None)
+        if idle_timeout is not None and last_used is not None and \
+                now - last_used > idle_timeout:
+            conn.close()
+        elif settings.DATABASE_CONN_PRE_PING and not conn.is_usable():
+            conn.close()
+        else:
+            conn.close_if_unusable_or_obsolete()
@@ -2,6 +2,8 @@ from django.conf import settings
 from django.core.exceptions import MiddlewareNotUsed
 from debug_toolbar.middleware import DebugToolbarMiddleware
 
+from calc.db_connections import close_stale_connections, mark_connections_used
+
 
 class ComplianceMiddleware:
     '''
@@ -31,6 +33,21 @@ class ComplianceMiddleware:
         return response
 
 
+class DatabaseConnectionMiddleware:
+    '''
+    Middleware that makes sure the database connections kept open
+    between requests are still worth reusing before each request, and
+    notes when they were last used after it.
+    '''
+
+    def process_request(self, request):
+        close_stale_connections()
+
+    def process_response(self, request, response):
+        mark_connections_used()
+        return response
+
+
 def show_toolbar(request):
     '''
     Like debug_toolbar.middleware.show_toolbar, but without the
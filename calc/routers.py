@@ -0,0 +1,54 @@
+'''
+Routing of database reads to an optional read replica of the default
+database, which is configured via the DATABASE_REPLICA_URL environment
+variable.
+'''
+
+import threading
+from contextlib import contextmanager
+
+
+REPLICA_DB_ALIAS = 'replica'
+
+_state = threading.local()
+
+
+def is_reading_from_replica() -> bool:
+    return getattr(_state, 'use_replica', False)
+
+
+@contextmanager
+def reading_from_replica():
+    '''
+    Context manager within which ReplicaRouter routes the current
+    thread's reads to the replica, until the thread writes something.
+    '''
+
+    previous = is_reading_from_replica()
+    _state.use_replica = True
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+class ReplicaRouter:
+    '''
+    Database router that sends reads to the replica while code is
+    running within reading_from_replica(), and everything else to the
+    default database.
+    '''
+
+    def db_for_read(self, model, **hints):
+        if is_reading_from_replica():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # The replica may not have what's being written yet, so whatever
+        # is read after it should come from the default database.
+        _state.use_replica = False
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -13,7 +13,7 @@ import os
 import dj_database_url
 import dj_email_url
 from dotenv import load_dotenv
-from typing import Tuple, Any, Dict  # NOQA
+from typing import Tuple, Any, Dict, Optional  # NOQA
 
 from .settings_utils import (load_cups_from_vcap_services,
                              load_redis_url_from_vcap_services,
@@ -163,6 +163,7 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.cache.UpdateCacheMiddleware',
     'calc.middleware.ComplianceMiddleware',
     WHITENOISE_MIDDLEWARE,
+    'calc.middleware.DatabaseConnectionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -226,8 +227,57 @@ RQ_QUEUES = {
 if is_running_tests():
     RQ_QUEUES['default']['URL'] = os.environ['REDIS_TEST_URL']
 
+# The number of processes that convert the rows of a bulk upload in
+# parallel. The default of 1 converts them in the task queue's worker
+# itself, so that uploads don't compete with other processes (like the
+# web server) on the same machine for every CPU.
+BULK_UPLOAD_WORKERS = int(os.environ.get('BULK_UPLOAD_WORKERS', '1'))
+
+# The largest fraction of the existing Region 10 contracts that a bulk
+# upload can delete, above which the upload fails without changing
+# anything, since it more likely means the spreadsheet is broken.
+BULK_UPLOAD_MAX_DELETED_FRACTION = float(
+    os.environ.get('BULK_UPLOAD_MAX_DELETED_FRACTION', '0.5'))
+
 PAGINATION = 200
 
+# Whether /api/rates/ should fetch its page of results, the total
+# number of results, and its aggregate statistics in a single SQL
+# statement, rather than running a separate query for each.
+API_RATES_SINGLE_QUERY = True
+
+# Whether /api/rates/ should serialize its page of results directly
+# from the values the database returns, via ContractValuesSerializer,
+# rather than from model instances via ContractSerializer.
+API_RATES_FAST_SERIALIZER = True
+
+# Whether /api/rates/ should compute the count and statistics of its
+# results from the precomputed RateRollup table, when its query params
+# only filter contracts by things rollups keep track of.
+API_RATES_USE_ROLLUPS = True
+
+# The most phrases, and the most words across all of its phrases, that
+# the search query of an API request can have.
+API_MAX_SEARCH_PHRASES = 20
+API_MAX_SEARCH_WORDS = 40
+
+# The number of milliseconds that each SQL statement of an API request
+# can run for before it's canceled and the request gets a 503 response,
+# or None to let statements run for as long as they take.
+API_STATEMENT_TIMEOUT: Optional[int] = 10000
+
+# The highest cost (in the units reported by Postgres' EXPLAIN) that
+# finding all the contracts matching an API request's search query is
+# estimated to have, or None for no limit. Searching every contract for
+# a single word costs a few thousand.
+API_MAX_QUERY_COST: Optional[float] = 50000
+
+if is_running_tests():
+    # Both limits take extra SQL statements to enforce, which would
+    # throw off tests of the number of statements requests take.
+    API_STATEMENT_TIMEOUT = None
+    API_MAX_QUERY_COST = None
+
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
 }
@@ -315,6 +365,30 @@ if DEBUG_LOG_SQL:
 
 DATABASES = {}
 DATABASES['default'] = dj_database_url.config()
+
+if 'DATABASE_REPLICA_URL' in os.environ:
+    # A read replica of the default database, which the read-only API
+    # reads from whenever it has caught up with the default database.
+    DATABASES['replica'] = dj_database_url.config(env='DATABASE_REPLICA_URL')
+    DATABASE_ROUTERS = ['calc.routers.ReplicaRouter']
+
+# The number of seconds that each process keeps its database connections
+# open for reuse by later requests and jobs (see calc.db_connections).
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', '600'))
+
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = DATABASE_CONN_MAX_AGE
+
+# Connections that have been idle for longer than this many seconds are
+# closed rather than reused, or None to reuse them however long they've
+# been idle.
+DATABASE_CONN_IDLE_TIMEOUT: Optional[int] = int(
+    os.environ.get('DATABASE_CONN_IDLE_TIMEOUT', '300'))
+
+# Whether connections are checked with a trivial query before they're
+# reused by a request.
+DATABASE_CONN_PRE_PING = 'DATABASE_CONN_NO_PRE_PING' not in os.environ
+
 POSTGRES_VERSION = '9.5.4'
 
 SECURE_SSL_REDIRECT = not DEBUG
@@ -375,6 +449,11 @@ LOGIN_REDIRECT_URL = '/'
 # gets served to end-users.
 CACHE_MIDDLEWARE_SECONDS = 0
 
+# Responses of CALC's read-only API endpoints are cached, keyed on their
+# query parameters and on the version of CALC's data (see
+# contracts.models.DataVersion), so they never go stale.
+API_CACHE_ENABLED = not is_running_tests()
+
 if not UAA_CLIENT_SECRET:
     if DEBUG:
         # We'll be using the Fake UAA Provider.
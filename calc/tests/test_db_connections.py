@@ -0,0 +1,60 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+
+from calc.db_connections import close_stale_connections, mark_connections_used
+
+
+@override_settings(DATABASE_CONN_IDLE_TIMEOUT=300,
+                   DATABASE_CONN_PRE_PING=True)
+class CloseStaleConnectionsTests(TransactionTestCase):
+    def setUp(self):
+        connection.ensure_connection()
+        mark_connections_used()
+
+    def test_usable_connections_are_kept(self):
+        close_stale_connections()
+        self.assertIsNotNone(connection.connection)
+
+    def test_idle_connections_are_closed(self):
+        connection.calc_last_used = time.monotonic() - 301
+        close_stale_connections()
+        self.assertIsNone(connection.connection)
+
+    @override_settings(DATABASE_CONN_IDLE_TIMEOUT=None)
+    def test_idle_timeout_can_be_disabled(self):
+        connection.calc_last_used = time.monotonic() - 301
+        close_stale_connections()
+        self.assertIsNotNone(connection.connection)
+
+    def test_broken_connections_are_closed(self):
+        connection.connection.close()
+        close_stale_connections()
+        self.assertIsNone(connection.connection)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    @override_settings(DATABASE_CONN_PRE_PING=False)
+    def test_pre_ping_can_be_disabled(self):
+        connection.connection.close()
+        self.addCleanup(connection.close)
+        close_stale_connections()
+        self.assertIsNotNone(connection.connection)
+
+    def test_connections_in_transactions_are_left_alone(self):
+        connection.calc_last_used = time.monotonic() - 301
+        with transaction.atomic():
+            close_stale_connections()
+            self.assertIsNotNone(connection.connection)
+
+
+class BenchmarkDbConnectionsTests(TransactionTestCase):
+    def test_it_works(self):
+        out = StringIO()
+        call_command('benchmark_db_connections', '--path', '/api/rates/',
+                     '-n', '2', stdout=out)
+        self.assertIn('Without connection reuse: median ', out.getvalue())
+        self.assertIn('With connection reuse: median ', out.getvalue())
@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+
+from contracts.models import Contract
+from ..routers import (REPLICA_DB_ALIAS, ReplicaRouter,
+                       is_reading_from_replica, reading_from_replica)
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_from_default_database_by_default(self):
+        self.assertFalse(is_reading_from_replica())
+        self.assertIsNone(self.router.db_for_read(Contract))
+
+    def test_reads_from_replica_within_reading_from_replica(self):
+        with reading_from_replica():
+            self.assertEqual(self.router.db_for_read(Contract),
+                             REPLICA_DB_ALIAS)
+        self.assertIsNone(self.router.db_for_read(Contract))
+
+    def test_writes_go_to_default_database(self):
+        with reading_from_replica():
+            self.assertIsNone(self.router.db_for_write(Contract))
+
+    def test_reads_stick_to_default_database_after_writes(self):
+        with reading_from_replica():
+            self.router.db_for_write(Contract)
+            self.assertIsNone(self.router.db_for_read(Contract))
+        self.assertFalse(is_reading_from_replica())
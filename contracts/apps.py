@@ -6,4 +6,4 @@ class DefaultContractsApp(AppConfig):
     verbose_name = 'Contracts'
 
     def ready(self):
-        from . import signals  # noqa
+        from . import lookups, signals  # noqa
@@ -0,0 +1,351 @@
+import io
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from django.db import connections, router
+
+from contracts.models import Contract, DataVersion, RateRollup
+
+
+def to_copy_text(value) -> str:
+    r'''
+    Return the given database value in the text format of Postgres'
+    COPY command, e.g.:
+
+        >>> to_copy_text(None)
+        '\\N'
+        >>> to_copy_text(True)
+        't'
+        >>> print(to_copy_text('tab\there\\'))
+        tab\there\\
+    '''
+
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+class ContractCopyLoader:
+    '''
+    Loads contracts from an upload source into the database with
+    Postgres' COPY FROM STDIN, which is much faster than inserting them
+    with Contract.objects.bulk_create(), e.g.:
+
+        loader = ContractCopyLoader(upload_source)
+        for contracts in batches:
+            loader.copy(contracts)
+        with transaction.atomic():
+            loader.replace(existing_contracts)
+        loader.analyze()
+
+    Contracts are copied into a temporary staging table, which doesn't
+    need to be done in a transaction. replace() then makes the existing
+    contracts match the staged ones by applying only the differences
+    between them, so the contracts table (and its indexes) only has to
+    be written to for the contracts that changed. The search index is
+    computed as rows are written, and the rate rollups are refreshed
+    once, for the changed labor categories.
+
+    Unchanged contracts keep the upload source that first loaded them,
+    which is why upload sources that still have contracts can't be
+    deleted.
+    '''
+
+    fields = [
+        field for field in Contract._meta.concrete_fields
+        if not field.primary_key and field.name != 'search_index'
+    ]
+
+    columns = [field.column for field in fields]
+
+    # The columns that identify the same contract across uploads, so
+    # that a contract with other changed columns can be updated in place.
+    key_columns = ['idv_piid', 'vendor_name', 'labor_category']
+
+    # The columns that are compared to tell whether a contract changed.
+    fingerprint_columns = [
+        column for column in columns if column != 'upload_source_id'
+    ]
+
+    staging_table = f'{Contract._meta.db_table}_copy'
+
+    diff_table = f'{Contract._meta.db_table}_diff'
+
+    def __init__(self, upload_source):
+        # Only the id is kept, so that loaders can be cheaply pickled
+        # and sent to other processes, which can call get_row().
+        self.upload_source_id = upload_source.pk
+        self.using = router.db_for_write(Contract)
+        self.num_copied = 0
+        self.has_staging_table = False
+
+    def quote_name(self, name: str) -> str:
+        return connections[self.using].ops.quote_name(name)
+
+    def execute(self, sql: str, params=None) -> List[Any]:
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.description is None:
+                return []
+            return cursor.fetchall()
+
+    def create_staging_table(self) -> None:
+        qn = self.quote_name
+        self.execute(f'DROP TABLE IF EXISTS {qn(self.staging_table)}')
+        self.execute(
+            f'CREATE TEMPORARY TABLE {qn(self.staging_table)} AS '
+            f'SELECT {", ".join(qn(column) for column in self.columns)} '
+            f'FROM {qn(Contract._meta.db_table)} WITH NO DATA'
+        )
+        self.execute(
+            f'ALTER TABLE {qn(self.staging_table)} '
+            f'ADD COLUMN staging_id serial PRIMARY KEY'
+        )
+        self.has_staging_table = True
+
+    def get_row(self, contract: Contract) -> List[Any]:
+        '''
+        Return the database values of the given contract's columns, in
+        the order they're copied.
+        '''
+
+        connection = connections[self.using]
+        contract.upload_source_id = self.upload_source_id
+        contract.update_normalized_labor_category()
+        contract.update_education_rank()
+        return [
+            field.get_db_prep_save(field.pre_save(contract, True), connection)
+            for field in self.fields
+        ]
+
+    def copy_rows(self, rows: Iterable[Sequence[Any]]) -> int:
+        '''
+        Copy the given rows, as returned by get_row(), into the staging
+        table, and return how many there were.
+        '''
+
+        data = io.StringIO()
+        num_rows = 0
+        for row in rows:
+            data.write('\t'.join(to_copy_text(value) for value in row))
+            data.write('\n')
+            num_rows += 1
+        data.seek(0)
+
+        if not self.has_staging_table:
+            self.create_staging_table()
+        qn = self.quote_name
+        with connections[self.using].cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {qn(self.staging_table)} '
+                f'({", ".join(qn(column) for column in self.columns)}) '
+                f'FROM STDIN',
+                data
+            )
+        self.num_copied += num_rows
+        return num_rows
+
+    def copy(self, contracts: Iterable[Contract]) -> int:
+        '''
+        Copy the given contracts into the staging table, and return how
+        many there were.
+        '''
+
+        return self.copy_rows(self.get_row(contract) for contract in contracts)
+
+    def hash_columns(self, table: str, columns: List[str]) -> str:
+        qn = self.quote_name
+        values = ', '.join(f'{table}.{qn(column)}' for column in columns)
+        return f'md5(ROW({values})::text)'
+
+    def create_diff_table(self, contracts) -> None:
+        '''
+        Pair each of the given existing contracts with a staged one that
+        has the same fingerprint, or failing that, the same key. The
+        resulting table has the contract_id of each existing contract
+        and the staging_id of each staged one that should replace it,
+        except for unchanged contracts, which are left out.
+        '''
+
+        qn = self.quote_name
+        table = qn(Contract._meta.db_table)
+        staging = qn(self.staging_table)
+        if contracts is None:
+            existing_sql, params = 'SELECT NULL::integer WHERE false', ()
+        else:
+            existing_sql, params = \
+                contracts.values('id').query.sql_with_params()
+        self.execute(f'DROP TABLE IF EXISTS {qn(self.diff_table)}')
+        self.execute(f'''
+            CREATE TEMPORARY TABLE {qn(self.diff_table)} AS
+            WITH old AS (
+                SELECT c.id,
+                       {self.hash_columns('c', self.key_columns)} AS key,
+                       {self.hash_columns('c', self.fingerprint_columns)}
+                           AS fingerprint
+                FROM {table} c
+                WHERE c.id IN ({existing_sql})
+            ), new AS (
+                SELECT s.staging_id,
+                       {self.hash_columns('s', self.key_columns)} AS key,
+                       {self.hash_columns('s', self.fingerprint_columns)}
+                           AS fingerprint
+                FROM {staging} s
+            ), unchanged AS (
+                SELECT o.id, s.staging_id
+                FROM (SELECT id, fingerprint, row_number() OVER (
+                          PARTITION BY fingerprint ORDER BY id) AS occurrence
+                      FROM old) o
+                JOIN (SELECT staging_id, fingerprint, row_number() OVER (
+                          PARTITION BY fingerprint ORDER BY staging_id)
+                          AS occurrence
+                      FROM new) s
+                USING (fingerprint, occurrence)
+            )
+            SELECT o.id AS contract_id, s.staging_id
+            FROM (SELECT old.id, old.key, row_number() OVER (
+                      PARTITION BY old.key ORDER BY old.id) AS occurrence
+                  FROM old LEFT JOIN unchanged u ON u.id = old.id
+                  WHERE u.id IS NULL) o
+            FULL OUTER JOIN (
+                SELECT new.staging_id, new.key, row_number() OVER (
+                    PARTITION BY new.key ORDER BY new.staging_id)
+                    AS occurrence
+                FROM new LEFT JOIN unchanged u
+                    ON u.staging_id = new.staging_id
+                WHERE u.staging_id IS NULL) s
+            USING (key, occurrence)
+        ''', params)
+
+    def validate(self, num_expected: Optional[int]=None) -> None:
+        '''
+        Make sure every copied contract made it into the staging table,
+        and that as many were copied as expected, if that's given.
+        '''
+
+        if not self.has_staging_table:
+            self.create_staging_table()
+        [(num_staged,)] = self.execute(
+            f'SELECT count(*) FROM {self.quote_name(self.staging_table)}')
+        if num_staged != self.num_copied:
+            raise ValueError(
+                f'{self.num_copied} contracts were copied, but '
+                f'{num_staged} were staged'
+            )
+        if num_expected is not None and num_staged != num_expected:
+            raise ValueError(
+                f'{num_expected} contracts were expected, but '
+                f'{num_staged} were staged'
+            )
+
+    def check_deletions(self, max_deleted_fraction: float) -> None:
+        '''
+        Make sure that applying the diff table won't delete more than
+        the given fraction of the existing contracts, which is more
+        likely to mean that something went wrong with the upload than
+        that that many contracts really went away.
+        '''
+
+        [(num_deleted, num_changed, num_staged_changes)] = self.execute(f'''
+            SELECT count(*) FILTER (WHERE staging_id IS NULL),
+                   count(contract_id), count(staging_id)
+            FROM {self.quote_name(self.diff_table)}
+        ''')
+        num_unchanged = self.num_copied - num_staged_changes
+        num_existing = num_unchanged + num_changed
+        if num_deleted > max_deleted_fraction * num_existing:
+            raise ValueError(
+                f'{num_deleted} of {num_existing} existing contracts would '
+                f'be deleted, which is more than the '
+                f'{max_deleted_fraction:.0%} that can be'
+            )
+
+    def replace(self, contracts=None, num_expected: Optional[int]=None,
+                max_deleted_fraction: Optional[float]=None) -> Dict[str, int]:
+        '''
+        Make the given queryset of existing contracts (or no contracts,
+        if it's None) match the copied ones: unchanged contracts are left
+        alone, changed ones are updated, ones that weren't copied are
+        deleted, and new ones are inserted. Returns the number of
+        contracts of each kind.
+
+        If num_expected is given, it's the number of contracts that
+        should have been copied. If max_deleted_fraction is given, it's
+        the largest fraction of the existing contracts that can be
+        deleted. A ValueError is raised, without changing anything, if
+        either doesn't hold.
+
+        This should be run in a transaction, which only holds locks
+        on the changed contracts.
+        '''
+
+        self.validate(num_expected)
+        self.create_diff_table(contracts)
+        if max_deleted_fraction is not None:
+            self.check_deletions(max_deleted_fraction)
+
+        qn = self.quote_name
+        table = qn(Contract._meta.db_table)
+        staging = qn(self.staging_table)
+        diff = qn(self.diff_table)
+        category = qn('_normalized_labor_category')
+        # This is what SearchVector('_normalized_labor_category') compiles
+        # to, as used by ContractsQuerySet.update_search_index().
+        search_index = f"to_tsvector(COALESCE(s.{category}, ''))"
+
+        categories = {row[0] for row in self.execute(f'''
+            SELECT c.{category} FROM {table} c
+            JOIN {diff} d ON d.contract_id = c.id
+            UNION
+            SELECT s.{category} FROM {staging} s
+            JOIN {diff} d ON d.staging_id = s.staging_id
+        ''')}
+
+        deleted = self.execute(f'''
+            DELETE FROM {table} c USING {diff} d
+            WHERE c.id = d.contract_id AND d.staging_id IS NULL
+            RETURNING c.id
+        ''')
+        assignments = ', '.join(
+            f'{qn(column)} = s.{qn(column)}' for column in self.columns)
+        updated = self.execute(f'''
+            UPDATE {table} c
+            SET {assignments}, {qn('search_index')} = {search_index}
+            FROM {diff} d JOIN {staging} s ON s.staging_id = d.staging_id
+            WHERE c.id = d.contract_id
+            RETURNING c.id
+        ''')
+        columns = ', '.join(qn(column) for column in self.columns)
+        s_columns = ', '.join(f's.{qn(column)}' for column in self.columns)
+        inserted = self.execute(f'''
+            INSERT INTO {table} ({columns}, {qn('search_index')})
+            SELECT {s_columns}, {search_index}
+            FROM {staging} s JOIN {diff} d ON d.staging_id = s.staging_id
+            WHERE d.contract_id IS NULL
+            RETURNING id
+        ''')
+
+        self.execute(f'DROP TABLE {staging}, {diff}')
+        self.has_staging_table = False
+        if categories:
+            RateRollup.refresh(categories)
+            DataVersion.bump()
+
+        return {
+            'unchanged': self.num_copied - len(updated) - len(inserted),
+            'updated': len(updated),
+            'deleted': len(deleted),
+            'inserted': len(inserted),
+        }
+
+    def analyze(self) -> None:
+        '''
+        Update the planner's statistics about the contracts table, which
+        should be done after replace()'s transaction is committed.
+        '''
+
+        self.execute(f'ANALYZE {self.quote_name(Contract._meta.db_table)}')
@@ -0,0 +1,28 @@
+from django.db.models import Field
+from django.db.models.lookups import IContains
+
+
+@Field.register_lookup
+class TrigramIContains(IContains):
+    '''
+    A case-insensitive containment lookup, like `icontains`, that can be
+    served by a GIN trigram (`gin_trgm_ops`) index on the field.
+
+    Django implements `icontains` on Postgres as
+    `UPPER(field::text) LIKE UPPER(pattern)`, which can only use an
+    index on that exact expression; this lookup uses
+    `field ILIKE pattern` instead, which can use an index on the field.
+    '''
+
+    lookup_name = 'trigram_icontains'
+
+    TEXT_TYPES = ('CharField', 'TextField')
+
+    def process_lhs(self, compiler, connection, lhs=None):
+        lhs_sql, params = super().process_lhs(compiler, connection, lhs)
+        if self.lhs.output_field.get_internal_type() not in self.TEXT_TYPES:
+            lhs_sql = f'{lhs_sql}::text'
+        return lhs_sql, params
+
+    def get_rhs_op(self, connection, rhs):
+        return f'ILIKE {rhs}'
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from contracts.models import RateRollup
+
+
+class Command(BaseCommand):
+    help = '''
+    Recompute every rate rollup from the current contracts.
+
+    Rollups are refreshed whenever contracts are changed through Django,
+    so this is only needed if contracts were changed some other way.
+    '''
+
+    def handle(self, *args, **kwargs):
+        print("Refreshing rate rollups...")
+        RateRollup.refresh()
@@ -8,6 +8,7 @@ from django.db import migrations
 
 def create_schedules(apps, schema_editor):
     ScheduleMetadata = apps.get_model('contracts', 'ScheduleMetadata')
+    db_alias = schema_editor.connection.alias
     ScheduleMetadata(
         sin='899',
         schedule='Environmental',
@@ -16,7 +17,7 @@ def create_schedules(apps, schema_editor):
         Provides services in environmental management, electronics stewardship,
         pollution prevention cleanup and restoration, HAZMAT, and training.
         '''),
-    ).save()
+    ).save(using=db_alias)
     ScheduleMetadata(
         sin='87405',
         schedule='Logistics',
@@ -30,7 +31,7 @@ def create_schedules(apps, schema_editor):
 
         This schedule was formerly known as Logistics Worldwide (LOGWORLD).
         '''),
-    ).save()
+    ).save(using=db_alias)
     ScheduleMetadata(
         sin='874',
         schedule='MOBIS',
@@ -40,7 +41,7 @@ def create_schedules(apps, schema_editor):
         and consulting services, including facilitation,
         surveys, competetive sourcing and project management.
         '''),
-    ).save()
+    ).save(using=db_alias)
     ScheduleMetadata(
         sin='871',
         schedule='PES',
@@ -52,7 +53,7 @@ def create_schedules(apps, schema_editor):
 
         This schedule was formerly known as the Professional Engineering Schedule.
         '''),
-    ).save()
+    ).save(using=db_alias)
     ScheduleMetadata(
         sin='73802',
         schedule='Language Services',
@@ -62,7 +63,7 @@ def create_schedules(apps, schema_editor):
         advance analytical consulting. Sign language and training
         are also offered.
         '''),
-    ).save()
+    ).save(using=db_alias)
     ScheduleMetadata(
         sin='541',
         schedule='AIMS',
@@ -76,7 +77,7 @@ def create_schedules(apps, schema_editor):
         *Note: AIMS is newly added so available results in CALC is
         currently limited.*
         '''),
-    ).save()
+    ).save(using=db_alias)
     ScheduleMetadata(
         sin='520',
         schedule='FABS',
@@ -89,7 +90,7 @@ def create_schedules(apps, schema_editor):
         *Note: FABS is newly added so available results in CALC is
         currently limited.*
         '''),
-    ).save()
+    ).save(using=db_alias)
     ScheduleMetadata(
         schedule='Consolidated',
         name='The Consolidated Schedule',
@@ -97,7 +98,7 @@ def create_schedules(apps, schema_editor):
         Covers contracts awarded to a single company for services that
         cover multiple schedules.
         '''),
-    ).save()
+    ).save(using=db_alias)
     ScheduleMetadata(
         sin='132',
         schedule='IT Schedule 70',
@@ -109,7 +110,7 @@ def create_schedules(apps, schema_editor):
         *Note: IT Schedule 70 is newly added so available results
         in CALC is currently limited.*
         '''),
-    ).save()
+    ).save(using=db_alias)
 
 
 class Migration(migrations.Migration):
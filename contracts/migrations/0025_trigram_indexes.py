@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+TRIGRAM_INDEXED_FIELDS = [
+    '_normalized_labor_category',
+    'sin',
+    'contractor_site',
+    'vendor_name',
+]
+
+
+def create_index(field):
+    return migrations.RunSQL(
+        f'CREATE INDEX contracts_contract_{field.lstrip("_")}_trgm '
+        f'ON contracts_contract USING gin ("{field}" gin_trgm_ops);',
+        f'DROP INDEX contracts_contract_{field.lstrip("_")}_trgm;'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0024_populate_schedulemetadata'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ] + [create_index(field) for field in TRIGRAM_INDEXED_FIELDS]
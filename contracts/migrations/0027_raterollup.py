@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 20:24
+from __future__ import unicode_literals
+
+import contracts.models
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+GROUP_COLUMNS = ('"_normalized_labor_category", "education_level", '
+                 '"min_years_experience", "schedule", "business_size"')
+
+
+def get_populate_sql(wage_field):
+    return (
+        f'INSERT INTO contracts_raterollup ({GROUP_COLUMNS}, wage_field, '
+        f'count, price_sum, price_sum_of_squares, min_price, max_price, '
+        f'prices, price_counts) '
+        f"SELECT {GROUP_COLUMNS}, '{wage_field}', SUM(n), SUM(price * n), "
+        f'SUM(price * price * n), MIN(price), MAX(price), '
+        f'array_agg(price ORDER BY price), array_agg(n ORDER BY price) '
+        f'FROM (SELECT {GROUP_COLUMNS}, "{wage_field}" AS price, '
+        f'COUNT(*) AS n FROM contracts_contract '
+        f'WHERE current_price > 0 AND "{wage_field}" IS NOT NULL '
+        f'GROUP BY {GROUP_COLUMNS}, "{wage_field}") AS prices '
+        f'GROUP BY {GROUP_COLUMNS}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0026_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('_normalized_labor_category', models.TextField(db_index=True)),
+                ('education_level', models.CharField(blank=True, choices=[('HS', 'High School'), ('AA', 'Associates'), ('BA', 'Bachelors'), ('MA', 'Masters'), ('PHD', 'Ph.D.')], max_length=5, null=True)),
+                ('min_years_experience', models.IntegerField()),
+                ('schedule', models.CharField(blank=True, max_length=128, null=True)),
+                ('business_size', models.CharField(blank=True, max_length=128, null=True)),
+                ('wage_field', models.CharField(max_length=32)),
+                ('count', models.IntegerField()),
+                ('price_sum', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('price_sum_of_squares', models.DecimalField(decimal_places=4, max_digits=30)),
+                ('min_price', contracts.models.CashField(decimal_places=2, max_digits=10)),
+                ('max_price', contracts.models.CashField(decimal_places=2, max_digits=10)),
+                ('prices', django.contrib.postgres.fields.ArrayField(base_field=models.DecimalField(decimal_places=2, max_digits=10), size=None)),
+                ('price_counts', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='raterollup',
+            index_together=set([('wage_field', '_normalized_labor_category')]),
+        ),
+        migrations.RunSQL(
+            [get_populate_sql(wage_field) for wage_field in
+             ('current_price', 'next_year_price', 'second_year_price')],
+            migrations.RunSQL.noop,
+        ),
+    ]
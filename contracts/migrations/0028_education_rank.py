@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 20:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# This mirrors Contract.get_education_rank().
+POPULATE_SQL = '''
+UPDATE contracts_contract SET education_rank = CASE education_level
+    WHEN 'HS' THEN 1
+    WHEN 'AA' THEN 2
+    WHEN 'BA' THEN 3
+    WHEN 'MA' THEN 4
+    WHEN 'PHD' THEN 5
+    ELSE -1
+END;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0027_raterollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='education_rank',
+            field=models.IntegerField(default=-1, editable=False),
+        ),
+        migrations.RunSQL(POPULATE_SQL, migrations.RunSQL.noop),
+        migrations.AlterIndexTogether(
+            name='contract',
+            index_together=set([('education_rank', 'id'), ('education_rank', 'next_year_price'), ('education_rank', 'second_year_price'), ('education_rank', 'current_price')]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# The fields that contracts are commonly sorted by. Their indexes are
+# partial, holding only the contracts that CurrentContractManager
+# returns, and end with the id that the rates API breaks ties with.
+# They only hold those two columns, so pages read off them still fetch
+# the rest of each row from the table.
+CURRENT_INDEXED_FIELDS = [
+    'current_price',
+    'next_year_price',
+    'second_year_price',
+    'min_years_experience',
+    'schedule',
+]
+
+
+def create_index(field):
+    return migrations.RunSQL(
+        f'CREATE INDEX contracts_contract_{field}_current '
+        f'ON contracts_contract ("{field}", id) WHERE current_price > 0;',
+        f'DROP INDEX contracts_contract_{field}_current;'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0028_education_rank'),
+    ]
+
+    operations = [create_index(field) for field in CURRENT_INDEXED_FIELDS]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 23:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0030_bulkuploadcontractsource_file_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='upload_source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='contracts.BulkUploadContractSource'),
+        ),
+    ]
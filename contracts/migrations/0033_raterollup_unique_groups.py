@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# The group fields of RateRollup that can be null. A unique index
+# treats nulls as distinct, so each of these is indexed as a
+# non-null value along with whether it's null.
+NULLABLE_GROUP_COLUMNS = ['education_level', 'schedule', 'business_size']
+
+GROUP_COLUMNS = ['_normalized_labor_category', 'min_years_experience',
+                 'wage_field'] + NULLABLE_GROUP_COLUMNS
+
+
+def get_index_expressions():
+    expressions = ['"_normalized_labor_category"', '"min_years_experience"',
+                   '"wage_field"']
+    for column in NULLABLE_GROUP_COLUMNS:
+        expressions.append(f"COALESCE(\"{column}\", '')")
+        expressions.append(f'("{column}" IS NULL)')
+    return ', '.join(expressions)
+
+
+# Concurrent refreshes could have inserted the same rollups twice, in
+# which case they're identical and all but one can be deleted.
+DELETE_DUPLICATES_SQL = (
+    'DELETE FROM contracts_raterollup r USING contracts_raterollup o '
+    'WHERE r.id < o.id AND ' + ' AND '.join(
+        f'r."{column}" IS NOT DISTINCT FROM o."{column}"'
+        for column in GROUP_COLUMNS
+    )
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0032_bulkuploadcontractsource_submitter_set_null'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                DELETE_DUPLICATES_SQL,
+                f'CREATE UNIQUE INDEX contracts_raterollup_group_unique '
+                f'ON contracts_raterollup ({get_index_expressions()});',
+            ],
+            'DROP INDEX contracts_raterollup_group_unique;'
+        ),
+    ]
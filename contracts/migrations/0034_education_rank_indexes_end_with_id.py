@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-18 23:28
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0033_raterollup_unique_groups'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='contract',
+            index_together=set([('education_rank', 'next_year_price', 'id'), ('education_rank', 'id'), ('education_rank', 'current_price', 'id'), ('education_rank', 'second_year_price', 'id')]),
+        ),
+    ]
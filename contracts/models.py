@@ -3,9 +3,11 @@ import csv
 from datetime import datetime
 from decimal import Decimal
 
-from django.db import models, connection
+from django.db import models, connection, transaction
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import ArrayField, JSONField
 from django.contrib.postgres.search import SearchVectorField, SearchVector
+from django.utils import timezone
 from django.utils.html import strip_tags
 
 from calc.utils import markdown_to_sanitized_html
@@ -18,6 +20,19 @@ EDUCATION_CHOICES = (
     ('PHD', 'Ph.D.'),
 )
 
+# Education levels are sorted by these ranks rather than alphabetically;
+# contracts without a (valid) education level rank below all of them.
+EDUCATION_RANKS = {
+    code: rank for rank, (code, _) in enumerate(EDUCATION_CHOICES, start=1)
+}
+
+NO_EDUCATION_RANK = -1
+
+EDUCATION_SORT_FIELDS = {
+    'education_level': 'education_rank',
+    '-education_level': '-education_rank',
+}
+
 MIN_ESCALATION_RATE = 0
 MAX_ESCALATION_RATE = 99
 NUM_CONTRACT_YEARS = 5
@@ -71,6 +86,38 @@ def clean_search(query):
     return terms
 
 
+def get_multi_phrase_search_q(query, query_type='match_all', query_by=None):
+    '''
+    Return a Q object that matches the rows that
+    ContractsQuerySet.multi_phrase_search() returns for the given query,
+    so that other models with the same fields can be searched in exactly
+    the same way.
+    '''
+    matches = models.Q(pk__in=[])
+    if not query_by:
+        query_by = '_normalized_labor_category'
+    for phrase in clean_search(query):
+        if query_type == 'match_exact':
+            # This will match each phrase they enter exactly.
+            matches |= models.Q(**{query_by + '__iexact': phrase})
+        elif query_by != '_normalized_labor_category' or \
+                phrase.startswith("'") or phrase.startswith('"'):
+            # If the phrase is quoted, we want to use it as is.
+            matches |= models.Q(**{query_by + '__trigram_icontains': phrase})
+        else:
+            # Match any: Break phrases down into individual words
+            # So "business manager" finds results with "business" AND "manager"
+            # anywhere in the labor category.
+            # Each word check can be served by the trigram index on the
+            # normalized labor category, so no rows need to be scanned.
+            word_matches = models.Q()
+            for word in phrase.split(' '):
+                word_matches &= models.Q(
+                    **{query_by + '__trigram_icontains': word})
+            matches |= word_matches
+    return matches
+
+
 class CurrentContractManager(models.Manager):
     def bulk_update_normalized_labor_categories(self):
         '''
@@ -105,13 +152,18 @@ class CurrentContractManager(models.Manager):
                 )
                 cursor.execute(sql, updates)
             self.filter(pk__in=pks).update_search_index()
+            RateRollup.refresh()
+            DataVersion.bump()
         return num_updates
 
     def bulk_create(self, contracts, *args, **kwargs):
         for contract in contracts:
             contract.update_normalized_labor_category()
+            contract.update_education_rank()
         contracts = super().bulk_create(contracts, *args, **kwargs)
         self.filter(pk__in=[c.pk for c in contracts]).update_search_index()
+        RateRollup.refresh(c._normalized_labor_category for c in contracts)
+        DataVersion.bump()
         return contracts
 
     def search(self, *args, **kwargs):
@@ -128,41 +180,51 @@ class ContractsQuerySet(models.QuerySet):
     def search(self, query):
         return self.filter(search_index=query)
 
+    def delete(self):
+        categories = self.get_labor_categories()
+        result = super().delete()
+        RateRollup.refresh(categories)
+        DataVersion.bump()
+        return result
+
+    def update(self, **kwargs):
+        if 'education_level' in kwargs and 'education_rank' not in kwargs:
+            kwargs['education_rank'] = Contract.get_education_rank(
+                kwargs['education_level'])
+        categories = None
+        refresh_rollups = set(kwargs).intersection(RateRollup.SOURCE_FIELDS)
+        if refresh_rollups:
+            categories = self.get_labor_categories()
+            new_category = kwargs.get('_normalized_labor_category')
+            if isinstance(new_category, str):
+                categories.append(new_category)
+            elif new_category is not None:
+                # We can't tell which categories the rows will have, so
+                # every rollup needs to be refreshed.
+                categories = None
+        result = super().update(**kwargs)
+        if refresh_rollups:
+            RateRollup.refresh(categories)
+        DataVersion.bump()
+        return result
+
+    def get_labor_categories(self):
+        '''
+        Return the distinct normalized labor categories of the contracts.
+        '''
+
+        return list(self.order_by().values_list(
+            '_normalized_labor_category', flat=True).distinct())
+
     def update_search_index(self):
         return self.update(
             search_index=SearchVector('_normalized_labor_category'))
 
     def order_by(self, *args, **kwargs):
-        edu_sort_sql = """
-            case
-                when education_level = 'HS' then 1
-                when education_level = 'AA' then 2
-                when education_level = 'BA' then 3
-                when education_level = 'MA' then 4
-                when education_level = 'PHD' then 5
-                else -1
-            end
-        """
-
-        edu_index = None
-
-        sort_params = list(args)
-
-        if 'education_level' in sort_params:
-            edu_index = sort_params.index('education_level')
-        elif '-education_level' in sort_params:
-            edu_index = sort_params.index('-education_level')
-
-        if edu_index is not None:
-            sort_params[edu_index] = 'edu_sort' if not args[
-                edu_index].startswith('-') else '-edu_sort'
-            queryset = super(ContractsQuerySet, self)\
-                .extra(select={'edu_sort': edu_sort_sql}, order_by=sort_params)
-        else:
-            queryset = super(ContractsQuerySet, self)\
-                .order_by(*args, **kwargs)
-
-        return queryset
+        # Education levels are sorted by their stored rank, which is
+        # indexed together with the fields they're usually sorted with.
+        sort_params = [EDUCATION_SORT_FIELDS.get(arg, arg) for arg in args]
+        return super().order_by(*sort_params, **kwargs)
 
     def multi_phrase_search(self, query, query_by=None, *args, **kwargs):
         """
@@ -174,46 +236,9 @@ class ContractsQuerySet(models.QuerySet):
             'match_any' matches any word, so "business manager" will also match "dev manager"
             'query_by' specifies fields other than labor_category you may wish to search for.
         """
-        matches = Contract.objects.none()
-        qs = self.get_queryset()
-        phrases = clean_search(query)
-        if not query_by:
-            query_by = '_normalized_labor_category'
-        if 'match_exact' in args:
-            # This will match each phrase they enter exactly.
-            # We use an or operator here to build up the total queryset from
-            # each exactly matched item they found.
-            for phrase in phrases:
-                filter_by = {query_by + '__iexact': phrase}
-                matches = matches | qs.filter(**filter_by)
-        elif query_by != '_normalized_labor_category':
-            for phrase in phrases:
-                filter_by = {query_by + '__icontains': phrase}
-                matches = matches | qs.filter(**filter_by)
-        else:
-            # Match any: Break phrases down into individual words
-            # So "business manager" finds results with "business" AND "manager"
-            # anywhere in the labor category.
-            # Note this is relatively hard on the DB, producing one query per word,
-            # but given our number of users, small queries and indexing, we should be OK.
-
-            for phrase in phrases:
-                # If the phrase is quoted, we want to use it as
-                if phrase.startswith("'") or phrase.startswith('"'):
-                    filter_by = {query_by + '__icontains': phrase}
-                    matches = matches | qs.filter(**filter_by)
-                else:
-                    # Break out the individual words. Here, we only want results with AND matching.
-                    # So 'business analyst' will only return phrases matching both words.
-                    words = phrase.split(' ')
-                    # We need a starter queryset for the intersection
-                    wmatches = qs.filter(_normalized_labor_category__icontains=words[0])
-                    for w in words:
-                        filter_by = {query_by + '__icontains': w}
-                        wmatches = wmatches & qs.filter(**filter_by)
-                    # Now add the word matches onto the overall matches as an OR
-                    matches = matches | wmatches
-        return matches
+        query_type = 'match_exact' if 'match_exact' in args else 'match_all'
+        return self.get_queryset().filter(
+            get_multi_phrase_search_q(query, query_type, query_by))
 
     def get_queryset(self):
         return ContractsQuerySet(self.model, using=self._db)\
@@ -235,12 +260,19 @@ class BulkUploadContractSource(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    submitter = models.ForeignKey(User, null=True, blank=True)
+    # Deleting a user mustn't try to delete the upload sources they
+    # submitted, which can't be deleted while they have contracts.
+    submitter = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL)
     has_been_loaded = models.BooleanField(default=False)
     original_file = models.BinaryField()
     file_mime_type = models.TextField()
     procurement_center = models.CharField(
         db_index=True, max_length=5, choices=PROCUREMENT_CENTER_CHOICES)
+    # Metadata about original_file, as returned by
+    # Region10SpreadsheetConverter.get_metadata(), which is stored when
+    # the file is uploaded so that it doesn't need to be re-parsed.
+    file_metadata = JSONField(null=True, blank=True)
 
 
 class CashField(models.DecimalField):
@@ -359,16 +391,36 @@ class Contract(models.Model):
 
     search_index = SearchVectorField(default='', db_index=True, editable=False)
 
+    # The rank of education_level in EDUCATION_CHOICES, which contracts
+    # are sorted by instead of the education level itself.
+    education_rank = models.IntegerField(
+        default=NO_EDUCATION_RANK, editable=False)
+
+    # Contracts that are unchanged by a reload keep the upload source
+    # that first loaded them, so upload sources can't take their
+    # contracts with them when they're deleted.
     upload_source = models.ForeignKey(
         BulkUploadContractSource,
         null=True,
         blank=True,
-        on_delete=models.CASCADE,
+        on_delete=models.PROTECT,
     )
 
     # Ojects should be current contracts with a valid current_price
     objects = CurrentContractManager()
 
+    class Meta:
+        # Pages sorted by education level (optionally followed by the
+        # price) can be read off these indexes in order, stopping as
+        # soon as the page is full. They end with the id, since that's
+        # the final tiebreaker of cursor pagination.
+        index_together = [
+            ('education_rank', 'current_price', 'id'),
+            ('education_rank', 'next_year_price', 'id'),
+            ('education_rank', 'second_year_price', 'id'),
+            ('education_rank', 'id'),
+        ]
+
     @staticmethod
     def normalize_labor_category(val):
         '''
@@ -416,7 +468,11 @@ class Contract(models.Model):
         in the DB and how we collect it in form submissions that makes startswith
         a safer check than equivalency
         """
-        if self.business_size.lower().startswith('s'):
+        return self.get_readable_business_size_for(self.business_size)
+
+    @staticmethod
+    def get_readable_business_size_for(business_size):
+        if business_size.lower().startswith('s'):
             return 'small business'
         else:  # We expect it should be 'o' but are not locking it down.
             return 'other than small business'
@@ -547,9 +603,219 @@ class Contract(models.Model):
             return True
         return False
 
+    @staticmethod
+    def get_education_rank(code):
+        '''
+        Return the rank that contracts with the given education code
+        are sorted by, e.g.:
+
+            >>> Contract.get_education_rank('BA')
+            3
+
+        Contracts without a valid education code rank below the
+        others:
+
+            >>> Contract.get_education_rank(None)
+            -1
+        '''
+
+        return EDUCATION_RANKS.get(code, NO_EDUCATION_RANK)
+
+    def update_education_rank(self):
+        self.education_rank = self.get_education_rank(self.education_level)
+
     def save(self, *args, **kwargs):
         self.update_normalized_labor_category()
+        self.update_education_rank()
+        categories = [self._normalized_labor_category]
+        if self.pk is not None:
+            # The contract may be moving out of another category.
+            categories.extend(type(self)._base_manager.filter(pk=self.pk)
+                              .values_list('_normalized_labor_category',
+                                           flat=True))
         super().save(*args, **kwargs)
+        RateRollup.refresh(categories)
+        DataVersion.bump()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        RateRollup.refresh([self._normalized_labor_category])
+        DataVersion.bump()
+        return result
+
+
+class DataVersion(models.Model):
+    '''
+    A counter that is incremented whenever contracts (or schedule
+    metadata) are created, changed or deleted, so that data derived from
+    them (e.g. in-memory indexes and cached API responses) can tell when
+    it's out of date, even if it lives in another process.
+
+    There is only ever one row in this table.
+    '''
+
+    SINGLETON_ID = 1
+
+    version = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def get_current(cls, using=None):
+        '''
+        Return the current (version, updated_at) pair; the version is 0
+        if contracts have never changed.
+
+        If given, `using` is the alias of the database to look it up in.
+        '''
+
+        current = cls.objects.using(using).filter(pk=cls.SINGLETON_ID)\
+            .values_list('version', 'updated_at').first()
+        if current is None:
+            return 0, None
+        return current
+
+    @classmethod
+    def bump(cls):
+        '''
+        Increment the version, to note that contracts have changed.
+
+        This is a single upsert, so that concurrent first bumps can't
+        both try to create the row.
+        '''
+
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (id, version, updated_at) '
+                f'VALUES (%s, 1, %s) ON CONFLICT (id) DO UPDATE '
+                f'SET version = {table}.version + 1, '
+                f'updated_at = EXCLUDED.updated_at',
+                [cls.SINGLETON_ID, timezone.now()]
+            )
+
+
+class RateRollupQuerySet(models.QuerySet):
+
+    def multi_phrase_search(self, query, query_type='match_all'):
+        '''
+        Return the rollups of the normalized labor categories that
+        `Contract.objects.multi_phrase_search()` would match with the
+        given query when searching by labor category.
+        '''
+
+        return self.filter(get_multi_phrase_search_q(query, query_type))
+
+
+class RateRollup(models.Model):
+    '''
+    Aggregate statistics about the prices of the current contracts that
+    share a normalized labor category, education level, minimum years of
+    experience, schedule and business size, for each of the fields that
+    prices are taken from.
+
+    Along with the count, sum, sum of squares, minimum and maximum of
+    the prices, each rollup has a "sketch" of the prices: the distinct
+    prices, and the number of contracts with each one. This is enough to
+    compute the same statistics and histograms about any set of rollups
+    that would be computed from the contracts they summarize.
+
+    Rollups are refreshed whenever contracts are changed, so they
+    are always up-to-date.
+    '''
+
+    WAGE_FIELDS = ('current_price', 'next_year_price', 'second_year_price')
+
+    # The fields of Contract that rollups are grouped by, which they
+    # share the names of.
+    GROUP_FIELDS = ('_normalized_labor_category', 'education_level',
+                    'min_years_experience', 'schedule', 'business_size')
+
+    # The fields of Contract that rollups are computed from.
+    SOURCE_FIELDS = GROUP_FIELDS + WAGE_FIELDS
+
+    _normalized_labor_category = models.TextField(db_index=True)
+    education_level = models.CharField(
+        choices=EDUCATION_CHOICES, max_length=5, null=True, blank=True)
+    min_years_experience = models.IntegerField()
+    schedule = models.CharField(max_length=128, null=True, blank=True)
+    business_size = models.CharField(max_length=128, null=True, blank=True)
+
+    wage_field = models.CharField(max_length=32)
+
+    count = models.IntegerField()
+    price_sum = models.DecimalField(max_digits=20, decimal_places=2)
+    price_sum_of_squares = models.DecimalField(
+        max_digits=30, decimal_places=4)
+    min_price = CashField(max_digits=10, decimal_places=2)
+    max_price = CashField(max_digits=10, decimal_places=2)
+
+    prices = ArrayField(models.DecimalField(max_digits=10, decimal_places=2))
+    price_counts = ArrayField(models.IntegerField())
+
+    objects = RateRollupQuerySet.as_manager()
+
+    class Meta:
+        # Migration 0033 also adds a unique index on the group fields
+        # and wage_field, which treats nulls as equal.
+        index_together = [('wage_field', '_normalized_labor_category')]
+
+    @classmethod
+    def refresh(cls, categories=None):
+        '''
+        Recompute the rollups of the given normalized labor categories,
+        or of every one if None is given, from the current contracts.
+
+        Refreshes of the same categories wait for each other, since
+        otherwise neither would see the rows the other inserts before
+        deleting the old ones, and both would insert theirs.
+        '''
+
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        where = ''
+        params = []
+        if categories is not None:
+            categories = list(set(categories))
+            if not categories:
+                return
+            where = f'AND {qn("_normalized_labor_category")} = ANY(%s)'
+            params.append(categories)
+
+        groups = ', '.join(qn(f) for f in cls.GROUP_FIELDS)
+        with transaction.atomic(), connection.cursor() as cursor:
+            if categories is None:
+                # This conflicts with itself and with the locks taken by
+                # the DELETE of a refresh of some categories.
+                cursor.execute(
+                    f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+            else:
+                # The locks are taken in the same order by every
+                # refresh, so that they can't deadlock.
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s::regclass::integer, h) '
+                    'FROM (SELECT DISTINCT hashtext(c) AS h '
+                    'FROM unnest(%s::text[]) c ORDER BY h) AS locks',
+                    [cls._meta.db_table, categories]
+                )
+            cursor.execute(f'DELETE FROM {table} WHERE TRUE {where}', params)
+            for wage_field in cls.WAGE_FIELDS:
+                wage = qn(wage_field)
+                cursor.execute(  # nosec
+                    f'INSERT INTO {table} ({groups}, wage_field, count, '
+                    f'price_sum, price_sum_of_squares, min_price, max_price, '
+                    f'prices, price_counts) '
+                    f'SELECT {groups}, %s, SUM(n), SUM(price * n), '
+                    f'SUM(price * price * n), MIN(price), MAX(price), '
+                    f'array_agg(price ORDER BY price), '
+                    f'array_agg(n ORDER BY price) '
+                    f'FROM (SELECT {groups}, {wage} AS price, COUNT(*) AS n '
+                    f'FROM {qn(Contract._meta.db_table)} '
+                    f'WHERE current_price > 0 AND {wage} IS NOT NULL {where} '
+                    f'GROUP BY {groups}, {wage}) AS prices '
+                    f'GROUP BY {groups}',
+                    [wage_field] + params
+                )
 
 
 class ScheduleMetadata(models.Model):
@@ -1,10 +1,16 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Contract
+from .models import Contract, DataVersion, ScheduleMetadata
 
 
 @receiver(post_save, sender=Contract)
 def on_contract_save(sender, instance=None, **kwargs):
     if instance:
         Contract.objects.filter(pk=instance.id).update_search_index()
+
+
+@receiver(post_save, sender=ScheduleMetadata)
+@receiver(post_delete, sender=ScheduleMetadata)
+def on_schedule_metadata_change(sender, **kwargs):
+    DataVersion.bump()
@@ -3,11 +3,14 @@ from unittest.mock import patch
 from decimal import Decimal
 from itertools import cycle
 
-from django.db import connection
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.db.models import ProtectedError
 from django.test import TestCase, SimpleTestCase
 from contracts.mommy_recipes import get_contract_recipe
 
-from ..models import Contract, CashField
+from ..models import (BulkUploadContractSource, Contract, CashField,
+                      DataVersion, RateRollup, clean_search)
 
 
 _normalize = Contract.normalize_labor_category
@@ -106,6 +109,32 @@ class ContractTestCase(TestCase):
         c = Contract.objects.all()[0]
         self.assertEqual(c._normalized_labor_category, 'junior person')
 
+    def test_education_rank_is_kept_up_to_date(self):
+        c1 = get_contract_recipe().make(education_level='MA')
+        self.assertEqual(c1.education_rank, 4)
+        c1.education_level = None
+        c1.save()
+        c2 = get_contract_recipe().prepare(education_level='HS')
+        Contract.objects.bulk_create([c2])
+
+        ranks = dict(Contract.objects.values_list('id', 'education_rank'))
+        self.assertEqual(ranks[c1.id], -1)
+        self.assertEqual(list(ranks.values()).count(1), 1)
+
+        Contract.objects.all().update(education_level='PHD')
+        self.assertEqual(
+            set(Contract.objects.values_list('education_rank', flat=True)),
+            {5})
+
+    def test_order_by_education_level_uses_education_rank(self):
+        get_contract_recipe().make(
+            _quantity=4, education_level=iter(['MA', None, 'AA', 'HS']))
+
+        queryset = Contract.objects.order_by('-education_level')
+        self.assertIn('"education_rank" DESC', str(queryset.query))
+        self.assertEqual([c.education_level for c in queryset],
+                         ['MA', 'AA', 'HS', None])
+
     def test_readable_business_size(self):
         business_sizes = ('O', 'S')
         contract1, contract2 = get_contract_recipe().make(
@@ -341,6 +370,149 @@ class ContractTestCase(TestCase):
             c.calculate_end_year()
 
 
+class DataVersionTests(TestCase):
+    def assertBumps(self, fn):
+        before = DataVersion.get_current()[0]
+        fn()
+        self.assertGreater(DataVersion.get_current()[0], before)
+
+    def test_version_is_zero_initially(self):
+        self.assertEqual(DataVersion.get_current(), (0, None))
+
+    def test_bump_increments_version(self):
+        DataVersion.bump()
+        DataVersion.bump()
+        version, updated_at = DataVersion.get_current()
+        self.assertEqual(version, 2)
+        self.assertIsNotNone(updated_at)
+
+    def test_bump_is_a_single_statement(self):
+        # Even the first bump, so that concurrent ones can't conflict.
+        with self.assertNumQueries(1):
+            DataVersion.bump()
+        self.assertEqual(DataVersion.get_current()[0], 1)
+
+    def test_contract_changes_bump_version(self):
+        contract = get_contract_recipe().prepare()
+        self.assertBumps(contract.save)
+        self.assertBumps(contract.delete)
+        self.assertBumps(lambda: Contract.objects.bulk_create(
+            [get_contract_recipe().prepare()]))
+        self.assertBumps(Contract.objects.all().delete)
+
+
+class RateRollupTests(TestCase):
+    def get_rollups(self):
+        return sorted(RateRollup.objects.values_list(
+            *RateRollup.GROUP_FIELDS, 'wage_field', 'count', 'price_sum',
+            'price_sum_of_squares', 'min_price', 'max_price', 'prices',
+            'price_counts'), key=repr)
+
+    def assertRollupsAreCurrent(self, fn):
+        fn()
+        rollups = self.get_rollups()
+        RateRollup.refresh()
+        self.assertEqual(rollups, self.get_rollups())
+
+    def test_summarizes_contracts(self):
+        for price in ['10.00', '10.00', '20.50']:
+            get_contract_recipe().make(
+                labor_category='Engineer', education_level='BA',
+                min_years_experience=5, schedule='PES', business_size='S',
+                current_price=price)
+        rollup = RateRollup.objects.get(wage_field='current_price')
+        self.assertEqual(rollup._normalized_labor_category, 'engineer')
+        self.assertEqual(rollup.count, 3)
+        self.assertEqual(rollup.price_sum, Decimal('40.50'))
+        self.assertEqual(rollup.price_sum_of_squares, Decimal('620.25'))
+        self.assertEqual(rollup.min_price, Decimal('10.00'))
+        self.assertEqual(rollup.max_price, Decimal('20.50'))
+        self.assertEqual(rollup.prices, [Decimal('10.00'), Decimal('20.50')])
+        self.assertEqual(rollup.price_counts, [2, 1])
+
+    def test_excludes_missing_prices(self):
+        get_contract_recipe().make(second_year_price=None)
+        self.assertEqual(
+            list(RateRollup.objects.values_list('wage_field', flat=True)
+                 .order_by('wage_field')),
+            ['current_price', 'next_year_price'])
+
+    def test_contract_changes_refresh_rollups(self):
+        contract = get_contract_recipe().prepare(labor_category='Engineer')
+        self.assertRollupsAreCurrent(contract.save)
+        contract.labor_category = 'Writer'
+        self.assertRollupsAreCurrent(contract.save)
+        self.assertFalse(RateRollup.objects.filter(
+            _normalized_labor_category='engineer').exists())
+        self.assertRollupsAreCurrent(lambda: Contract.objects.bulk_create(
+            get_contract_recipe().prepare(_quantity=3)))
+        self.assertRollupsAreCurrent(
+            lambda: Contract.objects.filter(pk=contract.pk).update(
+                current_price=99))
+        self.assertRollupsAreCurrent(
+            lambda: Contract.objects.all().update(
+                _normalized_labor_category='analyst'))
+        self.assertRollupsAreCurrent(
+            Contract.objects.bulk_update_normalized_labor_categories)
+        self.assertRollupsAreCurrent(contract.delete)
+        self.assertRollupsAreCurrent(Contract.objects.all().delete)
+        self.assertFalse(RateRollup.objects.exists())
+
+    def test_refreshes_lock_their_categories(self):
+        get_contract_recipe().make(labor_category='Engineer')
+        with transaction.atomic(), connection.cursor() as cursor:
+            RateRollup.refresh(['engineer', 'writer', 'engineer'])
+            cursor.execute(
+                "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+                "AND pid = pg_backend_pid()")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_group_fields_are_unique(self):
+        get_contract_recipe().make(
+            labor_category='Engineer', education_level=None, schedule=None)
+        rollup = RateRollup.objects.get(wage_field='current_price')
+        rollup.pk = None
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            rollup.save()
+        rollup.schedule = ''
+        rollup.save()
+
+    def test_deleting_submitters_keeps_contracts(self):
+        user = User.objects.create_user('submitter')
+        upload_source = BulkUploadContractSource.objects.create(
+            submitter=user,
+            procurement_center=BulkUploadContractSource.REGION_10)
+        get_contract_recipe().make(upload_source=upload_source)
+        rollups = self.get_rollups()
+        user.delete()
+        upload_source.refresh_from_db()
+        self.assertIsNone(upload_source.submitter)
+        self.assertEqual(Contract.objects.count(), 1)
+        self.assertEqual(self.get_rollups(), rollups)
+        self.assertRaises(ProtectedError, upload_source.delete)
+
+    def test_multi_phrase_search_matches_contract_search(self):
+        for category in ['Legal Services', 'Accounting, CPA',
+                         'Senior Software Engineer', 'Project Manager']:
+            get_contract_recipe().make(labor_category=category)
+        for query, query_type in [('engineer', 'match_all'),
+                                  ('software engineer,legal', 'match_all'),
+                                  ('SOFT eng', 'match_phrase'),
+                                  ('legal services', 'match_exact'),
+                                  ('legal', 'match_exact'),
+                                  ('"t man"', 'match_all'),
+                                  ('blarg', 'match_all')]:
+            contracts = Contract.objects.all().multi_phrase_search(
+                query, None, query_type)
+            rollups = RateRollup.objects.filter(
+                wage_field='current_price',
+            ).multi_phrase_search(query, query_type)
+            self.assertEqual(
+                sorted(c._normalized_labor_category for c in contracts),
+                sorted(r._normalized_labor_category for r in rollups),
+                (query, query_type))
+
+
 class BaseContractSearchTestCase(TestCase):
     CATEGORIES = []
 
@@ -397,6 +569,15 @@ class ContractSearchTestCase(BaseContractSearchTestCase):
             u'Interpretation Services Class 2: French, German, Italian'
         ])
 
+    def test_multi_phrase_search_matches_stop_words(self):
+        results = Contract.objects.all().multi_phrase_search(
+            'disposal, for'
+        )
+        self.assertCategoriesEqual(results, [
+            u'Disposal Services',
+            u'Foreign Language Staff Interpreter (Spanish sign language)',
+        ])
+
     def test_search_index_works_via_raw_sql(self):
         results = Contract.objects.raw(
             '''
@@ -415,6 +596,49 @@ class ContractSearchTestCase(BaseContractSearchTestCase):
         ])
 
 
+class PartialWordContractSearchTestCase(BaseContractSearchTestCase):
+    CATEGORIES = [
+        'Analyst',
+        'Business Analysis Consultant',
+        'Software Engineer',
+        'Sysadmin',
+        'Administrative Assistant',
+        'Project Manager',
+    ]
+
+    def assertMatchesLikeIcontains(self, query):
+        '''
+        Check that the given query matches the same contracts as a plain
+        icontains search for every word of any of its phrases does.
+        '''
+
+        expected = Contract.objects.none()
+        for phrase in clean_search(query):
+            word_matches = Contract.objects.all()
+            for word in phrase.split(' '):
+                word_matches = word_matches.filter(
+                    _normalized_labor_category__icontains=word)
+            expected = expected | word_matches
+        results = Contract.objects.all().multi_phrase_search(query)
+        self.assertTrue(expected.exists())
+        self.assertCategoriesEqual(
+            results,
+            [contract.labor_category for contract in expected]
+        )
+
+    def test_partial_words_match(self):
+        self.assertMatchesLikeIcontains('proj manag')
+
+    def test_stemmed_prefixes_match(self):
+        self.assertMatchesLikeIcontains('analy')
+        self.assertMatchesLikeIcontains('analys')
+
+    def test_words_in_the_middle_of_other_words_match(self):
+        self.assertMatchesLikeIcontains('ware')
+        self.assertMatchesLikeIcontains('admin')
+        self.assertMatchesLikeIcontains('ware engineer, sysad')
+
+
 class UnicodeContractSearchTestCase(BaseContractSearchTestCase):
     CATEGORIES = [
         '\u5982',
@@ -0,0 +1,119 @@
+from django.db import connection
+from django.test import TestCase
+
+from contracts.mommy_recipes import get_contract_recipe
+from ..models import Contract
+
+
+class TrigramIndexTests(TestCase):
+    FIELDS = [
+        ('_normalized_labor_category', 'normalized_labor_category'),
+        ('sin', 'sin'),
+        ('contractor_site', 'contractor_site'),
+        ('vendor_name', 'vendor_name'),
+    ]
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def test_trigram_icontains_uses_trigram_indexes(self):
+        for field, index_field in self.FIELDS:
+            queryset = Contract._base_manager.filter(
+                **{f'{field}__trigram_icontains': 'engineer'})
+            self.assertIn(
+                f'Bitmap Index Scan on contracts_contract_{index_field}_trgm',
+                self.explain(queryset),
+                field
+            )
+
+    def test_trigram_icontains_matches_like_icontains(self):
+        get_contract_recipe().make(
+            _quantity=3,
+            vendor_name=iter(['Big 100% Co.', 'ACME Corp.', 'Acme_Corp']),
+        )
+        for value in ['acme', 'ACME CORP', '100%', 'e_c', '']:
+            self.assertEqual(
+                set(Contract.objects.filter(vendor_name__trigram_icontains=value)),
+                set(Contract.objects.filter(vendor_name__icontains=value)),
+                value
+            )
+
+    def test_trigram_icontains_works_on_non_text_fields(self):
+        get_contract_recipe().make(_quantity=2, min_years_experience=iter([12, 3]))
+        results = Contract.objects.filter(min_years_experience__trigram_icontains='2')
+        self.assertEqual([c.min_years_experience for c in results], [12])
+
+
+class EducationRankIndexTests(TestCase):
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            # With stats from a nearly empty table, sorting can look as
+            # cheap as reading the right index.
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def disable_incremental_sort(self):
+        # Postgres 13 and later can read rows in education rank order
+        # and sort each rank by the rest of the sort, which would hide
+        # an index that doesn't match the whole sort, as it must on
+        # the earlier versions this runs on.
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW server_version_num')
+            if int(cursor.fetchone()[0]) >= 130000:
+                cursor.execute('SET LOCAL enable_incremental_sort = off')
+
+    def test_education_sorted_pages_are_read_from_index(self):
+        self.disable_incremental_sort()
+        for sort in [('education_level',), ('-education_level', '-current_price'),
+                     ('education_level', 'id'),
+                     ('education_level', 'current_price', 'id'),
+                     ('-education_level', '-next_year_price', '-id'),
+                     ('education_level', 'second_year_price', 'id')]:
+            plan = self.explain(Contract.objects.order_by(*sort)[:10])
+            self.assertIn('Index Scan', plan, sort)
+            self.assertNotIn('Sort', plan, sort)
+
+
+class CurrentContractIndexTests(TestCase):
+    FIELDS = [
+        'current_price',
+        'next_year_price',
+        'second_year_price',
+        'min_years_experience',
+        'schedule',
+    ]
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            # With stats from a nearly empty table, sorting can look as
+            # cheap as reading the right index.
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def test_partial_indexes_only_cover_current_contracts(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes "
+                "WHERE tablename = 'contracts_contract' "
+                "AND indexname LIKE '%%_current'"
+            )
+            indexes = dict(cursor.fetchall())
+        for field in self.FIELDS:
+            indexdef = indexes[f'contracts_contract_{field}_current']
+            self.assertIn(f'({field}, id) WHERE (current_price > ', indexdef)
+
+    def test_sorted_pages_are_read_from_index(self):
+        for field in self.FIELDS:
+            plan = self.explain(Contract.objects.order_by(field, 'id')[:10])
+            self.assertIn('Index Scan', plan, field)
+            self.assertNotRegex(plan, r'(?<!Incremental )Sort  ', field)
@@ -0,0 +1,156 @@
+from copy import deepcopy
+
+from django.db.models import ProtectedError
+from django.forms.models import model_to_dict
+from django.test import TestCase
+
+from ..loaders.postgres_copy import ContractCopyLoader
+from ..loaders.region_10 import Region10Loader
+from ..models import BulkUploadContractSource, Contract, DataVersion, \
+    RateRollup
+
+
+ROWS = [
+    ['Engineer\tII\\', '100.125', '101', '', '', '', 'Masters', '5.0', 'S',
+     'Both', 'Acme, LLC', 'GS-12F-0123S', 'MOBIS', '123-1', '1.0',
+     '06/01/2016', ''],
+    ['Clerk', '20', '21', '22', '23', '24', '', '', 'O',
+     'Customer', 'Foobar Inc', 'GS-12F-0456S', 'MOBIS', '', '2.0',
+     '', '05/31/2021'],
+]
+
+
+def get_values(contracts):
+    return [
+        model_to_dict(contract, exclude=['id', 'upload_source'])
+        for contract in contracts.order_by('labor_category', 'id')
+    ]
+
+
+class ContractCopyLoaderTests(TestCase):
+    def make_upload_source(self):
+        return BulkUploadContractSource.objects.create(
+            procurement_center=BulkUploadContractSource.REGION_10)
+
+    def load(self, rows=ROWS):
+        upload_source = self.make_upload_source()
+        loader = ContractCopyLoader(upload_source)
+        self.assertEqual(loader.copy(
+            Region10Loader.make_contract(row) for row in rows), len(rows))
+        changes = loader.replace(
+            Contract._base_manager.exclude(upload_source=upload_source))
+        loader.analyze()
+        return changes
+
+    def test_it_loads_what_bulk_create_creates(self):
+        Contract.objects.bulk_create(
+            [Region10Loader.make_contract(row) for row in ROWS])
+        expected = get_values(Contract.objects.all())
+        Contract.objects.all().delete()
+
+        self.assertEqual(self.load(), {
+            'inserted': 2, 'updated': 0, 'deleted': 0, 'unchanged': 0})
+        self.assertEqual(get_values(Contract.objects.all()), expected)
+        self.assertEqual(Contract.objects.search('clerk').count(), 1)
+
+    def test_unchanged_contracts_are_left_alone(self):
+        self.load()
+        ids = sorted(Contract.objects.values_list('id', flat=True))
+        version = DataVersion.get_current()
+
+        self.assertEqual(self.load(), {
+            'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 2})
+        self.assertEqual(
+            sorted(Contract.objects.values_list('id', flat=True)), ids)
+        self.assertEqual(DataVersion.get_current(), version)
+
+    def test_deleting_earlier_upload_source_keeps_contracts(self):
+        self.load()
+        first_source = BulkUploadContractSource.objects.get()
+        rows = deepcopy(ROWS)
+        rows[1][1] = '30'
+        self.load(rows)
+
+        with self.assertRaises(ProtectedError):
+            first_source.delete()
+        self.assertEqual(Contract.objects.count(), 2)
+        self.assertEqual(
+            Contract.objects.filter(upload_source=first_source).count(), 1)
+
+    def test_changed_contracts_are_updated(self):
+        self.load()
+        clerk = Contract.objects.get(labor_category='Clerk')
+        rows = deepcopy(ROWS)
+        rows[1][1] = '30'
+
+        self.assertEqual(self.load(rows), {
+            'inserted': 0, 'updated': 1, 'deleted': 0, 'unchanged': 1})
+        clerk.refresh_from_db()
+        self.assertEqual(clerk.hourly_rate_year1, 30)
+        self.assertEqual(Contract.objects.search('clerk').count(), 1)
+
+    def test_contracts_are_inserted_and_deleted(self):
+        self.load()
+        rows = deepcopy(ROWS)
+        rows[1][0] = 'Accountant'
+
+        self.assertEqual(self.load(rows), {
+            'inserted': 1, 'updated': 0, 'deleted': 1, 'unchanged': 1})
+        self.assertEqual(get_values(Contract.objects.all())[0]['labor_category'],
+                         'Accountant')
+        self.assertEqual(Contract.objects.search('clerk').count(), 0)
+
+    def test_duplicate_contracts_are_counted(self):
+        self.load(ROWS + ROWS[1:])
+        self.assertEqual(self.load(ROWS + ROWS[1:] * 2), {
+            'inserted': 1, 'updated': 0, 'deleted': 0, 'unchanged': 3})
+        self.assertEqual(self.load(ROWS), {
+            'inserted': 0, 'updated': 0, 'deleted': 2, 'unchanged': 2})
+        self.assertEqual(Contract.objects.count(), 2)
+
+    def test_rate_rollups_are_refreshed(self):
+        self.load()
+        rollups = self.get_rollups()
+        self.assertNotEqual(rollups, [])
+        RateRollup.refresh()
+        self.assertEqual(self.get_rollups(), rollups)
+
+    def get_rollups(self):
+        return sorted(
+            str(rollup) for rollup in RateRollup.objects.values_list(
+                '_normalized_labor_category', 'wage_field', 'count'))
+
+    def test_replace_raises_if_contracts_are_missing(self):
+        loader = ContractCopyLoader(self.make_upload_source())
+        loader.copy([Region10Loader.make_contract(ROWS[0])])
+        loader.num_copied += 1
+        with self.assertRaisesRegexp(ValueError, '2 contracts were copied'):
+            loader.replace()
+
+    def test_replace_raises_if_not_as_many_contracts_as_expected(self):
+        loader = ContractCopyLoader(self.make_upload_source())
+        loader.copy([Region10Loader.make_contract(ROWS[0])])
+        with self.assertRaisesRegexp(ValueError, '2 contracts were expected'):
+            loader.replace(num_expected=2)
+
+    def test_replace_refuses_to_delete_too_many_contracts(self):
+        self.load()
+        upload_source = self.make_upload_source()
+        loader = ContractCopyLoader(upload_source)
+        loader.copy([Region10Loader.make_contract(ROWS[0])])
+        with self.assertRaisesRegexp(ValueError, '1 of 2 existing'):
+            loader.replace(
+                Contract._base_manager.exclude(upload_source=upload_source),
+                max_deleted_fraction=0.25)
+        self.assertEqual(Contract.objects.count(), 2)
+
+    def test_replace_deletes_up_to_the_max_fraction_of_contracts(self):
+        self.load()
+        upload_source = self.make_upload_source()
+        loader = ContractCopyLoader(upload_source)
+        loader.copy([Region10Loader.make_contract(ROWS[0])])
+        changes = loader.replace(
+            Contract._base_manager.exclude(upload_source=upload_source),
+            max_deleted_fraction=0.5)
+        self.assertEqual(changes['deleted'], 1)
+        self.assertEqual(Contract.objects.count(), 1)
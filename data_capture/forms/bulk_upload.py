@@ -18,8 +18,12 @@ class Region10BulkUploadForm(forms.Form):
 
         file = cleaned_data.get('file')
 
-        if file and not Region10SpreadsheetConverter(file).is_valid_file():
-            raise forms.ValidationError("That file does not appear to be a "
-                                        "valid Region 10 export. Try another?")
+        if file:
+            converter = Region10SpreadsheetConverter(file)
+            if not converter.is_valid_file():
+                raise forms.ValidationError(
+                    "That file does not appear to be a valid Region 10 "
+                    "export. Try another?")
+            cleaned_data['file_metadata'] = converter.get_metadata()
 
         return cleaned_data
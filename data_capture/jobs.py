@@ -1,12 +1,18 @@
 import logging
+import multiprocessing
 import traceback
+from functools import partial
+from itertools import islice
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
-from django.db import transaction
+from django.db import connections, transaction
 from django_rq import job
 
 from . import email
 from .r10_spreadsheet_converter import Region10SpreadsheetConverter
+from calc.db_connections import close_stale_connections
+from contracts.loaders.postgres_copy import ContractCopyLoader
 from contracts.loaders.region_10 import Region10Loader
 from contracts.models import Contract, BulkUploadContractSource
 
@@ -41,9 +47,24 @@ def _create_contract_batches(upload_source, batch_size=5000, rows=None):
         yield contracts, bad_rows
 
 
-@transaction.atomic
-def _process_bulk_upload(upload_source):
+def _save_contract_batches(upload_source, save):
+    total_contracts = 0
+    total_bad_rows = 0
+
+    for contracts, bad_rows in _create_contract_batches(upload_source):
+        save(contracts)
+        total_contracts += len(contracts)
+        total_bad_rows += len(bad_rows)
+        contracts_logger.info(
+            f"Saved {total_contracts} contracts so far "
+            f"({total_bad_rows} bad rows found)."
+        )
+
+    return total_contracts, total_bad_rows
+
 
+@transaction.atomic
+def _replace_contracts_with_bulk_create(upload_source):
     contracts_logger.info("Deleting contract objects related to region 10.")
 
     # Delete existing contracts identified by the same
@@ -54,27 +75,168 @@ def _process_bulk_upload(upload_source):
 
     contracts_logger.info("Generating new contract objects.")
 
+    result = _save_contract_batches(upload_source, Contract.objects.bulk_create)
+
+    # Update the upload_source
+    upload_source.has_been_loaded = True
+    upload_source.save()
+
+    return result
+
+
+def _create_row_blocks(upload_source, block_size):
+    r10_file = ContentFile(upload_source.original_file)
+    rows = Region10SpreadsheetConverter(r10_file).convert_next()
+    while True:
+        block = list(islice(rows, block_size))
+        if not block:
+            return
+        yield block
+
+
+def _convert_rows(loader, rows):
+    '''
+    Convert the given spreadsheet rows to rows that the given
+    ContractCopyLoader can copy, returning them along with the rows
+    that couldn't be converted. This runs in worker processes, so it
+    mustn't use the database.
+    '''
+
+    copy_rows = []
+    bad_rows = []
+    for row in rows:
+        try:
+            contract = Region10Loader.make_contract(row)
+            copy_rows.append(loader.get_row(contract))
+        except (ValueError, ValidationError):
+            bad_rows.append(row)
+    return copy_rows, bad_rows
+
+
+# The database connections that worker processes inherit from the
+# process that forked them. Each worker keeps them referenced so that
+# they're never closed. Closing them would end that process's sessions,
+# since they share its sockets.
+_inherited_connections: list = []
+
+
+def _drop_inherited_connections():
+    '''
+    Make Django forget the database connections that a worker process
+    inherited, without closing them, so that it can't use them.
+    '''
+
+    for connection in connections.all():
+        if connection.connection is not None:
+            _inherited_connections.append(connection.connection)
+            connection.connection = None
+
+
+def _copy_contracts(upload_source, loader, workers, block_size=5000):
+    '''
+    Convert the rows of the given upload source in blocks, in the
+    given number of worker processes, and copy the results with the
+    given ContractCopyLoader as they come back, in order. Returns the
+    number of contracts and bad rows, and the number of rows that were
+    read from the upload source.
+    '''
+
+    num_rows = 0
+
+    def read_blocks():
+        nonlocal num_rows
+        for block in _create_row_blocks(upload_source, block_size):
+            num_rows += len(block)
+            yield block
+
+    blocks = read_blocks()
+    convert = partial(_convert_rows, loader)
+
+    if workers > 1:
+        with multiprocessing.Pool(
+                workers, initializer=_drop_inherited_connections) as pool:
+            result = _copy_converted_rows(loader, pool.imap(convert, blocks))
+    else:
+        result = _copy_converted_rows(loader, (convert(b) for b in blocks))
+    return (*result, num_rows)
+
+
+def _copy_converted_rows(loader, results):
     total_contracts = 0
     total_bad_rows = 0
 
-    for contracts, bad_rows in _create_contract_batches(upload_source):
-        Contract.objects.bulk_create(contracts)
-        total_contracts += len(contracts)
+    for copy_rows, bad_rows in results:
+        loader.copy_rows(copy_rows)
+        total_contracts += len(copy_rows)
         total_bad_rows += len(bad_rows)
         contracts_logger.info(
             f"Saved {total_contracts} contracts so far "
             f"({total_bad_rows} bad rows found)."
         )
 
-    # Update the upload_source
-    upload_source.has_been_loaded = True
-    upload_source.save()
-
     return total_contracts, total_bad_rows
 
 
+def _process_bulk_upload(upload_source, use_copy=True, workers=1):
+    '''
+    Replace all Region 10 contracts with the ones in the given upload
+    source.
+
+    If use_copy is True, the new contracts are copied into a staging
+    table with Postgres' COPY command, and then only the differences
+    between them and the existing contracts are applied, in a short
+    transaction. The rows of the upload source are converted by the
+    given number of worker processes. Nothing is changed if the
+    contracts would be deleted in larger numbers than
+    settings.BULK_UPLOAD_MAX_DELETED_FRACTION allows.
+
+    Otherwise, the existing contracts are deleted and the new ones
+    inserted with the ORM, all in one long transaction.
+    '''
+
+    if not use_copy:
+        return _replace_contracts_with_bulk_create(upload_source)
+
+    contracts_logger.info("Copying new contract objects to a staging table.")
+
+    loader = ContractCopyLoader(upload_source)
+    num_contracts, num_bad_rows, num_rows = _copy_contracts(
+        upload_source, loader, workers)
+
+    contracts_logger.info("Applying changes to contracts related to region 10.")
+
+    with transaction.atomic():
+        changes = loader.replace(
+            Contract._base_manager.filter(
+                upload_source__procurement_center=(
+                    BulkUploadContractSource.REGION_10)
+            ),
+            num_expected=num_rows - num_bad_rows,
+            max_deleted_fraction=settings.BULK_UPLOAD_MAX_DELETED_FRACTION,
+        )
+
+        # Update the upload_source
+        upload_source.has_been_loaded = True
+        upload_source.save()
+
+    contracts_logger.info(
+        f"{changes['inserted']} contracts inserted, "
+        f"{changes['updated']} updated, {changes['deleted']} deleted and "
+        f"{changes['unchanged']} unchanged."
+    )
+
+    loader.analyze()
+
+    return num_contracts, num_bad_rows
+
+
 @job
-def process_bulk_upload_and_send_email(upload_source_id):
+def process_bulk_upload_and_send_email(upload_source_id, workers=None):
+    if workers is None:
+        workers = settings.BULK_UPLOAD_WORKERS
+    # Workers keep their database connections open between jobs, so the
+    # one left by the last job may have broken since.
+    close_stale_connections()
     contracts_logger.info(
         "Starting bulk upload processing (pk=%d)." % upload_source_id
     )
@@ -83,13 +245,17 @@ def process_bulk_upload_and_send_email(upload_source_id):
     )
 
     try:
-        num_contracts, num_bad_rows = _process_bulk_upload(upload_source)
+        num_contracts, num_bad_rows = _process_bulk_upload(
+            upload_source, workers=workers)
         email.bulk_upload_succeeded(upload_source, num_contracts, num_bad_rows)
     except Exception:
         contracts_logger.exception(
             'An exception occurred during bulk upload processing '
             '(pk=%d).' % upload_source_id
         )
+        # If the upload failed because the connection broke during it,
+        # the email needs a new one.
+        close_stale_connections()
         tb = traceback.format_exc()
         email.bulk_upload_failed(upload_source, tb)
 
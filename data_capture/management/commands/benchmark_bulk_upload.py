@@ -0,0 +1,133 @@
+import datetime
+import io
+import time
+
+import xlsxwriter
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from data_capture import jobs
+from data_capture.r10_spreadsheet_converter import Region10SpreadsheetConverter
+from contracts.models import BulkUploadContractSource
+
+
+EDUCATION_LEVELS = ['Associates', 'Bachelors', 'Masters', 'Ph.D.', '']
+
+
+def make_r10_spreadsheet(num_rows: int) -> bytes:
+    '''
+    Return a synthetic Region 10 export spreadsheet with the given
+    number of rows.
+    '''
+
+    f = io.BytesIO()
+    workbook = xlsxwriter.Workbook(f, {'constant_memory': True})
+    date_format = workbook.add_format({'num_format': 'mm/dd/yyyy'})
+    sheet = workbook.add_worksheet()
+    headings = list(Region10SpreadsheetConverter.xl_heading_to_csv_idx_map)
+    sheet.write_row(0, 0, headings)
+    for i in range(1, num_rows + 1):
+        base_rate = 50 + i % 100 + 0.25
+        sheet.write_row(i, 0, [
+            f'Senior Engineer {i % 700}',
+            base_rate,
+            base_rate + 1,
+            base_rate + 2,
+            base_rate + 3,
+            base_rate + 4,
+            EDUCATION_LEVELS[i % len(EDUCATION_LEVELS)],
+            i % 15,
+            'S' if i % 2 else 'O',
+            'Both',
+            f'Vendor {i % 900}',
+            f'GS-10F-{i // 20:05d}X',
+            'MOBIS',
+            '874-1',
+            1 + i % 5,
+        ])
+        sheet.write_datetime(i, 15, datetime.datetime(2016, 6, 1),
+                             date_format)
+        sheet.write_datetime(i, 16, datetime.datetime(2021, 5, 31),
+                             date_format)
+    workbook.close()
+    return f.getvalue()
+
+
+class Command(BaseCommand):
+    help = '''
+    Compare how many rows per second a synthetic Region 10 bulk upload
+    can be processed at when contracts are inserted with the ORM and
+    when they're loaded with COPY, both into an empty table and over the
+    contracts of an identical earlier upload. Nothing is saved to the
+    database.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-r', '--rows',
+            default=100000,
+            type=int,
+            help='number of rows in the spreadsheet (default is 100000)'
+        )
+
+        parser.add_argument(
+            '-w', '--workers',
+            default=settings.BULK_UPLOAD_WORKERS,
+            type=int,
+            help='number of processes that convert rows when uploading '
+                 f'with COPY (default is {settings.BULK_UPLOAD_WORKERS})'
+        )
+
+    def upload(self, use_copy: bool, workers: int=1) -> float:
+        upload_source = BulkUploadContractSource.objects.create(
+            original_file=self.spreadsheet,
+            procurement_center=BulkUploadContractSource.REGION_10,
+        )
+        start = time.perf_counter()
+        jobs._process_bulk_upload(upload_source, use_copy=use_copy,
+                                  workers=workers)
+        return time.perf_counter() - start
+
+    # The synthetic sheet replaces whatever Region 10 contracts are
+    # already in the database, which is all rolled back afterwards.
+    @override_settings(BULK_UPLOAD_MAX_DELETED_FRACTION=1)
+    def time_upload(self, use_copy: bool, reload: bool=False,
+                    workers: int=1) -> float:
+        with transaction.atomic():
+            if reload:
+                self.upload(use_copy, workers)
+            seconds = self.upload(use_copy, workers)
+            transaction.set_rollback(True)
+        return seconds
+
+    def handle(self, *args, **options):
+        num_rows = options['rows']
+        workers = options['workers']
+        self.spreadsheet = make_r10_spreadsheet(num_rows)
+
+        start = time.perf_counter()
+        for _ in jobs._create_contract_batches(
+                BulkUploadContractSource(original_file=self.spreadsheet)):
+            pass
+        self.stdout.write(
+            f'Conversion only: '
+            f'{num_rows / (time.perf_counter() - start):,.0f} rows/second'
+        )
+
+        runs = [
+            ('Upload with bulk_create', False, False, 1),
+            ('Upload with COPY', True, False, 1),
+            ('Reload of the same sheet with bulk_create', False, True, 1),
+            ('Reload of the same sheet with COPY', True, True, 1),
+        ]
+        if workers > 1:
+            runs.insert(2, (f'Upload with COPY and {workers} workers',
+                            True, False, workers))
+
+        for name, use_copy, reload, num_workers in runs:
+            seconds = self.time_upload(use_copy, reload, num_workers)
+            self.stdout.write(
+                f'{name}: {num_rows / seconds:,.0f} rows/second'
+            )
@@ -1,4 +1,5 @@
 from mimetypes import MimeTypes
+from django.conf import settings
 from django.core.management import BaseCommand
 
 from data_capture import jobs
@@ -16,6 +17,20 @@ class Command(BaseCommand):
             help='input filename (.xlsx)'
         )
 
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='insert contracts with the ORM instead of with COPY'
+        )
+
+        parser.add_argument(
+            '-w', '--workers',
+            default=settings.BULK_UPLOAD_WORKERS,
+            type=int,
+            help='number of processes that convert rows (default is '
+                 f'{settings.BULK_UPLOAD_WORKERS})'
+        )
+
     def handle(self, *args, **options):
         filename = options['filename']
 
@@ -28,7 +43,11 @@ class Command(BaseCommand):
         )
         f.close()
 
-        ok, fails = jobs._process_bulk_upload(upload_source)
+        ok, fails = jobs._process_bulk_upload(
+            upload_source,
+            use_copy=not options['no_copy'],
+            workers=options['workers'],
+        )
 
         self.stdout.write(
             f"{ok} contracts successfully processed, {fails} failed.\n"
@@ -1,14 +1,22 @@
-from typing import List, Optional
+import hashlib
+from datetime import datetime
+from typing import Any, Iterator, List, Optional
 
 import xlrd
 from xlrd.book import XL_CELL_DATE
 from xlrd.xldate import xldate_as_datetime
 
+from .xlsx_reader import XlsxReader, is_xlsx
+
 
 class Region10SpreadsheetConverter():
     '''
     Used to convert Region 10 database export XLS/X file to a CSV-like
     collection of row objects
+
+    XLSX files are read a row at a time, so that conversion can start
+    right away and doesn't need the whole sheet in memory. Legacy XLS
+    files are read with xlrd.
     '''
 
     sheet_index = 0
@@ -27,6 +35,29 @@ class Region10SpreadsheetConverter():
             self.xls_file.seek(0)
         return self._book
 
+    def iter_sheet_rows(self) -> Iterator[List[Any]]:
+        '''
+        Returns a generator that yields the rows of the sheet, heading
+        row first, as lists of cell values in which dates are datetimes
+        '''
+
+        if not is_xlsx(self.xls_file):
+            datemode = self.book.datemode  # necessary for Excel date parsing
+            sheet = self.book.sheet_by_index(self.sheet_index)
+            for rx in range(sheet.nrows):
+                yield [
+                    xldate_as_datetime(cell.value, datemode)
+                    if cell.ctype == XL_CELL_DATE else cell.value
+                    for cell in sheet.row(rx)
+                ]
+            return
+
+        try:
+            reader = XlsxReader(self.xls_file)
+            yield from reader.iter_rows(self.sheet_index)
+        finally:
+            self.xls_file.seek(0)
+
     # Dict of R10 Excel sheet headings to the expected col index of CSV rows
     # loaded by the existing R10 data loader
     #
@@ -63,13 +94,49 @@ class Region10SpreadsheetConverter():
 
         return True
 
+    def get_num_rows(self) -> int:
+        '''
+        Returns the number of rows in the sheet, including the heading
+        row. For XLSX files, this is read from the sheet's dimension when
+        it has one, so that the sheet's cells don't need to be parsed.
+        '''
+        if not is_xlsx(self.xls_file):
+            return self.book.sheet_by_index(self.sheet_index).nrows
+
+        try:
+            num_rows = XlsxReader(self.xls_file).get_num_rows(
+                self.sheet_index)
+        finally:
+            self.xls_file.seek(0)
+        if num_rows is None:
+            return sum(1 for row in self.iter_sheet_rows())
+        return num_rows
+
+    def get_sha256(self) -> str:
+        '''
+        Returns the hex digest of the SHA-256 hash of the related xls_file
+        '''
+        hasher = hashlib.sha256()
+        for chunk in iter(lambda: self.xls_file.read(65536), b''):
+            hasher.update(chunk)
+        self.xls_file.seek(0)
+        return hasher.hexdigest()
+
     def get_metadata(self):
         '''
-        Returns a dict containing metadata about the related xls_file
+        Returns a dict containing metadata about the related xls_file:
+        its number of rows (not counting the header row), the column
+        indices of its headings, whether it's a valid Region 10
+        spreadsheet, and its SHA-256 hash
         '''
-        sheet = self.book.sheet_by_index(self.sheet_index)
+        heading_indices = self.get_heading_indices_map(raises=False)
         return {
-            'num_rows': sheet.nrows - 1  # subtract 1 for the header row
+            # subtract 1 for the header row
+            'num_rows': max(self.get_num_rows() - 1, 0),
+            'heading_indices': heading_indices,
+            'is_valid': all(heading in heading_indices
+                            for heading in self.xl_heading_to_csv_idx_map),
+            'sha256': self.get_sha256(),
         }
 
     def convert_next(self):
@@ -78,30 +145,22 @@ class Region10SpreadsheetConverter():
         from the related xls_file to the CSV row format expected by
         contracts.loaders.region_10.Region10Loader
         '''
-        heading_indices = self.get_heading_indices_map()
-
-        datemode = self.book.datemode  # necessary for Excel date parsing
+        rows = self.iter_sheet_rows()
+        heading_indices = self._get_heading_indices_map(next(rows, []))
 
-        sheet = self.book.sheet_by_index(self.sheet_index)
-
-        # skip the heading row, process the rest
-        for rx in range(1, sheet.nrows):
+        # the heading row was consumed above, so process the rest
+        for xl_row in rows:
             row: List[Optional[str]] = \
                 [None] * len(self.xl_heading_to_csv_idx_map)  # init row
 
             for heading, xl_idx in heading_indices.items():
-                # item_val = cval(xl_idx)
-                cell = sheet.cell(rx, xl_idx)
-
-                cell_type = cell.ctype
-                cell_value = cell.value
+                cell_value = xl_row[xl_idx] if xl_idx < len(xl_row) else ''
 
                 csv_col_idx = self.xl_heading_to_csv_idx_map[heading]
 
-                if cell_type is XL_CELL_DATE:
+                if isinstance(cell_value, datetime):
                     # convert to mm/dd/YYYY string
-                    date = xldate_as_datetime(cell_value, datemode)
-                    cell_value = date.strftime('%m/%d/%Y')
+                    cell_value = cell_value.strftime('%m/%d/%Y')
 
                 # Save the string value into the expected CSV col
                 # index of the row
@@ -122,14 +181,15 @@ class Region10SpreadsheetConverter():
         to the column indices associated with those fields in that sheet
         '''
 
-        sheet = self.book.sheet_by_index(self.sheet_index)
-        headings = sheet.row(0)
+        headings = next(self.iter_sheet_rows(), [])
+        return self._get_heading_indices_map(headings, raises)
 
+    def _get_heading_indices_map(self, headings, raises=True):
         idx_map = {}
-        for i, cell in enumerate(headings):
+        for i, value in enumerate(headings):
             # find the val in the xl_heading_to_csv_idx_map
-            if cell.value in self.xl_heading_to_csv_idx_map:
-                idx_map[cell.value] = i
+            if value in self.xl_heading_to_csv_idx_map:
+                idx_map[value] = i
 
         if raises:
             missing_headers = []
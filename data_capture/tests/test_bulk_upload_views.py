@@ -1,5 +1,6 @@
 import json
 import unittest
+from unittest.mock import patch
 
 from django.core.files.base import ContentFile
 
@@ -70,6 +71,7 @@ class Region10UploadStep1Tests(R10StepTestCase):
                 upload_source.pk)
             self.assertEqual(user, upload_source.submitter)
             self.assertFalse(upload_source.has_been_loaded)
+            self.assertEqual(upload_source.file_metadata['num_rows'], 4)
 
     def test_valid_post_redirects_to_step_2(self):
         self.login()
@@ -127,6 +129,25 @@ class Region10UploadStep2Tests(R10StepTestCase):
         self.assertEqual(res.status_code, 200)
         self.assertIn('file_metadata', res.context)
 
+    @patch.object(bulk_upload, 'Region10SpreadsheetConverter')
+    def test_get_uses_stored_file_metadata(self, converter):
+        user = self.login()
+        src = self.setup_upload_source(user)
+        BulkUploadContractSource.objects.filter(pk=src.pk).update(
+            file_metadata={'num_rows': 12345})
+        res = self.client.get(self.url)
+        self.assertContains(res, '12,345 rows ready to add to CALC')
+        converter.assert_not_called()
+
+    def test_get_stores_missing_file_metadata(self):
+        user = self.login()
+        src = self.setup_upload_source(user)
+        self.assertIsNone(src.file_metadata)
+        res = self.client.get(self.url)
+        self.assertContains(res, '4 rows ready to add to CALC')
+        src.refresh_from_db()
+        self.assertEqual(src.file_metadata['num_rows'], 4)
+
     def test_post_is_ok_and_contracts_are_created_properly(self):
         user = self.login()
         self.setup_upload_source(user)
@@ -168,3 +168,9 @@ class Region10BulkUploadFormTests(TestCase):
     def test_valid_when_file_is_valid(self):
         form = Region10BulkUploadForm({}, {'file': r10_file()})
         self.assertTrue(form.is_valid())
+
+    def test_file_metadata_is_cleaned(self):
+        form = Region10BulkUploadForm({}, {'file': r10_file()})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['file_metadata']['num_rows'], 4)
+        self.assertTrue(form.cleaned_data['file_metadata']['is_valid'])
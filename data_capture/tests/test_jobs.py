@@ -1,11 +1,19 @@
+import multiprocessing
 from unittest.mock import patch
 from django.core import mail
-from django.test import TestCase
+from django.db import connection, connections
+from django.test import TestCase, override_settings
 from rq import SimpleWorker
 import django_rq
 
-from .common import create_bulk_upload_contract_source
+from contracts.models import Contract
+from .common import create_bulk_upload_contract_source, r10_file
 from .. import jobs
+from ..r10_spreadsheet_converter import Region10SpreadsheetConverter
+
+
+def get_open_connections(_):
+    return [c.alias for c in connections.all() if c.connection is not None]
 
 
 def process_worker_jobs():
@@ -74,3 +82,73 @@ class ProcessBulkUploadTests(TestCase):
 
         with self.assertRaises(StopIteration):
             next(generator)
+
+
+class ProcessBulkUploadCopyTests(TestCase):
+    def get_contracts(self, use_copy, workers=1):
+        src = create_bulk_upload_contract_source(user='foo@example.org')
+        src.save()
+        result = jobs._process_bulk_upload(src, use_copy=use_copy,
+                                           workers=workers)
+        contracts = list(Contract.objects.order_by('labor_category').values(
+            'labor_category', 'current_price', 'contract_start',
+            'education_rank', 'search_index'))
+        Contract._base_manager.filter(upload_source=src).delete()
+        src.delete()
+        src.submitter.delete()
+        return result, contracts
+
+    def test_copy_loads_the_same_contracts_as_bulk_create(self):
+        result, contracts = self.get_contracts(use_copy=False)
+        self.assertEqual(result, (3, 1))
+        self.assertEqual(self.get_contracts(use_copy=True),
+                         (result, contracts))
+
+    def test_rows_can_be_converted_in_parallel(self):
+        expected = self.get_contracts(use_copy=True)
+        self.assertEqual(self.get_contracts(use_copy=True, workers=2),
+                         expected)
+
+    @patch.object(jobs, '_create_row_blocks')
+    def test_bad_rows_from_every_block_are_counted(self, mock):
+        src = create_bulk_upload_contract_source(user='foo@example.org')
+        src.save()
+        rows = Region10SpreadsheetConverter(r10_file()).convert_file()
+        mock.return_value = [rows, [['']], [['']]]
+        self.assertEqual(jobs._process_bulk_upload(src, workers=2), (3, 3))
+
+    def test_workers_drop_inherited_connections(self):
+        connection.ensure_connection()
+        with multiprocessing.Pool(
+                1, initializer=jobs._drop_inherited_connections) as pool:
+            self.assertEqual(pool.map(get_open_connections, [None]), [[]])
+        # The connection that the workers inherited still works.
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def test_rows_lost_in_conversion_change_nothing(self):
+        src = create_bulk_upload_contract_source(user='foo@example.org')
+        src.save()
+        convert_rows = jobs._convert_rows
+        with patch.object(jobs, '_convert_rows') as mock:
+            mock.side_effect = \
+                lambda loader, rows: convert_rows(loader, rows[1:])
+            with self.assertRaisesRegexp(ValueError, 'expected'):
+                jobs._process_bulk_upload(src)
+        self.assertEqual(Contract.objects.count(), 0)
+
+    @override_settings(BULK_UPLOAD_MAX_DELETED_FRACTION=0.5)
+    def test_uploads_that_delete_too_many_contracts_change_nothing(self):
+        src = create_bulk_upload_contract_source(user='foo@example.org')
+        src.save()
+        jobs._process_bulk_upload(src)
+        src = create_bulk_upload_contract_source(user=src.submitter)
+        src.save()
+        rows = Region10SpreadsheetConverter(r10_file()).convert_file()
+        with patch.object(jobs, '_create_row_blocks') as mock:
+            mock.return_value = [rows[:1]]
+            with self.assertRaisesRegexp(ValueError, '2 of 3 existing'):
+                jobs._process_bulk_upload(src)
+        self.assertEqual(Contract.objects.count(), 3)
+        src.refresh_from_db()
+        self.assertFalse(src.has_been_loaded)
@@ -42,3 +42,22 @@ class TestSendtesthtmlemail(TestCase):
 class TestProcessBulkUpload(TestCase):
     def test_it_does_not_explode(self):
         call_command('process_bulk_upload', R10_XLSX_PATH)
+
+    def test_it_works_with_workers(self):
+        call_command('process_bulk_upload', R10_XLSX_PATH, '--workers', '2')
+
+    def test_it_works_without_copy(self):
+        call_command('process_bulk_upload', R10_XLSX_PATH, '--no-copy')
+
+
+class TestBenchmarkBulkUpload(TestCase):
+    def test_it_works(self):
+        output = io.StringIO()
+        call_command('benchmark_bulk_upload', '--rows', '3', '--workers',
+                     '2', stdout=output)
+        self.assertIn('Conversion only: ', output.getvalue())
+        self.assertIn('Upload with bulk_create: ', output.getvalue())
+        self.assertIn('Upload with COPY: ', output.getvalue())
+        self.assertIn('Upload with COPY and 2 workers: ', output.getvalue())
+        self.assertIn('Reload of the same sheet with COPY: ',
+                      output.getvalue())
@@ -1,3 +1,6 @@
+import hashlib
+from unittest.mock import patch
+
 from django.test import TestCase
 
 import xlrd
@@ -34,10 +37,27 @@ class TestRegion10SpreadsheetConverter(TestCase):
         book = xlrd.open_workbook(file_contents=r10_file().read())
         sheet = book.sheet_by_index(0)
         expected = {
-            'num_rows': sheet.nrows - 1
+            'num_rows': sheet.nrows - 1,
+            'heading_indices': converter.get_heading_indices_map(),
+            'is_valid': True,
+            'sha256': hashlib.sha256(r10_file().read()).hexdigest(),
         }
         self.assertEqual(expected, converter.get_metadata())
 
+    def test_get_metadata_works_with_invalid_files(self):
+        converter = Region10SpreadsheetConverter(xls_file=r10_file())
+        converter.xl_heading_to_csv_idx_map = {'Location': 0, 'bad_col': 1}
+        metadata = converter.get_metadata()
+        self.assertEqual(metadata['heading_indices'], {'Location': 9})
+        self.assertFalse(metadata['is_valid'])
+
+    @patch('data_capture.xlsx_reader.XlsxReader.get_num_rows',
+           return_value=None)
+    def test_get_num_rows_counts_rows_without_dimension(self, get_num_rows):
+        converter = Region10SpreadsheetConverter(xls_file=r10_file())
+        self.assertEqual(converter.get_num_rows(), 5)
+        get_num_rows.assert_called_once_with(0)
+
     def test_get_heading_indices_map(self):
         converter = Region10SpreadsheetConverter(xls_file=r10_file())
         indices_map = converter.get_heading_indices_map()
@@ -86,3 +106,18 @@ class TestRegion10SpreadsheetConverter(TestCase):
         parsed_rows = converter.convert_file()
         self.assertEqual(len(parsed_rows), 4)
         self.assertEqual(expected_results, parsed_rows)
+
+    @patch('data_capture.r10_spreadsheet_converter.is_xlsx',
+           return_value=False)
+    def test_xlrd_is_used_for_xls_files(self, is_xlsx):
+        converter = Region10SpreadsheetConverter(xls_file=r10_file())
+        self.assertEqual(expected_results, converter.convert_file())
+        self.assertEqual(converter.get_num_rows(), 5)
+        self.assertEqual(converter.get_metadata()['num_rows'], 4)
+        self.assertIsNotNone(converter._book)
+
+    def test_xlsx_files_are_streamed(self):
+        converter = Region10SpreadsheetConverter(xls_file=r10_file())
+        rows = converter.convert_next()
+        self.assertEqual(expected_results[0], next(rows))
+        self.assertIsNone(converter._book)
@@ -0,0 +1,120 @@
+import datetime
+import io
+import re
+import zipfile
+
+import xlrd
+import xlsxwriter
+from django.test import SimpleTestCase
+
+from .common import R10_XLSX_PATH
+from ..xlsx_reader import XlsxReader, is_xlsx
+
+
+def make_xlsx(rows, date_format='mm/dd/yyyy'):
+    f = io.BytesIO()
+    workbook = xlsxwriter.Workbook(f)
+    date_cell_format = workbook.add_format({'num_format': date_format})
+    sheet = workbook.add_worksheet()
+    for rx, row in enumerate(rows):
+        for cx, value in enumerate(row):
+            if isinstance(value, datetime.datetime):
+                sheet.write_datetime(rx, cx, value, date_cell_format)
+            elif value is not None:
+                sheet.write(rx, cx, value)
+    workbook.close()
+    f.seek(0)
+    return f
+
+
+def read_with_xlrd(f):
+    book = xlrd.open_workbook(file_contents=f.read())
+    f.seek(0)
+    sheet = book.sheet_by_index(0)
+    return [
+        [xlrd.xldate.xldate_as_datetime(cell.value, book.datemode)
+         if cell.ctype == xlrd.XL_CELL_DATE else cell.value
+         for cell in sheet.row(rx)]
+        for rx in range(sheet.nrows)
+    ]
+
+
+def remove_dimension(f):
+    result = io.BytesIO()
+    with zipfile.ZipFile(f) as src, zipfile.ZipFile(result, 'w') as dest:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename == 'xl/worksheets/sheet1.xml':
+                data = re.sub(rb'<dimension [^>]*/>', b'', data)
+            dest.writestr(info, data)
+    result.seek(0)
+    return result
+
+
+def strip_blank_cells(row):
+    while row and row[-1] == '':
+        row = row[:-1]
+    return row
+
+
+class XlsxReaderTests(SimpleTestCase):
+    def assertReadsLikeXlrd(self, f):
+        expected = [strip_blank_cells(row) for row in read_with_xlrd(f)]
+        self.assertEqual(list(XlsxReader(f).iter_rows()), expected)
+
+    def test_it_reads_like_xlrd(self):
+        with open(R10_XLSX_PATH, 'rb') as f:
+            self.assertReadsLikeXlrd(f)
+
+    def test_it_reads_cell_types_like_xlrd(self):
+        self.assertReadsLikeXlrd(make_xlsx([
+            ['Name', 'Price', 'Date', 'Flag'],
+            ['  padded  ', 12.5, datetime.datetime(2017, 6, 1), True],
+            ['', 3, None, False],
+        ]))
+
+    def test_it_reads_custom_date_formats(self):
+        rows = list(XlsxReader(make_xlsx([
+            [datetime.datetime(2016, 2, 29)],
+        ], date_format='d-mmm-yy')).iter_rows())
+        self.assertEqual(rows, [[datetime.datetime(2016, 2, 29)]])
+
+    def test_it_pads_missing_cells_and_rows(self):
+        rows = list(XlsxReader(make_xlsx([
+            ['a', None, 'c'],
+            [None],
+            [None, 'b'],
+            [None],
+        ])).iter_rows())
+        self.assertEqual(rows, [['a', '', 'c'], [], ['', 'b']])
+
+    def test_is_xlsx_works(self):
+        with open(R10_XLSX_PATH, 'rb') as f:
+            self.assertTrue(is_xlsx(f))
+            self.assertEqual(f.tell(), 0)
+        self.assertFalse(is_xlsx(io.BytesIO(b'\xd0\xcf\x11\xe0 xls file')))
+
+    def test_get_num_rows_works(self):
+        with open(R10_XLSX_PATH, 'rb') as f:
+            num_rows = len(read_with_xlrd(f))
+            reader = XlsxReader(f)
+            self.assertEqual(reader.get_num_rows(), num_rows)
+        self.assertEqual(XlsxReader(make_xlsx([
+            ['a'],
+            [None],
+            [None, 'b'],
+        ])).get_num_rows(), 3)
+
+    def test_get_num_rows_does_not_read_cells(self):
+        with open(R10_XLSX_PATH, 'rb') as f:
+            reader = XlsxReader(f)
+            reader.get_num_rows()
+            self.assertEqual(reader.shared_strings, [])
+            self.assertEqual(reader.date_styles, [])
+
+    def test_get_num_rows_returns_none_without_dimension(self):
+        with open(R10_XLSX_PATH, 'rb') as f:
+            f = remove_dimension(f)
+        reader = XlsxReader(f)
+        self.assertIsNone(reader.get_num_rows())
+        self.assertEqual(len(list(reader.iter_rows())), 5)
@@ -89,7 +89,8 @@ def bulk_region_10_step_1(request, step):
                 procurement_center=BulkUploadContractSource.REGION_10,
                 has_been_loaded=False,
                 original_file=file.read(),
-                file_mime_type=file.content_type
+                file_mime_type=file.content_type,
+                file_metadata=form.cleaned_data['file_metadata'],
             )
 
             request.session['data_capture:upload_source_id'] = upload_source.pk
@@ -128,16 +129,20 @@ def bulk_region_10_step_2(request, step):
         return redirect('data_capture:bulk_region_10_step_1')
 
     if request.method == 'GET':
-        # Get the BulkUploadContractSource based on upload_source_id
-        upload_source = BulkUploadContractSource.objects.get(
-            pk=upload_source_id)
-
-        file = ContentFile(upload_source.original_file)
-
-        file_metadata = Region10SpreadsheetConverter(file).get_metadata()
+        # Get the BulkUploadContractSource based on upload_source_id,
+        # without its file, whose metadata was stored when it was uploaded
+        upload_source = BulkUploadContractSource.objects.defer(
+            'original_file').get(pk=upload_source_id)
+
+        if upload_source.file_metadata is None:
+            # The file was uploaded before its metadata was stored
+            file = ContentFile(upload_source.original_file)
+            upload_source.file_metadata = \
+                Region10SpreadsheetConverter(file).get_metadata()
+            upload_source.save(update_fields=['file_metadata'])
 
         return step.render(request, {
-            'file_metadata': file_metadata,
+            'file_metadata': upload_source.file_metadata,
         })
 
     # else 'POST' because of @require_http_methods decorator
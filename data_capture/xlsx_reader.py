@@ -0,0 +1,308 @@
+'''
+A streaming reader for the worksheets of Excel 2007+ (.xlsx) files.
+
+Unlike xlrd, which parses every cell of a workbook into memory before
+any of them can be read, this parses a worksheet's XML one row at a
+time, so rows can be processed as soon as they're read, and memory use
+doesn't grow with the number of rows (apart from the workbook's shared
+string table, which has one entry per distinct string).
+
+Cell values are read the same way xlrd reads them: numbers as floats,
+cells formatted as dates as datetimes, and blank cells as empty strings.
+'''
+
+import posixpath
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional
+
+from defusedxml.ElementTree import iterparse
+from xlrd.book import Book
+from xlrd.formatting import is_date_format_string
+from xlrd.xldate import xldate_as_datetime
+from xlrd.xlsx import error_code_from_text
+
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+REL_NS = ('{http://schemas.openxmlformats.org/officeDocument/2006/'
+          'relationships}')
+
+PACKAGE_REL_NS = ('{http://schemas.openxmlformats.org/package/2006/'
+                  'relationships}')
+
+REL_TYPE_PREFIX = ('http://schemas.openxmlformats.org/officeDocument/2006/'
+                   'relationships/')
+
+XML_SPACE_ATTR = '{http://www.w3.org/XML/1998/namespace}space'
+
+XML_WHITESPACE = '\t\n \r'
+
+# The built-in number formats that are dates, as per xlrd.
+DATE_FORMAT_IDS = set(range(14, 23)) | set(range(45, 48))
+
+# The first bytes of every zip file, and hence every .xlsx file.
+ZIP_SIGNATURE = b'PK\x03\x04'
+
+
+def is_xlsx(f) -> bool:
+    '''
+    Return whether the given file looks like an .xlsx file, rather than
+    a legacy .xls file (or anything else).
+    '''
+
+    signature = f.read(len(ZIP_SIGNATURE))
+    f.seek(0)
+    return signature == ZIP_SIGNATURE
+
+
+def get_column_index(cell_name: str) -> int:
+    '''
+    Return the zero-based index of the column of the given cell, e.g.:
+
+        >>> get_column_index('A1')
+        0
+        >>> get_column_index('AB12')
+        27
+    '''
+
+    index = 0
+    for char in cell_name:
+        if char.isdigit():
+            break
+        if char != '$':
+            index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
+
+
+def get_text(elem) -> str:
+    '''
+    Return the text of the given <t> element, or of the <si> or <is>
+    element that contains it along with any rich text runs.
+    '''
+
+    if elem.tag == MAIN_NS + 't':
+        text = elem.text or ''
+        if elem.get(XML_SPACE_ATTR) != 'preserve':
+            text = text.strip(XML_WHITESPACE)
+        return text
+    # Phonetic runs (<rPh>) also contain <t> elements, which are skipped.
+    texts = []
+    for child in elem:
+        if child.tag == MAIN_NS + 't':
+            texts.append(get_text(child))
+        elif child.tag == MAIN_NS + 'r':
+            texts.extend(get_text(t) for t in child.iterfind(MAIN_NS + 't'))
+    return ''.join(texts)
+
+
+class XlsxReader:
+    '''
+    Reads the rows of a worksheet of the given .xlsx file, e.g.:
+
+        reader = XlsxReader(f)
+        for row in reader.iter_rows():
+            ...
+
+    Only the workbook's list of sheets is read up front. Its styles and
+    shared strings are read the first time rows are.
+    '''
+
+    def __init__(self, f):
+        self.zipfile = zipfile.ZipFile(f)
+        self.names = {
+            name.lower(): name for name in self.zipfile.namelist()
+        }
+        self.datemode = 0
+        self.sheet_paths: List[str] = []
+        self.styles_path: Optional[str] = None
+        self.shared_strings_path: Optional[str] = None
+        self.date_styles: List[bool] = []
+        self.shared_strings: List[str] = []
+        self.has_read_cell_data = False
+        self._read_workbook()
+
+    def _open(self, path: str):
+        return self.zipfile.open(self.names[path.lower()])
+
+    def _read_rels(self, path: str) -> Dict[str, Dict[str, str]]:
+        rels: Dict[str, Dict[str, str]] = {}
+        if path.lower() not in self.names:
+            return rels
+        base = posixpath.dirname(posixpath.dirname(path))
+        with self._open(path) as f:
+            for _, elem in iterparse(f):
+                if elem.tag == PACKAGE_REL_NS + 'Relationship':
+                    target = elem.get('Target')
+                    if target.startswith('/'):
+                        target = target[1:]
+                    else:
+                        target = posixpath.normpath(
+                            posixpath.join(base, target))
+                    rels[elem.get('Id')] = {
+                        'type': elem.get('Type'),
+                        'target': target,
+                    }
+        return rels
+
+    def _read_workbook(self):
+        rels = self._read_rels('xl/_rels/workbook.xml.rels')
+
+        with self._open('xl/workbook.xml') as f:
+            for _, elem in iterparse(f):
+                if elem.tag == MAIN_NS + 'workbookPr':
+                    if elem.get('date1904') in ('1', 'true'):
+                        self.datemode = 1
+                elif elem.tag == MAIN_NS + 'sheet':
+                    rel = rels[elem.get(REL_NS + 'id')]
+                    self.sheet_paths.append(rel['target'])
+
+        for rel in rels.values():
+            if rel['type'] == REL_TYPE_PREFIX + 'styles':
+                self.styles_path = rel['target']
+            elif rel['type'] == REL_TYPE_PREFIX + 'sharedStrings':
+                self.shared_strings_path = rel['target']
+
+    def _read_cell_data(self):
+        if self.has_read_cell_data:
+            return
+        if self.styles_path is not None:
+            self._read_styles(self.styles_path)
+        if self.shared_strings_path is not None:
+            self._read_shared_strings(self.shared_strings_path)
+        self.has_read_cell_data = True
+
+    def _read_styles(self, path: str):
+        date_format_ids = set(DATE_FORMAT_IDS)
+        # is_date_format_string() only uses the book for debug logging.
+        book = Book()
+        book.verbosity = 0
+        in_cell_xfs = False
+        with self._open(path) as f:
+            for event, elem in iterparse(f, events=('start', 'end')):
+                if elem.tag == MAIN_NS + 'cellXfs':
+                    in_cell_xfs = event == 'start'
+                elif event == 'start':
+                    continue
+                elif elem.tag == MAIN_NS + 'numFmt':
+                    format_id = int(elem.get('numFmtId'))
+                    if is_date_format_string(book, elem.get('formatCode')):
+                        date_format_ids.add(format_id)
+                    else:
+                        date_format_ids.discard(format_id)
+                elif elem.tag == MAIN_NS + 'xf' and in_cell_xfs:
+                    format_id = int(elem.get('numFmtId', '0'))
+                    self.date_styles.append(format_id in date_format_ids)
+
+    def _read_shared_strings(self, path: str):
+        with self._open(path) as f:
+            for _, elem in iterparse(f):
+                if elem.tag == MAIN_NS + 'si':
+                    self.shared_strings.append(get_text(elem))
+                    elem.clear()
+
+    def _is_date_style(self, style: Optional[str]) -> bool:
+        index = int(style or '0')
+        return index < len(self.date_styles) and self.date_styles[index]
+
+    def get_cell_value(self, cell) -> Any:
+        '''
+        Return the value of the given <c> element, or '' if it's blank.
+        '''
+
+        cell_type = cell.get('t', 'n')
+        value = cell.find(MAIN_NS + 'v')
+        text = None if value is None else value.text
+        if cell_type == 'n':
+            if not text:
+                return ''
+            if self._is_date_style(cell.get('s')):
+                return xldate_as_datetime(float(text), self.datemode)
+            return float(text)
+        elif cell_type == 's':
+            return self.shared_strings[int(text)] if text else ''
+        elif cell_type == 'inlineStr':
+            inline_string = cell.find(MAIN_NS + 'is')
+            if inline_string is not None:
+                return get_text(inline_string)
+            return text or ''
+        elif cell_type == 'b':
+            return int(text or 0)
+        elif cell_type == 'e':
+            return error_code_from_text[text]
+        return text or ''
+
+    def get_num_rows(self, sheet_index: int=0) -> Optional[int]:
+        '''
+        Return the number of rows in the given worksheet, as recorded by
+        its <dimension> element, or None if it doesn't have one.
+
+        Only the start of the worksheet's XML is parsed, so this is fast
+        even for huge sheets. Like xlrd's Sheet.nrows, the count includes
+        any blank rows before the last one that has cells, but unlike
+        it, a row of formatted but blank cells can count as the last one.
+        '''
+
+        with self._open(self.sheet_paths[sheet_index]) as f:
+            for _, elem in iterparse(f, events=('start',)):
+                if elem.tag == MAIN_NS + 'dimension':
+                    last_cell = elem.get('ref', '').split(':')[-1]
+                    digits = ''.join(c for c in last_cell if c.isdigit())
+                    return int(digits) if digits else None
+                if elem.tag == MAIN_NS + 'sheetData':
+                    break
+        return None
+
+    def iter_rows(self, sheet_index: int=0) -> Iterator[List[Any]]:
+        '''
+        Yield the rows of the given worksheet as lists of cell values.
+
+        Rows are padded with blank cells up to their last non-blank one.
+        As with xlrd, rows missing from the worksheet are yielded as
+        empty lists, apart from any after the last non-blank row.
+        '''
+
+        sheet_data_tag = MAIN_NS + 'sheetData'
+        row_tag = MAIN_NS + 'row'
+        cell_tag = MAIN_NS + 'c'
+        sheet_data = None
+        next_row_index = 0
+        blank_rows = 0
+        self._read_cell_data()
+
+        with self._open(self.sheet_paths[sheet_index]) as f:
+            for event, elem in iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == sheet_data_tag:
+                        sheet_data = elem
+                    continue
+                if elem.tag != row_tag:
+                    continue
+                if elem.get('r'):
+                    row_index = int(elem.get('r')) - 1
+                else:
+                    row_index = next_row_index
+                blank_rows += row_index - next_row_index
+                next_row_index = row_index + 1
+
+                row: List[Any] = []
+                for cell in elem.iter(cell_tag):
+                    if cell.get('r'):
+                        col_index = get_column_index(cell.get('r'))
+                    else:
+                        col_index = len(row)
+                    value = self.get_cell_value(cell)
+                    if value != '':
+                        row.extend([''] * (col_index - len(row)))
+                        row.append(value)
+                # Discarding each row once it's read is what keeps memory
+                # use from growing with the size of the sheet.
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+                if not row:
+                    blank_rows += 1
+                    continue
+                for _ in range(blank_rows):
+                    yield []
+                blank_rows = 0
+                yield row
@@ -1 +1 @@
-def config() -> dict: ...
+def config(env: str = ...) -> dict: ...